@@ -0,0 +1,125 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class _Entry:
+    bucket: Hashable
+    vector: np.ndarray
+    value: Any
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of answers keyed by question similarity.
+
+    Entries live in buckets, typically ``(corpus_fingerprint, mode, k)``, so answers
+    are never shared across corpora, modes or retrieval depths. Within a bucket a
+    lookup returns the most similar cached question's value if its cosine
+    similarity reaches ``threshold``. Entries expire after ``ttl`` seconds and the
+    least recently used entry is evicted once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, max_entries: int = 1024):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a near-duplicate question to hit
+            ttl: Entry lifetime in seconds
+            max_entries: Total number of entries kept across all buckets
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[Hashable, Dict[int, None]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        ids = self._buckets.get(entry.bucket)
+        if ids is not None:
+            ids.pop(entry_id, None)
+            if not ids:
+                del self._buckets[entry.bucket]
+
+    def get(self, bucket: Hashable, vector: Sequence[float], mode: str = "default") -> Optional[Any]:
+        """
+        Return the cached value of the most similar question in ``bucket``.
+
+        Args:
+            bucket: Isolation key, e.g. (corpus_fingerprint, mode, k)
+            vector: Embedding of the incoming question
+            mode: Label used to break down hit-rate metrics
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            for entry_id in [i for i in self._buckets.get(bucket, ()) if self._entries[i].expires_at <= now]:
+                self._remove(entry_id)
+            ids = list(self._buckets.get(bucket, ()))
+            if ids:
+                similarities = np.stack([self._entries[i].vector for i in ids]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._entries.move_to_end(ids[best])
+                    self._hits[mode] = self._hits.get(mode, 0) + 1
+                    return self._entries[ids[best]].value
+            self._misses[mode] = self._misses.get(mode, 0) + 1
+            return None
+
+    def put(self, bucket: Hashable, vector: Sequence[float], value: Any) -> None:
+        """Store a value for a question, evicting the least recently used entries if full."""
+        entry = _Entry(bucket=bucket, vector=self._normalize(vector), value=value,
+                       expires_at=time.monotonic() + self.ttl)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._buckets.setdefault(bucket, {})[entry_id] = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report hit-rate metrics, overall and per mode.
+
+        Returns:
+            Dict with entries, hits, misses, hit_rate and a per-mode breakdown
+        """
+        with self._lock:
+            hits = sum(self._hits.values())
+            misses = sum(self._misses.values())
+            modes = {}
+            for mode in set(self._hits) | set(self._misses):
+                mode_hits = self._hits.get(mode, 0)
+                mode_lookups = mode_hits + self._misses.get(mode, 0)
+                modes[mode] = {
+                    'hits': mode_hits,
+                    'misses': self._misses.get(mode, 0),
+                    'hit_rate': mode_hits / mode_lookups if mode_lookups else 0.0,
+                }
+            return {
+                'entries': len(self._entries),
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'modes': modes,
+            }
@@ -0,0 +1,129 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from backend.context import get_encoding
+
+CHUNKERS = ('token', 'recursive')
+
+
+class TokenChunker:
+    """
+    Token-window splitter that encodes each text once and cuts it on token offsets.
+
+    A drop-in for ``RecursiveCharacterTextSplitter.from_tiktoken_encoder`` (same
+    ``split_text`` / ``split_documents`` interface and the same separator
+    preference: paragraph, line, word, then any token), but where the recursive
+    splitter re-encodes every candidate piece to measure it, this one encodes the
+    text once, finds the separator positions that fall on token boundaries and
+    walks the token array: each chunk takes up to ``chunk_size`` tokens and ends
+    at the last boundary of the most preferred separator inside that window. The
+    next chunk starts at the first boundary of the same kind within the last
+    ``chunk_overlap`` tokens, so overlaps cover whole lines or words as before.
+    Cuts without a separator are moved to the start of a character, as a multi-byte
+    character can span several tokens. Chunks are whitespace-stripped and never
+    longer than ``chunk_size`` tokens.
+    """
+
+    separators = ("\n\n", "\n", " ")
+
+    def __init__(self, encoding_name: str, chunk_size: int, chunk_overlap: int):
+        """
+        Args:
+            encoding_name: tiktoken encoding used to count tokens (loaded once per process)
+            chunk_size: Maximum chunk size in tokens
+            chunk_overlap: Maximum token overlap between consecutive chunks
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) must be smaller than the chunk size ({chunk_size})")
+        self.encoding = get_encoding(encoding_name)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_text(self, text: str) -> List[str]:
+        """Split a text into chunks of at most ``chunk_size`` tokens."""
+        tokens = self.encoding.encode_ordinary(text)
+        if len(tokens) <= self.chunk_size:
+            chunk = text.strip()
+            return [chunk] if chunk else []
+        # Offsets index the decoded text, which is the original for any valid string
+        text, offsets = self.encoding.decode_with_offsets(tokens)
+        boundaries = self._boundaries(text, offsets)
+        # Tokens that start a character; a chunk starting on any other token would take in
+        # the whole character, and with it the tokens before the cut
+        char_starts = None if text.isascii() else [
+            index for index, token in enumerate(self.encoding.decode_tokens_bytes(tokens))
+            if not 0x80 <= token[0] < 0xC0
+        ]
+
+        chunks = []
+        start = previous_end = 0
+        while start < len(tokens):
+            end, level = self._chunk_end(boundaries, char_starts, start, previous_end, len(tokens))
+            chunk = text[offsets[start]:offsets[end] if end < len(tokens) else len(text)].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= len(tokens):
+                break
+            start, previous_end = self._next_start(boundaries, char_starts, level, start, end), end
+        return chunks
+
+    def split_documents(self, documents: Sequence[Document]) -> List[Document]:
+        """Split Documents, copying each one's metadata onto its chunks."""
+        return [
+            Document(page_content=chunk, metadata=dict(document.metadata))
+            for document in documents
+            for chunk in self.split_text(document.page_content)
+        ]
+
+    def _boundaries(self, text: str, offsets: List[int]) -> List[List[int]]:
+        """Token indices at which each separator starts, per separator in order of preference."""
+        starts = {}
+        for index, offset in enumerate(offsets):
+            starts.setdefault(offset, index)
+        return [
+            [starts[match.start()] for match in re.finditer(re.escape(separator), text) if match.start() in starts]
+            for separator in self.separators
+        ]
+
+    def _chunk_end(self, boundaries: List[List[int]], char_starts: Optional[List[int]], start: int,
+                   previous_end: int, total: int) -> Tuple[int, Optional[int]]:
+        """
+        End of the chunk starting at token ``start`` and the separator level it ends on.
+
+        Only boundaries past the previous chunk's end count, so every chunk advances
+        even when it starts inside the previous one's overlap. None means a plain
+        token cut (no separator in the window), made at the last character start
+        in the window (``char_starts``; None when every token starts one), or the
+        end of the text.
+        """
+        limit = start + self.chunk_size
+        if limit >= total:
+            return total, None
+        floor = max(start, previous_end)
+        for level, positions in enumerate(boundaries):
+            i = bisect_right(positions, limit) - 1
+            if i >= 0 and positions[i] > floor:
+                return positions[i], level
+        if char_starts is not None:
+            i = bisect_right(char_starts, limit) - 1
+            if i >= 0 and char_starts[i] > start:
+                return char_starts[i], None
+        return limit, None
+
+    def _next_start(self, boundaries: List[List[int]], char_starts: Optional[List[int]], level: Optional[int],
+                    start: int, end: int) -> int:
+        """Start of the next chunk: the first same-level boundary (or character start) in the overlap, else ``end``."""
+        if not self.chunk_overlap:
+            return end
+        target = max(end - self.chunk_overlap, start + 1)
+        if level is None:
+            if char_starts is None:
+                return target
+            i = bisect_left(char_starts, target)
+            return char_starts[i] if i < len(char_starts) and char_starts[i] < end else end
+        positions = boundaries[level]
+        i = bisect_left(positions, target)
+        return positions[i] if i < len(positions) and positions[i] < end else end
@@ -0,0 +1,106 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, List
+
+import tiktoken
+from langchain_core.documents import Document
+
+
+@lru_cache(maxsize=4)
+def get_encoding(encoding_name: str) -> Any:
+    """Return a tiktoken encoding, loaded once per process."""
+    return tiktoken.get_encoding(encoding_name)
+
+
+@dataclass
+class PackedContext:
+    """Context selected for a prompt, in relevance order."""
+    documents: List[Document] = field(default_factory=list)
+    tokens: int = 0  # Tokens of context text (excluding prompt template)
+
+    @property
+    def texts(self) -> List[str]:
+        return [doc.page_content for doc in self.documents]
+
+
+def _overlap(left: str, right: str, min_chars: int, max_chars: int) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right``, or 0."""
+    for size in range(min(len(left), len(right), max_chars), min_chars - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _same_page(a: Document, b: Document) -> bool:
+    return (a.metadata.get('source'), a.metadata.get('page')) == (b.metadata.get('source'), b.metadata.get('page'))
+
+
+def pack_context(documents: List[Document], encoding: Any, token_budget: int,
+                 min_overlap_chars: int = 20, max_overlap_chars: int = 1000,
+                 min_partial_tokens: int = 64) -> PackedContext:
+    """
+    Assemble retrieved chunks into a token-budgeted context.
+
+    Exact and contained duplicates are dropped, consecutive chunks of the same page
+    (detected by the splitter's overlap) are merged into one passage, and passages
+    are packed in relevance order until ``token_budget`` is reached. If the next
+    passage doesn't fit but at least ``min_partial_tokens`` remain, it is truncated
+    to fill the budget.
+
+    Args:
+        documents: Retrieved chunks, most relevant first
+        encoding: tiktoken encoding used to count tokens
+        token_budget: Maximum context tokens
+        min_overlap_chars: Shortest shared edge treated as chunk adjacency
+        max_overlap_chars: Longest shared edge searched for
+        min_partial_tokens: Smallest truncated passage worth including
+
+    Returns:
+        PackedContext with merged documents (metadata of their most relevant chunk)
+    """
+    # Drop duplicates, keeping the most relevant copy
+    unique: List[Document] = []
+    for doc in documents:
+        text = doc.page_content.strip()
+        if not text or any(text in kept.page_content for kept in unique):
+            continue
+        unique = [kept for kept in unique if kept.page_content.strip() not in text]
+        unique.append(Document(page_content=text, metadata=dict(doc.metadata)))
+
+    # Merge chunks that continue each other on the same page
+    passages: List[Document] = []
+    for doc in unique:
+        for i, passage in enumerate(passages):
+            if not _same_page(passage, doc):
+                continue
+            size = _overlap(passage.page_content, doc.page_content, min_overlap_chars, max_overlap_chars)
+            if size:
+                passages[i] = Document(page_content=passage.page_content + doc.page_content[size:], metadata=passage.metadata)
+                break
+            size = _overlap(doc.page_content, passage.page_content, min_overlap_chars, max_overlap_chars)
+            if size:
+                passages[i] = Document(page_content=doc.page_content + passage.page_content[size:], metadata=passage.metadata)
+                break
+        else:
+            passages.append(doc)
+
+    # Pack by relevance into the token budget
+    packed = PackedContext()
+    for passage in passages:
+        remaining = token_budget - packed.tokens
+        if remaining <= 0:
+            break
+        tokens = encoding.encode(passage.page_content)
+        if len(tokens) <= remaining:
+            packed.documents.append(passage)
+            packed.tokens += len(tokens)
+        elif remaining >= min_partial_tokens:
+            packed.documents.append(Document(page_content=encoding.decode(tokens[:remaining]), metadata=passage.metadata))
+            packed.tokens += remaining
+            break
+    return packed
+
+
+def count_message_tokens(messages: List[dict], encoding: Any) -> int:
+    """Approximate prompt tokens of chat messages (content plus per-message overhead)."""
+    return sum(len(encoding.encode(message['content'])) + 4 for message in messages)
@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+from backend.vector_index import normalize_rows, top_k
+
+
+@dataclass
+class CorpusMatrix:
+    """
+    Stored chunk embeddings of one vector store, for selection without re-embedding.
+
+    Rows are unit length; ``keys`` map rows back to chunks (Chroma ids or
+    shared-index rows) and ``page_ids`` / ``source_ids`` number each row's
+    (source, page) and source file.
+    """
+    vectors: np.ndarray
+    keys: List[Any]
+    page_ids: np.ndarray
+    source_ids: np.ndarray
+    centroid: np.ndarray
+
+    @classmethod
+    def build(cls, vectors: Any, metadatas: Sequence[dict], keys: Sequence[Any],
+              normalized: bool = False) -> "CorpusMatrix":
+        """
+        Args:
+            vectors: (N, d) chunk embeddings
+            metadatas: Chunk metadata with ``source`` and ``page``
+            keys: Chunk identifiers, in row order
+            normalized: Rows are already unit length (shared-index vectors), so use them as they are
+        """
+        vectors = np.asarray(vectors, dtype=np.float32) if normalized else normalize_rows(vectors)
+        pages: dict = {}
+        sources: dict = {}
+        page_ids = np.fromiter(
+            (pages.setdefault(((m or {}).get('source'), (m or {}).get('page')), len(pages)) for m in metadatas),
+            dtype=np.int64, count=len(metadatas)
+        )
+        source_ids = np.fromiter(
+            (sources.setdefault((m or {}).get('source'), len(sources)) for m in metadatas),
+            dtype=np.int64, count=len(metadatas)
+        )
+        if len(vectors):
+            centroid = normalize_rows(vectors.mean(axis=0, keepdims=True))[0]
+        else:
+            centroid = np.zeros(vectors.shape[1] if vectors.ndim == 2 else 0, dtype=np.float32)
+        return cls(vectors=vectors, keys=list(keys), page_ids=page_ids, source_ids=source_ids, centroid=centroid)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def mmr_select(corpus: CorpusMatrix, k: int, query_vector: Optional[Sequence[float]] = None,
+               fetch_k: Optional[int] = None, lambda_mult: float = 0.5,
+               source_penalty: float = 0.05) -> np.ndarray:
+    """
+    Pick k relevant but mutually different chunks by maximal marginal relevance.
+
+    Relevance is similarity to the query or, without one, to the corpus centroid
+    (the most representative material). Only the most relevant chunk of each page
+    is a candidate, so overlapping chunks of one page can't crowd the selection
+    (unless there are fewer pages than k, when the rest are filled from them);
+    from the best ``fetch_k`` of those, chunks are then picked greedily, trading relevance
+    against similarity to what is already selected, with a small penalty per
+    chunk already taken from the same document so the selection spreads across
+    files. Cost is one matrix-vector product over the corpus plus k over the candidates.
+
+    Args:
+        corpus: Stored embeddings of the store
+        k: Number of chunks to select
+        query_vector: Query embedding; None selects for coverage of the whole corpus
+        fetch_k: Candidates considered by the greedy step (default max(50 * k, 500))
+        lambda_mult: 1 ranks purely by relevance, 0 purely by diversity
+        source_penalty: Score subtracted per chunk already selected from the same document
+
+    Returns:
+        Selected row indices, in selection order
+    """
+    if not len(corpus) or k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if query_vector is None:
+        query = corpus.centroid
+    else:
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32)[None, :])[0]
+    relevance = np.asarray(corpus.vectors @ query, dtype=np.float32)
+
+    # Best chunk of each page among the top rows; pages rarely hold more than a few
+    # chunks, so 4x oversampling still yields about fetch_k distinct pages
+    fetch_k = fetch_k or max(50 * k, 500)
+    ranked = top_k(relevance, 4 * fetch_k)
+    _, first = np.unique(corpus.page_ids[ranked], return_index=True)
+    candidates = ranked[np.sort(first)[:fetch_k]]
+    page_best = len(candidates)
+    if page_best < k:
+        # Fewer pages than chunks wanted: the other chunks of those pages fill the
+        # slots left once every page has been picked
+        rest = np.ones(len(ranked), dtype=bool)
+        rest[first] = False
+        candidates = np.concatenate([candidates, ranked[rest][:fetch_k - page_best]])
+
+    vectors = np.asarray(corpus.vectors[candidates], dtype=np.float32)
+    candidate_relevance = relevance[candidates]
+    candidate_sources = corpus.source_ids[candidates]
+    source_counts = np.zeros(int(corpus.source_ids.max()) + 1, dtype=np.float32)
+    max_similarity = np.zeros(len(candidates), dtype=np.float32)
+    available = np.zeros(len(candidates), dtype=bool)
+    available[:page_best] = True
+
+    selected = []
+    for step in range(min(k, len(candidates))):
+        if step == page_best:
+            available[page_best:] = True
+        scores = (lambda_mult * candidate_relevance
+                  - (1.0 - lambda_mult) * max_similarity
+                  - source_penalty * source_counts[candidate_sources])
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        source_counts[candidate_sources[best]] += 1
+        np.maximum(max_similarity, vectors @ vectors[best], out=max_similarity)
+    return candidates[selected]
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class CacheEntry:
+    """Chunks and vectors produced for one PDF."""
+    texts: List[str]
+    metadatas: List[dict]
+    vectors: np.ndarray
+    page_count: int
+
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed cache of chunk texts and embedding vectors.
+
+    Entries are keyed by the SHA-256 of the PDF bytes together with the splitter
+    and embedding-model settings, so a repeat upload of the same file skips parsing,
+    splitting and embedding. Each entry is a ``<key>.json`` chunk file plus a
+    ``<key>.npy`` float32 vector file; vectors are memory-mapped on read. Entries
+    can be written in one piece (``put``) or streamed batch by batch (``writer``).
+    The directory is kept under ``max_bytes``
+    by evicting the least recently used entries (tracked through file mtimes).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        """
+        Args:
+            cache_dir: Directory holding cache entries (created if missing, readable by the owner only)
+            max_bytes: Size bound for the whole cache directory
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        # Entries hold uploaded text, so other local users must not be able to read them;
+        # chmod also tightens a directory left behind by an older version
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        os.chmod(cache_dir, 0o700)
+
+    @staticmethod
+    def make_key(content_hash: str, settings: Dict[str, Any]) -> str:
+        """
+        Build the cache key for a PDF.
+
+        Args:
+            content_hash: SHA-256 hex digest of the raw PDF bytes
+            settings: Splitter and embedding-model settings that affect the output
+
+        Returns:
+            Hex digest identifying the (content, settings) pair
+        """
+        digest = hashlib.sha256(content_hash.encode("utf-8"))
+        digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".npy"
+
+    def get(self, key: str, source_bytes: int = 0) -> Optional[CacheEntry]:
+        """
+        Look up an entry and mark it as recently used.
+
+        Args:
+            key: Cache key from ``make_key``
+            source_bytes: Size of the PDF, counted as bytes saved on a hit
+
+        Returns:
+            The cached entry, or None on a miss
+        """
+        chunks_path, vectors_path = self._paths(key)
+        try:
+            with open(chunks_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            # Memory-mapped, so a large cached file isn't read into memory all at once
+            vectors = np.load(vectors_path, mmap_mode="r")
+            os.utime(chunks_path)
+            os.utime(vectors_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += source_bytes
+        return CacheEntry(
+            texts=payload["texts"],
+            metadatas=payload["metadatas"],
+            vectors=vectors,
+            page_count=payload["page_count"]
+        )
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        """Store an entry, then evict least recently used entries over the size bound."""
+        writer = self.writer(key)
+        writer.append(entry)
+        writer.commit(entry.page_count)
+
+    def writer(self, key: str) -> "CacheWriter":
+        """Start streaming an entry into the cache; see ``CacheWriter``."""
+        return CacheWriter(self, key)
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in ``max_bytes``."""
+        with self._lock:
+            entries = {}
+            for name in os.listdir(self.cache_dir):
+                key, ext = os.path.splitext(name)
+                if ext not in (".json", ".npy"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                size, mtime = entries.get(key, (0, 0.0))
+                entries[key] = (size + stat.st_size, max(mtime, stat.st_mtime))
+
+            total = sum(size for size, _ in entries.values())
+            for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+                if total <= self.max_bytes:
+                    break
+                for path in self._paths(key):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache effectiveness.
+
+        Returns:
+            Dict with hits, misses, hit rate and bytes saved
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+            }
+
+
+class CacheWriter:
+    """
+    Writes one cache entry batch by batch, so it is never held in memory whole.
+
+    Batches go to temporary files; ``commit`` assembles the entry files from
+    them with streamed copies and publishes them atomically, and ``abort``
+    discards them. Write errors silently abandon the entry: the cache is an
+    optimisation, never a reason for an ingest to fail.
+    """
+
+    def __init__(self, cache: EmbeddingCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.chunks = 0
+        self.dimension = 0
+        self._suffix = f".{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        base = os.path.join(cache.cache_dir, key)
+        self._parts = [base + ext + self._suffix for ext in (".vectors", ".texts", ".metadatas")]
+        try:
+            self._files = [open(self._parts[0], "wb"), *(open(path, "w", encoding="utf-8") for path in self._parts[1:])]
+        except OSError:
+            self._files = []
+            self.abort()
+
+    def append(self, entry: CacheEntry) -> None:
+        """Add a batch of chunks (``entry.page_count`` is ignored; pass the total to ``commit``)."""
+        if not self._files or not len(entry.texts):
+            return
+        vectors = np.ascontiguousarray(entry.vectors, dtype=np.float32)
+        try:
+            vectors_file, texts_file, metadatas_file = self._files
+            vectors_file.write(vectors.tobytes())
+            separator = ", " if self.chunks else ""
+            texts_file.write(separator + ", ".join(json.dumps(text) for text in entry.texts))
+            metadatas_file.write(separator + ", ".join(json.dumps(metadata) for metadata in entry.metadatas))
+            self.chunks += len(entry.texts)
+            self.dimension = vectors.shape[1]
+        except OSError:
+            self.abort()
+
+    def commit(self, page_count: int) -> None:
+        """Publish the entry, then evict least recently used entries over the size bound."""
+        if not self._files:
+            return
+        chunks_path, vectors_path = self.cache._paths(self.key)
+        try:
+            for f in self._files:
+                f.close()
+            with open(vectors_path + self._suffix, "wb") as out, open(self._parts[0], "rb") as data:
+                np.lib.format.write_array_header_1_0(out, {
+                    "descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                    "fortran_order": False,
+                    "shape": (self.chunks, self.dimension),
+                })
+                shutil.copyfileobj(data, out)
+            with open(chunks_path + self._suffix, "w", encoding="utf-8") as out:
+                out.write('{"texts": [')
+                with open(self._parts[1], "r", encoding="utf-8") as data:
+                    shutil.copyfileobj(data, out)
+                out.write('], "metadatas": [')
+                with open(self._parts[2], "r", encoding="utf-8") as data:
+                    shutil.copyfileobj(data, out)
+                out.write(f'], "page_count": {int(page_count)}}}')
+            # Vectors first: an entry is only visible once its chunk file exists
+            os.replace(vectors_path + self._suffix, vectors_path)
+            os.replace(chunks_path + self._suffix, chunks_path)
+        except OSError:
+            self.abort()
+            return
+        finally:
+            self._remove(self._parts)
+        self._files = []
+        self.cache.evict()
+
+    def abort(self) -> None:
+        """Discard everything written so far."""
+        for f in self._files:
+            f.close()
+        self._files = []
+        chunks_path, vectors_path = self.cache._paths(self.key)
+        self._remove(self._parts + [vectors_path + self._suffix, chunks_path + self._suffix])
+
+    @staticmethod
+    def _remove(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.metrics import LatencyRecorder
+
+
+class EmbeddingEngine:
+    """
+    Process-wide, thread-safe embedding engine.
+
+    The underlying HuggingFace model is loaded once and shared by every
+    Streamlit session, both for indexing uploads and for query-time embedding.
+    Implements the LangChain ``Embeddings`` interface (``embed_documents`` /
+    ``embed_query``) so it can be handed straight to Chroma.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, max_inflight_batches: int = 2):
+        """
+        Args:
+            model_name: HuggingFace / sentence-transformers model name
+            batch_size: Number of texts encoded per forward pass
+            max_inflight_batches: Upper bound on batches encoded concurrently
+                across all sessions, to keep concurrent uploads within memory
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_inflight_batches = max_inflight_batches
+        self.load_time: Optional[float] = None
+        self.batch_latency = LatencyRecorder()
+
+        self._model: Any = None
+        self._load_lock = threading.Lock()
+        self._inflight = threading.BoundedSemaphore(max_inflight_batches)
+
+    @property
+    def model(self) -> Any:
+        """Return the loaded embedding model, loading it on first use."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    # Updated import to fix deprecation warning
+                    try:
+                        from langchain_huggingface import HuggingFaceEmbeddings
+                    except ImportError:
+                        # Fallback to old import if new package not installed
+                        from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings as HuggingFaceEmbeddings
+
+                    start = time.perf_counter()
+                    model = HuggingFaceEmbeddings(model_name=self.model_name)
+                    self.load_time = time.perf_counter() - start
+                    self._model = model
+        return self._model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def warm(self, background: bool = False) -> Optional[threading.Thread]:
+        """
+        Load the model and run one dummy encode so the first real request is fast.
+
+        Args:
+            background: Warm in a daemon thread instead of blocking the caller
+
+        Returns:
+            The warm-up thread when ``background`` is True, otherwise None
+        """
+        if background:
+            thread = threading.Thread(target=self.warm, name="embedding-warmup", daemon=True)
+            thread.start()
+            return thread
+        self.embed_query("warm up")
+        return None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts in batches of ``batch_size``."""
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query string."""
+        return self._embed_batch([text])[0]
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        model = self.model
+        # Cap the number of batches in flight so concurrent uploads can't exhaust memory
+        with self._inflight:
+            start = time.perf_counter()
+            vectors = model.embed_documents(batch)
+            self.batch_latency.record(time.perf_counter() - start)
+        return vectors
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Report load-time and per-batch latency metrics.
+
+        Returns:
+            Dict with model name, load state, load time (seconds) and batch latency summary
+        """
+        return {
+            'model_name': self.model_name,
+            'loaded': self.is_loaded,
+            'load_time': self.load_time,
+            'batch_size': self.batch_size,
+            'max_inflight_batches': self.max_inflight_batches,
+            'batch_latency': self.batch_latency.summary(),
+        }
@@ -0,0 +1,246 @@
+import io
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, BinaryIO, Iterable, Iterator, List, TypeVar, Union
+
+from langchain_core.documents import Document
+
+
+@dataclass
+class ParsedPDF:
+    """Chunks extracted from one PDF, before embedding."""
+    texts: List[str]
+    metadatas: List[dict]
+    page_count: int
+    parse_time: float = 0.0
+    split_time: float = 0.0
+
+
+@dataclass
+class ChunkBatch:
+    """Up to ``batch_size`` consecutive chunks of one PDF, as streamed by ``iter_chunk_batches``."""
+    texts: List[str]
+    metadatas: List[dict]
+    pages: int  # Pages whose last chunk is in this batch, so a file's batches sum to its page count
+    page_total: int  # Pages in the whole PDF
+    parse_time: float = 0.0
+    split_time: float = 0.0
+
+
+T = TypeVar('T')
+
+
+@lru_cache(maxsize=8)
+def get_text_splitter(encoding_name: str, chunk_size: int, chunk_overlap: int, chunker: str = 'token') -> Any:
+    """
+    Return a tiktoken-based splitter, reused for identical settings within a process.
+
+    Args:
+        chunker: 'token' for the single-pass ``TokenChunker`` or 'recursive' for
+            LangChain's ``RecursiveCharacterTextSplitter``
+    """
+    if chunker == 'token':
+        from backend.chunking import TokenChunker
+
+        return TokenChunker(encoding_name, chunk_size, chunk_overlap)
+    if chunker != 'recursive':
+        raise ValueError(f"Unknown chunker {chunker!r}; expected 'token' or 'recursive'")
+    # Imported on first use: the splitter stack is slow to import and only needed at ingest
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=encoding_name,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+
+
+def pdf_buffer(pdf_file: Any) -> memoryview:
+    """
+    Return a zero-copy view of an uploaded PDF's bytes.
+
+    Streamlit's ``UploadedFile`` is a ``BytesIO``, so ``getbuffer()`` exposes its
+    memory directly instead of copying it the way ``getvalue()`` does.
+    """
+    if hasattr(pdf_file, "getbuffer"):
+        return pdf_file.getbuffer()
+    return memoryview(pdf_file.getvalue())
+
+
+def _open_pdf(pdf: Union[bytes, BinaryIO]) -> Any:
+    from pypdf import PdfReader
+
+    if isinstance(pdf, bytes):
+        # BytesIO shares the bytes object's buffer instead of copying it
+        stream = io.BytesIO(pdf)
+    else:
+        stream = pdf
+        stream.seek(0)
+    return PdfReader(stream)
+
+
+def load_pdf_pages(pdf: Union[bytes, BinaryIO], source: str) -> List[Document]:
+    """
+    Extract one Document per page straight from an in-memory PDF.
+
+    Args:
+        pdf: Raw PDF bytes or a seekable binary stream (e.g. an uploaded file)
+        source: Original file name, stored as the ``source`` metadata
+
+    Returns:
+        List of page Documents with ``source`` and ``page`` metadata, as PyPDFLoader produces
+    """
+    reader = _open_pdf(pdf)
+    return [
+        Document(page_content=page.extract_text(), metadata={'source': source, 'page': page_number})
+        for page_number, page in enumerate(reader.pages)
+    ]
+
+
+def iter_chunk_batches(pdf: Union[bytes, BinaryIO], source: str, encoding_name: str, chunk_size: int,
+                       chunk_overlap: int, chunker: str = 'token', batch_size: int = 64) -> Iterator[ChunkBatch]:
+    """
+    Stream a PDF's chunks in batches, reading and splitting one page at a time.
+
+    The splitter splits each page on its own, so the chunks are exactly those of
+    splitting the whole page list at once, but only the current page and the
+    batch being filled are held in memory.
+
+    Args:
+        pdf: Raw PDF bytes or a seekable binary stream
+        source: Original file name, stored as the ``source`` metadata
+        encoding_name: tiktoken encoding used to measure chunk length
+        chunk_size: Maximum chunk size in tokens
+        chunk_overlap: Token overlap between consecutive chunks
+        chunker: See ``get_text_splitter``
+        batch_size: Chunks per batch (the last batch may be smaller)
+
+    Yields:
+        ChunkBatch objects in document order; a PDF without text yields one empty
+        batch carrying its page count
+    """
+    splitter = get_text_splitter(encoding_name, chunk_size, chunk_overlap, chunker)
+    start = time.perf_counter()
+    reader = _open_pdf(pdf)
+    page_total = len(reader.pages)
+    parse_time = time.perf_counter() - start
+    split_time = 0.0
+    texts: List[str] = []
+    metadatas: List[dict] = []
+    pages = 0
+
+    for page_number, page in enumerate(reader.pages):
+        start = time.perf_counter()
+        document = Document(page_content=page.extract_text(), metadata={'source': source, 'page': page_number})
+        parsed = time.perf_counter()
+        chunks = splitter.split_documents([document])
+        parse_time += parsed - start
+        split_time += time.perf_counter() - parsed
+        texts.extend(chunk.page_content for chunk in chunks)
+        metadatas.extend(chunk.metadata for chunk in chunks)
+        pages += 1
+        while len(texts) >= batch_size:
+            # Pages finish with their last chunk, so a page split across batches counts in the later one
+            done = pages if len(texts) == batch_size else pages - 1
+            yield ChunkBatch(texts[:batch_size], metadatas[:batch_size], done, page_total, parse_time, split_time)
+            del texts[:batch_size], metadatas[:batch_size]
+            pages -= done
+            parse_time = split_time = 0.0
+    if texts or pages or not page_total:
+        yield ChunkBatch(texts, metadatas, pages, page_total, parse_time, split_time)
+
+
+def batches_of(parsed: ParsedPDF, batch_size: int = 64) -> Iterator[ChunkBatch]:
+    """Slice an already parsed PDF into the batches ``iter_chunk_batches`` would have streamed."""
+    done = 0
+    for start in range(0, len(parsed.texts), batch_size):
+        end = min(start + batch_size, len(parsed.texts))
+        last = end == len(parsed.texts)
+        # Every page before the next batch's first chunk is complete
+        pages = parsed.page_count if last else int(parsed.metadatas[end]['page'])
+        yield ChunkBatch(parsed.texts[start:end], parsed.metadatas[start:end], pages - done, parsed.page_count,
+                         parsed.parse_time if not start else 0.0, parsed.split_time if not start else 0.0)
+        done = pages
+    if not parsed.texts:
+        yield ChunkBatch([], [], parsed.page_count, parsed.page_count, parsed.parse_time, parsed.split_time)
+
+
+def prefetch(iterable: Iterable[T], maxsize: int) -> Iterator[T]:
+    """
+    Run an iterator on a background thread, at most ``maxsize`` items ahead of the consumer.
+
+    The bounded queue gives backpressure: the producer blocks once it is
+    ``maxsize`` items ahead, so a slow consumer (embedding) holds back a fast
+    producer (parsing) instead of letting its output pile up. Exceptions from the
+    producer are re-raised in the consumer; closing the returned generator stops
+    the producer before its next item.
+    """
+    items: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    end = object()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as exc:
+            put((end, exc))
+        else:
+            put((end, None))
+
+    threading.Thread(target=produce, name="ingest-prefetch", daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def parse_and_split(pdf: Union[bytes, BinaryIO], source: str, encoding_name: str, chunk_size: int, chunk_overlap: int,
+                    chunker: str = 'token') -> ParsedPDF:
+    """
+    Extract pages from a PDF and split them into token-sized chunks.
+
+    This is a module-level function so it can run in a worker process; it
+    collects the same batches the streaming path embeds, which keeps the
+    output of both paths identical.
+
+    Args:
+        pdf: Raw PDF bytes or a seekable binary stream
+        source: Original file name, stored as the ``source`` metadata
+        encoding_name: tiktoken encoding used to measure chunk length
+        chunk_size: Maximum chunk size in tokens
+        chunk_overlap: Token overlap between consecutive chunks
+        chunker: See ``get_text_splitter``
+
+    Returns:
+        ParsedPDF with chunk texts, chunk metadata, page count and the time spent
+        extracting pages and splitting them (measured here, so it is accurate
+        when this runs in a worker process)
+    """
+    result = ParsedPDF(texts=[], metadatas=[], page_count=0)
+    for batch in iter_chunk_batches(pdf, source, encoding_name, chunk_size, chunk_overlap, chunker, batch_size=1024):
+        result.texts.extend(batch.texts)
+        result.metadatas.extend(batch.metadatas)
+        result.page_count += batch.pages
+        result.parse_time += batch.parse_time
+        result.split_time += batch.split_time
+    return result
@@ -0,0 +1,307 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, IO, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("studymate_span", default=None)
+
+
+class _NoopSpan:
+    """Span returned by the no-op instrumentation; every operation does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def set(self, **attributes: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    One timed stage. Use as a context manager; nested spans share a trace id.
+
+    Attributes set with ``set`` (chunk counts, token counts, cache outcome, ...)
+    are exported with the span when it finishes.
+    """
+
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id", "start", "duration", "error",
+                 "_instrumentation", "_token", "_start_perf")
+
+    def __init__(self, instrumentation: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.span_id = uuid.uuid4().hex[:16]
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.start = 0.0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self._instrumentation = instrumentation
+        self._token = None
+        self._start_perf = 0.0
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self._start_perf
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _current_span.reset(self._token)
+        self._instrumentation._finish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "span",
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Instrumentation:
+    """
+    Instrumentation surface used by the pipeline; this base class does nothing.
+
+    ``span`` times a stage, ``record`` reports a duration measured elsewhere (e.g.
+    in a worker process) and ``count`` increments a counter. The no-op
+    implementation returns a shared span object and allocates nothing, so leaving
+    instrumentation off costs a method call per stage.
+    """
+
+    enabled = False
+
+    def span(self, name: str, **attributes: Any) -> Any:
+        return _NOOP_SPAN
+
+    def record(self, name: str, duration: float, **attributes: Any) -> None:
+        return None
+
+    def count(self, name: str, value: float = 1, **labels: Any) -> None:
+        return None
+
+    def close(self) -> None:
+        return None
+
+
+class Exporter:
+    """Receives finished spans and counter increments from a ``Tracer``."""
+
+    def export_span(self, span: Span) -> None:
+        pass
+
+    def export_count(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class Tracer(Instrumentation):
+    """Instrumentation that builds spans and forwards them, and counters, to exporters."""
+
+    enabled = True
+
+    def __init__(self, exporters: Sequence[Exporter]):
+        self.exporters = list(exporters)
+
+    def span(self, name: str, **attributes: Any) -> Span:
+        return Span(self, name, attributes)
+
+    def record(self, name: str, duration: float, **attributes: Any) -> None:
+        span = Span(self, name, attributes)
+        span.start = time.time() - duration
+        span.duration = duration
+        self._finish(span)
+
+    def count(self, name: str, value: float = 1, **labels: Any) -> None:
+        for exporter in self.exporters:
+            exporter.export_count(name, value, labels)
+
+    def _finish(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.export_span(span)
+
+    def close(self) -> None:
+        for exporter in self.exporters:
+            exporter.close()
+
+
+class JsonLinesExporter(Exporter):
+    """Append one JSON object per finished span and per counter increment to a file or stream."""
+
+    def __init__(self, target: Any):
+        """
+        Args:
+            target: File path (opened for appending) or a writable text stream
+        """
+        self._owns_stream = isinstance(target, (str, os.PathLike))
+        self._stream: IO[str] = open(target, "a", encoding="utf-8") if self._owns_stream else target
+        self._lock = threading.Lock()
+
+    def _write(self, payload: Dict[str, Any]) -> None:
+        line = json.dumps(payload, default=str)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+    def export_span(self, span: Span) -> None:
+        self._write(span.to_dict())
+
+    def export_count(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        self._write({"type": "counter", "name": name, "value": value, "labels": labels, "time": time.time()})
+
+    def close(self) -> None:
+        if self._owns_stream:
+            self._stream.close()
+
+
+class PrometheusExporter(Exporter):
+    """
+    Aggregate spans into latency histograms and counters in Prometheus text format.
+
+    Nothing is served over the network: ``render`` returns the exposition text,
+    and with a ``path`` the text is rewritten atomically at most every
+    ``flush_interval`` seconds, for node_exporter's textfile collector or for
+    inspection by hand.
+    """
+
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 10.0, namespace: str = "studymate"):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.namespace = namespace
+        self._histograms: Dict[str, List[float]] = {}  # stage -> bucket counts + [sum, count]
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def export_span(self, span: Span) -> None:
+        with self._lock:
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = [0.0] * (len(LATENCY_BUCKETS) + 2)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if span.duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += span.duration
+            histogram[-1] += 1
+            if span.error is not None:
+                key = ("errors", (("stage", span.name),))
+                self._counters[key] = self._counters.get(key, 0.0) + 1
+        self._maybe_flush()
+
+    def export_count(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        key = (name, tuple(sorted((str(k), str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+        self._maybe_flush()
+
+    @staticmethod
+    def _labels(pairs: Sequence[Tuple[str, str]]) -> str:
+        if not pairs:
+            return ""
+        escaped = (
+            '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in pairs
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self) -> str:
+        """Return all metrics in Prometheus text exposition format."""
+        ns = self.namespace
+        with self._lock:
+            histograms = {name: list(values) for name, values in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = [
+            f"# HELP {ns}_stage_duration_seconds Time spent per pipeline stage",
+            f"# TYPE {ns}_stage_duration_seconds histogram",
+        ]
+        for stage, values in sorted(histograms.items()):
+            for bound, count in zip(LATENCY_BUCKETS, values):
+                lines.append(f"{ns}_stage_duration_seconds_bucket{self._labels([('stage', stage), ('le', str(bound))])} {count:g}")
+            lines.append(f"{ns}_stage_duration_seconds_bucket{self._labels([('stage', stage), ('le', '+Inf')])} {values[-1]:g}")
+            lines.append(f"{ns}_stage_duration_seconds_sum{self._labels([('stage', stage)])} {values[-2]:.6f}")
+            lines.append(f"{ns}_stage_duration_seconds_count{self._labels([('stage', stage)])} {values[-1]:g}")
+
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{ns}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f"{metric}{self._labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def _maybe_flush(self) -> None:
+        if self.path is None or time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        self.flush()
+
+    def flush(self) -> None:
+        """Write the current metrics to ``path`` (atomically replacing the previous file)."""
+        if self.path is None:
+            return
+        self._last_flush = time.monotonic()
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.path)
+
+    def close(self) -> None:
+        self.flush()
+
+
+def create_instrumentation(kind: str = "none", path: Optional[str] = None) -> Instrumentation:
+    """
+    Build instrumentation from configuration.
+
+    Args:
+        kind: 'none', 'prometheus' or 'jsonl' (comma-separate to combine, e.g. 'prometheus,jsonl')
+        path: Output file; for several exporters, used as a prefix ('<path>.prom' / '<path>.jsonl')
+
+    Returns:
+        An Instrumentation instance (the no-op base class for 'none')
+    """
+    kinds = [k.strip() for k in (kind or "none").split(",") if k.strip() and k.strip() != "none"]
+    if not kinds:
+        return Instrumentation()
+    exporters: List[Exporter] = []
+    for name in kinds:
+        target = path if path is None or len(kinds) == 1 else f"{path}.{'prom' if name == 'prometheus' else name}"
+        if name == "prometheus":
+            exporters.append(PrometheusExporter(target))
+        elif name == "jsonl":
+            exporters.append(JsonLinesExporter(target or "studymate-trace.jsonl"))
+        else:
+            raise ValueError(f"Unknown instrumentation exporter {name!r}; expected 'prometheus' or 'jsonl'")
+    tracer = Tracer(exporters)
+    # Flush the last metrics and close trace files on interpreter exit
+    atexit.register(tracer.close)
+    return tracer
@@ -0,0 +1,281 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once the job has been cancelled."""
+
+
+@dataclass
+class JobProgress:
+    """Per-file, page and chunk counters of an ingest job."""
+    files_total: int
+    files_done: int = 0
+    current_file: Optional[str] = None
+    pages: int = 0
+    chunks: int = 0  # Chunks created by splitting
+    chunks_embedded: int = 0
+    file_chunks: int = 0  # Chunks of the file in progress created so far
+    file_chunks_embedded: int = 0
+    file_pages: int = 0  # Pages of the file in progress, once it is opened
+    file_pages_embedded: int = 0
+
+    @property
+    def fraction(self) -> float:
+        """Completed share of the job, counting the current file by embedded pages (or chunks)."""
+        if not self.files_total:
+            return 1.0
+        if self.file_pages:
+            partial = self.file_pages_embedded / self.file_pages
+        else:
+            partial = self.file_chunks_embedded / self.file_chunks if self.file_chunks else 0.0
+        return min(1.0, (self.files_done + partial) / self.files_total)
+
+
+@dataclass
+class IngestJob:
+    """A queued or running ingest and, once finished, its outcome."""
+    id: str
+    session_id: str
+    sources: List[str]
+    progress: JobProgress
+    state: str = 'queued'
+    result: Any = None  # (vectorstore, page_count, chunk_count) when done
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    work: Optional[Callable[[Callable[..., None]], Any]] = field(default=None, repr=False)
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def report(self, event: str, source: str, pages: int = 0, chunks: int = 0) -> None:
+        """
+        Progress callback handed to the pipeline; also the job's cancellation point.
+
+        Args:
+            event: 'started', 'opened' (pages in the file), 'parsed' (pages and chunks
+                created in this step), 'embedded' (pages and chunks embedded in this
+                step) or 'indexed' (file complete)
+            source: File the event belongs to
+        """
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+        progress = self.progress
+        if event == 'started':
+            progress.current_file = source
+            progress.file_chunks = progress.file_chunks_embedded = 0
+            progress.file_pages = progress.file_pages_embedded = 0
+        elif event == 'opened':
+            progress.file_pages = pages
+        elif event == 'parsed':
+            progress.pages += pages
+            progress.chunks += chunks
+            progress.file_chunks += chunks
+        elif event == 'embedded':
+            progress.chunks_embedded += chunks
+            progress.file_chunks_embedded += chunks
+            progress.file_pages_embedded += pages
+        elif event == 'indexed':
+            progress.files_done += 1
+            progress.current_file = None
+            progress.file_chunks = progress.file_chunks_embedded = 0
+            progress.file_pages = progress.file_pages_embedded = 0
+
+
+class IngestJobQueue:
+    """
+    Bounded pool of worker threads running ingest jobs off the Streamlit script thread.
+
+    Queued jobs are kept per session and dispatched round-robin, and a session
+    runs at most ``max_running_per_session`` jobs at once, so one large upload
+    can't hold every worker while other sessions wait. Each session may also
+    have at most ``max_queued_per_session`` unfinished jobs. Finished jobs stay
+    available (for a browser that reconnects after a refresh) until claimed or
+    until ``result_ttl`` seconds pass, after which an unclaimed result is
+    released.
+    """
+
+    def __init__(self, workers: int = 2, max_queued_per_session: int = 4, max_running_per_session: int = 1,
+                 result_ttl: float = 3600.0, release: Optional[Callable[[Any], None]] = None):
+        """
+        Args:
+            workers: Worker threads; started on the first submit
+            max_queued_per_session: Unfinished jobs a session may have before submit is refused
+            max_running_per_session: Jobs of one session that may run concurrently
+            result_ttl: Seconds an unclaimed finished job is kept
+            release: Called with the vector store of a result that expires unclaimed
+        """
+        self.workers = max(1, workers)
+        self.max_queued_per_session = max_queued_per_session
+        self.max_running_per_session = max(1, max_running_per_session)
+        self.result_ttl = result_ttl
+        self._release = release
+
+        self._jobs: Dict[str, IngestJob] = {}
+        self._queues: "OrderedDict[str, Deque[IngestJob]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, session_id: str, sources: List[str], work: Callable[[Callable[..., None]], Any],
+               cancel_event: Optional[threading.Event] = None) -> IngestJob:
+        """
+        Queue an ingest.
+
+        Args:
+            session_id: Owner of the job, used for fair sharing
+            sources: File names being ingested, for progress display
+            work: Called on a worker thread with the job's progress callback; returns the result
+            cancel_event: Event for the job to use as its ``cancel_event``, so ``work`` can
+                check for cancellation between progress reports
+
+        Returns:
+            The queued IngestJob
+        """
+        self._expire()
+        with self._cond:
+            unfinished = sum(1 for job in self._jobs.values() if job.session_id == session_id and not job.finished)
+            if unfinished >= self.max_queued_per_session:
+                raise ValueError(
+                    f"Too many ingest jobs in progress for this session ({unfinished}); wait for one to finish"
+                )
+            job = IngestJob(id=uuid.uuid4().hex, session_id=session_id, sources=list(sources),
+                            progress=JobProgress(files_total=len(sources)), work=work,
+                            cancel_event=cancel_event or threading.Event())
+            self._jobs[job.id] = job
+            self._queues.setdefault(session_id, deque()).append(job)
+            self._start_workers()
+            self._cond.notify()
+        return job
+
+    def _start_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"ingest-job-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_job(self) -> Optional[IngestJob]:
+        """Pop the next runnable job, rotating through sessions (call with the lock held)."""
+        for session_id in list(self._queues):
+            queue = self._queues[session_id]
+            if not queue:
+                del self._queues[session_id]
+                continue
+            if self._running.get(session_id, 0) >= self.max_running_per_session:
+                continue
+            job = queue.popleft()
+            # The session goes to the back of the line for its next job
+            self._queues.move_to_end(session_id)
+            return job
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                self._running[job.session_id] = self._running.get(job.session_id, 0) + 1
+                job.state = 'running'
+                job.started_at = time.time()
+            try:
+                result = job.work(job.report)
+            except JobCancelled:
+                state, result, error = 'cancelled', None, None
+            except Exception as exc:
+                state, result, error = 'failed', None, str(exc)
+            else:
+                # Finished before noticing a late cancel: the work is done, so keep it
+                state, error = 'done', None
+            with self._cond:
+                job.state, job.result, job.error = state, result, error
+                job.finished_at = time.time()
+                job.work = None
+                self._running[job.session_id] -= 1
+                # A slot opened up for this session's next job
+                self._cond.notify_all()
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Return a job by id, or None if it is unknown or has expired."""
+        self._expire()
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def jobs(self, session_id: str) -> List[IngestJob]:
+        """Return a session's jobs, oldest first."""
+        with self._cond:
+            return [job for job in self._jobs.values() if job.session_id == session_id]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job. Queued jobs are dropped; running jobs stop at their next progress report.
+
+        Returns:
+            False if the job is unknown or already finished
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            queue = self._queues.get(job.session_id)
+            if job.state == 'queued' and queue is not None and job in queue:
+                queue.remove(job)
+                job.state = 'cancelled'
+                job.finished_at = time.time()
+                job.work = None
+            return True
+
+    def claim(self, job_id: str) -> Optional[IngestJob]:
+        """
+        Take a finished job out of the queue; its result now belongs to the caller.
+
+        Returns:
+            The job, or None if it is unknown or not finished yet
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or not job.finished:
+                return None
+            return self._jobs.pop(job_id)
+
+    def _expire(self) -> None:
+        now = time.time()
+        with self._cond:
+            expired = [
+                job for job in self._jobs.values()
+                if job.finished and now - job.finished_at > self.result_ttl
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            if job.result is not None and self._release is not None:
+                self._release(job.result[0])
+
+    def stats(self) -> dict:
+        """
+        Report job counts by state and per-session queue lengths.
+
+        Returns:
+            Dict with 'workers', 'states' and 'queued_per_session'
+        """
+        with self._cond:
+            states: Dict[str, int] = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {
+                'workers': self.workers,
+                'states': states,
+                'queued_per_session': {session_id: len(queue) for session_id, queue in self._queues.items() if queue},
+            }
@@ -0,0 +1,350 @@
+import math
+import re
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-]\w+)*")
+
+# Function words and question words. They occur in nearly every chunk, so their
+# postings are the longest in the index while their idf barely moves the ranking;
+# queries leave them out unless they consist of nothing else.
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she should so some such than that the
+their theirs them themselves then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens, keeping dotted and hyphenated terms together.
+
+    Section numbers ("3.2.1"), formula names ("l2-norm") and acronyms survive
+    as single terms so they can be matched exactly.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class _Part:
+    """Postings of one batch of chunks, sorted by (term, chunk), waiting to be merged into the index."""
+
+    def __init__(self, owner: int, term_ids: np.ndarray, postings: np.ndarray, tf: np.ndarray, doc_len: np.ndarray,
+                 keys: List[Any]):
+        self.owner = owner
+        self.term_ids = term_ids
+        self.postings = postings
+        self.tf = tf
+        self.doc_len = doc_len
+        self.keys = keys
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.term_ids.nbytes + self.postings.nbytes + self.tf.nbytes + self.doc_len.nbytes)
+
+
+class _Segment:
+    """CSR inverted index over all merged chunks, keyed by the index's global term ids; never modified once built."""
+
+    def __init__(self, term_ids: np.ndarray, postings: np.ndarray, tf: np.ndarray, doc_len: np.ndarray,
+                 owners: np.ndarray, keys: List[Any], n_terms: int):
+        """
+        Args:
+            term_ids: Term of each posting, in ascending order (not kept)
+            postings: Chunk of each posting, ascending within each term
+            tf: Term frequency of each posting
+            doc_len: Tokens per chunk
+            owners: Id of the named segment each chunk was added under
+            keys: Caller-defined identifier per chunk
+            n_terms: Size of the index vocabulary
+        """
+        counts = np.bincount(term_ids, minlength=n_terms)
+        # Postings of term t are postings[offsets[t]:offsets[t + 1]]
+        self.offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.postings = postings.astype(np.int32, copy=False)
+        self.tf = tf
+        self.doc_len = doc_len
+        self.owners = owners
+        self.keys = keys
+        self.n_docs = len(keys)
+        self.total_len = float(doc_len.sum())
+        # Highest term frequency of each term and shortest non-empty chunk, for upper bounds on a term's score
+        self.max_tf = np.zeros(n_terms, dtype=np.uint16)
+        present = counts > 0
+        if present.any():
+            self.max_tf[present] = np.maximum.reduceat(tf, self.offsets[:-1][present])
+        self.min_len = float(doc_len[doc_len > 0].min()) if self.total_len else 0.0
+        # BM25 length normalization per chunk, cached by the first search
+        self.norm: Optional[np.ndarray] = None
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.offsets) - 1
+
+    def term_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(self.n_terms, dtype=np.int32), np.diff(self.offsets))
+
+    @classmethod
+    def merge(cls, base: Optional["_Segment"], parts: List[_Part], n_terms: int) -> "_Segment":
+        """Merge pending parts into the index; their chunks are numbered after the base's."""
+        term_parts, posting_parts, tf_parts, len_parts, owner_parts, keys = [], [], [], [], [], []
+        n_docs = 0
+        if base is not None:
+            term_parts.append(base.term_ids())
+            posting_parts.append(base.postings)
+            tf_parts.append(base.tf)
+            len_parts.append(base.doc_len)
+            owner_parts.append(base.owners)
+            keys.extend(base.keys)
+            n_docs = base.n_docs
+        for part in parts:
+            term_parts.append(part.term_ids)
+            posting_parts.append(part.postings + n_docs)
+            tf_parts.append(part.tf)
+            len_parts.append(part.doc_len)
+            owner_parts.append(np.full(len(part.keys), part.owner, dtype=np.int32))
+            keys.extend(part.keys)
+            n_docs += len(part.keys)
+        term_ids = np.concatenate(term_parts)
+        # Every batch is sorted by (term, chunk) and later batches hold later chunks, so
+        # a stable sort by term alone keeps each term's chunks in ascending order
+        order = np.argsort(term_ids, kind="stable")
+        return cls(term_ids[order], np.concatenate(posting_parts)[order], np.concatenate(tf_parts)[order],
+                   np.concatenate(len_parts), np.concatenate(owner_parts), keys, n_terms)
+
+    def without(self, owner: int) -> Optional["_Segment"]:
+        """Copy of the index without the chunks of one named segment (None if nothing is left)."""
+        keep = self.owners != owner
+        if keep.all():
+            return self
+        if not keep.any():
+            return None
+        renumber = np.cumsum(keep, dtype=np.int64) - 1
+        kept = keep[self.postings]
+        return _Segment(self.term_ids()[kept], renumber[self.postings[kept]], self.tf[kept], self.doc_len[keep],
+                        self.owners[keep], [key for key, kept_doc in zip(self.keys, keep) if kept_doc], self.n_terms)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.postings.nbytes + self.tf.nbytes + self.offsets.nbytes + self.doc_len.nbytes
+                   + self.owners.nbytes + self.max_tf.nbytes + (self.norm.nbytes if self.norm is not None else 0))
+
+
+def _add_scores(docs: np.ndarray, scores: np.ndarray, more_docs: np.ndarray, more_scores: np.ndarray,
+                n_docs: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum two sparse score vectors over sorted chunk ids."""
+    if not len(docs):
+        return more_docs, more_scores
+    if len(docs) + len(more_docs) > n_docs // 8:
+        # Most chunks are involved: a dense accumulator beats sorting
+        dense = np.zeros(n_docs)
+        dense[docs] = scores
+        dense[more_docs] += more_scores
+        merged = np.flatnonzero(dense)
+        return merged, dense[merged]
+    merged, inverse = np.unique(np.concatenate([docs, more_docs]), return_inverse=True)
+    return merged, np.bincount(inverse, weights=np.concatenate([scores, more_scores]))
+
+
+class BM25Index:
+    """
+    Compact in-memory BM25 index, maintained per source file but searched as one.
+
+    Chunks are added under a segment name (e.g. the source file), in one batch or
+    in parts as a large file is streamed in. New batches wait as sorted postings
+    until ``compact`` (or the next search) merges them into a single CSR inverted
+    index (int32 chunk ids, uint16 term frequencies) with one vocabulary, so a
+    query costs the same whether the corpus came from one file or hundreds.
+    Removing a segment filters its chunks out of the merged index.
+
+    Queries drop stopwords and are evaluated with MaxScore: terms are scored from
+    the highest possible contribution down, and once the terms left can't lift an
+    unseen chunk into the top k, they are only looked up, by binary search, for the
+    chunks that can still get there instead of scanning their postings. Results
+    stay exactly those of scoring every chunk.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._vocab: Dict[str, int] = {}
+        self._owners: Dict[Hashable, int] = {}
+        self._next_owner = 0
+        self._base: Optional[_Segment] = None
+        self._pending: List[_Part] = []
+        self._lock = threading.Lock()
+
+    def add_segment(self, name: Hashable, texts: Sequence[str], keys: Sequence[Any], append: bool = False) -> None:
+        """
+        Index a batch of chunks, replacing any segment with the same name.
+
+        Args:
+            name: Segment name, e.g. the source file name
+            texts: Chunk texts
+            keys: Caller-defined identifier per chunk (e.g. vector store ids), returned by search
+            append: Add the chunks as another part of the named segment instead of replacing it
+        """
+        local_vocab: Dict[str, int] = {}
+        local_ids: List[int] = []
+        doc_ids: List[int] = []
+        doc_len = np.zeros(len(texts), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            local_ids.extend(local_vocab.setdefault(token, len(local_vocab)) for token in tokens)
+            doc_ids.extend([doc] * len(tokens))
+            doc_len[doc] = len(tokens)
+        with self._lock:
+            global_ids = np.fromiter((self._vocab.setdefault(token, len(self._vocab)) for token in local_vocab),
+                                     dtype=np.int64, count=len(local_vocab))
+
+        # Sort (term, chunk) pairs once
+        n_docs = max(len(texts), 1)
+        pairs, counts = np.unique(
+            global_ids[np.asarray(local_ids, dtype=np.int64)] * n_docs + np.asarray(doc_ids, dtype=np.int64),
+            return_counts=True
+        )
+        tf = np.minimum(counts, np.iinfo(np.uint16).max).astype(np.uint16)
+        part = _Part(-1, (pairs // n_docs).astype(np.int32), (pairs % n_docs).astype(np.int32), tf, doc_len, list(keys))
+
+        with self._lock:
+            if not append:
+                self._remove(name)
+            if name not in self._owners:
+                self._owners[name] = self._next_owner
+                self._next_owner += 1
+            part.owner = self._owners[name]
+            self._pending.append(part)
+
+    def remove_segment(self, name: Hashable) -> None:
+        with self._lock:
+            self._remove(name)
+
+    def _remove(self, name: Hashable) -> None:
+        """Drop a named segment's chunks (call with the lock held)."""
+        owner = self._owners.pop(name, None)
+        if owner is None:
+            return
+        self._pending = [part for part in self._pending if part.owner != owner]
+        if self._base is not None:
+            self._base = self._base.without(owner)
+
+    def compact(self) -> None:
+        """Merge chunks added since the last search into the index, so no search has to."""
+        with self._lock:
+            if self._pending:
+                self._base = _Segment.merge(self._base, self._pending, len(self._vocab))
+                self._pending = []
+
+    def _segment(self) -> Optional[_Segment]:
+        self.compact()
+        return self._base
+
+    def __len__(self) -> int:
+        with self._lock:
+            base = self._base.n_docs if self._base is not None else 0
+            return base + sum(len(part.keys) for part in self._pending)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            base = self._base.nbytes if self._base is not None else 0
+            return base + sum(part.nbytes for part in self._pending)
+
+    def search(self, query: str, k: int) -> List[Tuple[Any, float]]:
+        """
+        Return the k best-scoring chunks for a query.
+
+        Returns:
+            List of (key, bm25_score), best first
+        """
+        terms = set(tokenize(query))
+        terms = {term for term in terms if term not in STOPWORDS} or terms
+        segment = self._segment()
+        if not terms or segment is None or k <= 0:
+            return []
+        n_docs = segment.n_docs
+        avg_len = max(segment.total_len / n_docs, 1.0)
+        if segment.norm is None:
+            segment.norm = (self.k1 * (1.0 - self.b + self.b * segment.doc_len / avg_len)).astype(np.float32)
+
+        # (upper bound, postings start, end, idf) per query term, highest bound first; no
+        # posting can score more than the term's highest tf would in the shortest chunk
+        min_norm = self.k1 * (1.0 - self.b + self.b * segment.min_len / avg_len)
+        plan = []
+        for term in terms:
+            term_id = self._vocab.get(term)
+            if term_id is None or term_id >= segment.n_terms:
+                continue
+            start, end = int(segment.offsets[term_id]), int(segment.offsets[term_id + 1])
+            if start == end:
+                continue
+            df = end - start
+            weight = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            max_tf = float(segment.max_tf[term_id])
+            plan.append((weight * max_tf * (self.k1 + 1.0) / (max_tf + min_norm), start, end, weight))
+        if not plan:
+            return []
+        plan.sort(reverse=True)
+        # remaining[i]: the most that terms i onwards can add to any chunk's score
+        remaining = np.cumsum([bound for bound, _, _, _ in plan][::-1])[::-1].tolist() + [0.0]
+
+        docs, scores = np.empty(0, dtype=np.int64), np.empty(0)
+        threshold = 0.0
+        i = 0
+        while i < len(plan):
+            _, start, end, weight = plan[i]
+            term_docs, contribution = self._term_scores(segment, slice(start, end), weight)
+            docs, scores = _add_scores(docs, scores, term_docs, contribution, n_docs)
+            i += 1
+            if len(docs) >= k:
+                threshold = float(np.partition(scores, len(scores) - k)[len(scores) - k])
+                if remaining[i] <= threshold:
+                    # A chunk none of the scored terms matched can no longer reach the top k
+                    break
+
+        for _, start, end, weight in plan[i:]:
+            # Keep only chunks that could still reach the top k with every remaining term
+            keep = scores + remaining[i] > threshold
+            docs, scores = docs[keep], scores[keep]
+            i += 1
+            postings = segment.postings[start:end]
+            positions = np.minimum(np.searchsorted(postings, docs), len(postings) - 1)
+            found = postings[positions] == docs
+            _, contribution = self._term_scores(segment, start + positions[found], weight)
+            scores[found] += contribution
+
+        if len(docs) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [(segment.keys[int(docs[j])], float(scores[j])) for j in order]
+
+    def _term_scores(self, segment: _Segment, rows: Any, weight: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Chunks and BM25 contributions of the postings at ``rows`` (a slice or index array)."""
+        docs = segment.postings[rows]
+        tf = segment.tf[rows].astype(np.float32)
+        return docs, weight * tf * (self.k1 + 1.0) / (tf + segment.norm[docs])
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int, rrf_k: int = 60) -> List[Hashable]:
+    """
+    Fuse several ranked lists with reciprocal-rank fusion.
+
+    Args:
+        rankings: Ranked lists of item keys, best first
+        k: Number of fused results
+        rrf_k: RRF damping constant
+
+    Returns:
+        Top-k item keys by summed 1 / (rrf_k + rank)
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda key: -scores[key])[:k]
@@ -0,0 +1,206 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq, Groq
+
+
+def is_retryable(error: Exception) -> bool:
+    """Return True for transient failures: connection errors, timeouts, 429 and 5xx responses."""
+    # The Groq SDK is imported on first use so importing this module stays cheap
+    from groq import APIConnectionError, APIStatusError, APITimeoutError
+
+    if isinstance(error, (APIConnectionError, APITimeoutError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class LLMClient:
+    """
+    Shared, connection-pooled Groq chat client.
+
+    One sync ``Groq`` client (and one ``AsyncGroq`` client per event loop) is reused
+    for every request so HTTP connections and TLS sessions are kept alive. Requests
+    are bounded by a concurrency limit, have a per-request timeout and are retried
+    with exponential backoff on transient errors. ``base_url`` may point at any
+    OpenAI-compatible server that serves ``/openai/v1/chat/completions``, which is
+    how the pipeline is tested against a local fake.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: Optional[str] = None,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_concurrency: int = 8
+    ):
+        """
+        Args:
+            api_key: Groq API key
+            base_url: Override of the Groq API base URL (None uses the SDK default)
+            timeout: Per-request timeout in seconds
+            max_retries: Retries after the first attempt for transient errors
+            backoff: Base delay in seconds, doubled on every retry
+            max_concurrency: Maximum number of requests in flight per client
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+
+        self._client: Optional["Groq"] = None
+        self._client_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[AsyncGroq, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        # Retries are handled here so sync, async and streaming calls behave the same
+        kwargs = {'api_key': self.api_key, 'timeout': self.timeout, 'max_retries': 0}
+        if self.base_url:
+            kwargs['base_url'] = self.base_url
+        return kwargs
+
+    @property
+    def client(self) -> "Groq":
+        """The shared sync client, created on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from groq import Groq
+
+                    self._client = Groq(**self._client_kwargs())
+        return self._client
+
+    def _async(self) -> Tuple["AsyncGroq", asyncio.Semaphore]:
+        # httpx async connection pools are bound to the loop that created them
+        loop = asyncio.get_running_loop()
+        state = self._async_state.get(loop)
+        if state is None:
+            from groq import AsyncGroq
+
+            state = (AsyncGroq(**self._client_kwargs()), asyncio.Semaphore(self.max_concurrency))
+            self._async_state[loop] = state
+        return state
+
+    def _delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+
+    def complete(self, messages: List[dict], model: str, temperature: float) -> str:
+        """
+        Run a blocking chat completion.
+
+        Returns:
+            The stripped completion text
+        """
+        attempt = 0
+        while True:
+            try:
+                with self._slots:
+                    response = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature
+                    )
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(self._delay(attempt))
+                attempt += 1
+
+    def stream(self, messages: List[dict], model: str, temperature: float) -> Iterator[str]:
+        """
+        Stream a chat completion, yielding content tokens.
+
+        A failed request is retried only if no token has been yielded yet.
+        """
+        attempt = 0
+        while True:
+            started = False
+            try:
+                with self._slots:
+                    stream = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        stream=True
+                    )
+                    for chunk in stream:
+                        token = chunk.choices[0].delta.content if chunk.choices else None
+                        if token:
+                            started = True
+                            yield token
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(self._delay(attempt))
+                attempt += 1
+
+    async def acomplete(self, messages: List[dict], model: str, temperature: float) -> str:
+        """Async variant of ``complete`` using the event loop's pooled AsyncGroq client."""
+        client, slots = self._async()
+        attempt = 0
+        while True:
+            try:
+                async with slots:
+                    response = await asyncio.wait_for(
+                        client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            temperature=temperature
+                        ),
+                        timeout=self.timeout
+                    )
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                attempt += 1
+
+    async def astream(self, messages: List[dict], model: str, temperature: float) -> AsyncIterator[str]:
+        """Async variant of ``stream``."""
+        client, slots = self._async()
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with slots:
+                    stream = await asyncio.wait_for(
+                        client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            temperature=temperature,
+                            stream=True
+                        ),
+                        timeout=self.timeout
+                    )
+                    async for chunk in stream:
+                        token = chunk.choices[0].delta.content if chunk.choices else None
+                        if token:
+                            started = True
+                            yield token
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                attempt += 1
+
+    def close(self) -> None:
+        """Close the shared sync client's connection pool."""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
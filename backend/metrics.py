@@ -0,0 +1,53 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class ValueRecorder:
+    """Thread-safe rolling window of numeric samples."""
+
+    def __init__(self, window: int = 1024):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._count = 0
+        self._total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        """Add a sample."""
+        with self._lock:
+            self._samples.append(value)
+            self._count += 1
+            self._total += value
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the given percentile (0-100) over the current window."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(pct / 100.0 * (len(samples) - 1)))))
+        return samples[index]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """
+        Summarise the recorded samples.
+
+        Returns:
+            Dict with count, mean, p50, p95, p99 and last value
+        """
+        with self._lock:
+            count = self._count
+            total = self._total
+            last = self._samples[-1] if self._samples else None
+        return {
+            'count': count,
+            'mean': total / count if count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'last': last,
+        }
+
+
+class LatencyRecorder(ValueRecorder):
+    """Thread-safe rolling window of latency samples (in seconds)."""
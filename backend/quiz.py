@@ -0,0 +1,153 @@
+import math
+import re
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+_MARKDOWN = re.compile(r"[*_`#]+")
+_QUESTION = re.compile(r"^(?:question\s*(\d+)|(\d+)[.)])\s*[:.)-]?\s*(.*)$", re.IGNORECASE)
+_OPTION = re.compile(r"^\(?([A-D])[).:]\s*(.*)$", re.IGNORECASE)
+# A bare "Answer" needs a colon, so a wrapped line like "answer a ..." isn't read as the key
+_CORRECT = re.compile(r"^(?i:correct(?:\s+answer)?\s*[:\-]?|answer\s*[:\-])\s*\(?([A-Da-d])\b")
+_EXPLANATION = re.compile(r"^explanation\s*[:\-]?\s*(.*)$", re.IGNORECASE)
+
+
+@dataclass
+class QuizQuestion:
+    """One multiple-choice question."""
+    question: str
+    options: List[str]  # "A) ..." in letter order
+    correct: str  # Letter of the correct option
+    explanation: str = ""
+
+
+@dataclass
+class Quiz:
+    """
+    A generated quiz, parsed once when it is generated.
+
+    ``raw`` keeps the LLM output of each question group so a quiz whose text
+    couldn't be parsed can still be shown; ``errors`` holds the groups that failed.
+    """
+    topic: str
+    questions: List[QuizQuestion] = field(default_factory=list)
+    raw: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    def to_text(self) -> str:
+        """Render the quiz in the prompt's plain-text format (raw output and errors if nothing parsed)."""
+        if not self.questions:
+            parts = list(self.raw) + [f"❌ Error generating quiz: {error}" for error in self.errors]
+            return "\n\n".join(parts)
+        blocks = []
+        for i, q in enumerate(self.questions, 1):
+            lines = [f"Question {i}: {q.question}", *q.options, f"Correct Answer: {q.correct}"]
+            if q.explanation:
+                lines.append(f"Explanation: {q.explanation}")
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def parse_quiz(text: str) -> List[QuizQuestion]:
+    """
+    Parse LLM quiz output into questions.
+
+    Accepts the prompt's "Question N:" format as well as "N." / "N)" numbering,
+    markdown emphasis, "A." or "(A)" options and explanations spanning several
+    lines. Questions without options or a correct letter are dropped.
+    """
+    questions: List[QuizQuestion] = []
+    current: Optional[dict] = None
+    field_name = None
+
+    def finish() -> None:
+        if current and current['question'] and len(current['options']) >= 2 and current['correct']:
+            questions.append(QuizQuestion(
+                question=current['question'].strip(),
+                options=current['options'],
+                correct=current['correct'],
+                explanation=current['explanation'].strip()
+            ))
+
+    for raw_line in text.splitlines():
+        line = _MARKDOWN.sub("", raw_line).strip()
+        if not line:
+            continue
+        match = _QUESTION.match(line)
+        if match:
+            finish()
+            current = {'question': match.group(3), 'options': [], 'correct': '', 'explanation': ''}
+            field_name = 'question'
+            continue
+        if current is None:
+            continue
+        match = _CORRECT.match(line)
+        if match:
+            current['correct'] = match.group(1).upper()
+            field_name = None
+            continue
+        match = _EXPLANATION.match(line)
+        if match:
+            current['explanation'] = match.group(1)
+            field_name = 'explanation'
+            continue
+        match = _OPTION.match(line)
+        if match:
+            current['options'].append(f"{match.group(1).upper()}) {match.group(2).strip()}")
+            field_name = 'option'
+            continue
+        # Continuation of a wrapped question, option or explanation
+        if field_name == 'question':
+            current['question'] += " " + line
+        elif field_name == 'option':
+            current['options'][-1] += " " + line
+        elif field_name == 'explanation':
+            current['explanation'] += " " + line
+    finish()
+    return questions
+
+
+def split_questions(num_questions: int, group_size: int) -> List[int]:
+    """Split a question count into near-equal groups of at most ``group_size``."""
+    groups = max(1, math.ceil(num_questions / max(1, group_size)))
+    base, extra = divmod(num_questions, groups)
+    return [base + (1 if i < extra else 0) for i in range(groups)]
+
+
+def cluster_chunks(vectors: Sequence[Sequence[float]], groups: int) -> List[List[int]]:
+    """
+    Split ranked chunks into ``groups`` clusters of related content.
+
+    Seeds are chosen farthest-first, starting from the most relevant chunk, so
+    the clusters cover different parts of the retrieved material; every chunk
+    then joins its most similar seed. Chunk indices keep their rank order within
+    a cluster, and no cluster is empty as long as there are at least ``groups`` chunks.
+
+    Args:
+        vectors: Chunk embeddings, most relevant first
+        groups: Number of clusters
+
+    Returns:
+        One list of chunk indices per cluster, most relevant cluster first
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if not len(matrix):
+        return [[] for _ in range(groups)]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+
+    seeds = [0]
+    nearest = matrix @ matrix[0]  # Similarity of each chunk to its closest seed so far
+    while len(seeds) < min(groups, len(matrix)):
+        candidate = int(np.argmin(np.where(np.isin(np.arange(len(matrix)), seeds), np.inf, nearest)))
+        seeds.append(candidate)
+        nearest = np.maximum(nearest, matrix @ matrix[candidate])
+
+    assignment = np.argmax(matrix @ matrix[seeds].T, axis=1)
+    assignment[seeds] = np.arange(len(seeds))
+    clusters = [np.flatnonzero(assignment == i).tolist() for i in range(len(seeds))]
+    return clusters + [[] for _ in range(groups - len(clusters))]
@@ -1,27 +1,237 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
 import os
+import shutil
 import tempfile
-from typing import List, Tuple, Any, Optional
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Tuple, Any, AsyncIterator, Callable, Iterable, Iterator, Optional
+import numpy as np
 from dotenv import load_dotenv
-from groq import Groq
-from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-# Updated import to fix deprecation warning
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings
-except ImportError:
-    # Fallback to old import if new package not installed
-    from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings as HuggingFaceEmbeddings
+from backend.answer_cache import SemanticAnswerCache
+from backend.chunking import CHUNKERS
+from backend.context import count_message_tokens, get_encoding, pack_context
+from backend.diversity import CorpusMatrix
+from backend.embedding_cache import CacheEntry, CacheWriter, EmbeddingCache
+from backend.embeddings import EmbeddingEngine
+from backend.ingest import ChunkBatch, batches_of, iter_chunk_batches, parse_and_split, pdf_buffer, prefetch
+from backend.instrumentation import Instrumentation, create_instrumentation
+from backend.jobs import IngestJob, IngestJobQueue, JobCancelled
+from backend.lexical import BM25Index
+from backend.llm import LLMClient
+from backend.metrics import LatencyRecorder, ValueRecorder
+from backend.quiz import Quiz, cluster_chunks, parse_quiz, split_questions
+from backend.rerank import CrossEncoderReranker
+from backend.retrieval import STAGES, Retriever
+from backend.sessions import SessionMemoryManager
+from backend.vector_index import NumpyVectorStore, SharedIndexRegistry
+
+# progress(event, source, pages=0, chunks=0); see IngestJob.report for the events
+ProgressCallback = Callable[..., None]
+
+logger = logging.getLogger(__name__)
+
+_chroma_init_lock = threading.Lock()
+
+
+@dataclass
+class SourceInfo:
+    """Per-file counters of a vector store."""
+    content_hash: str
+    page_count: int
+    chunk_count: int
+    nbytes: int = 0  # Approximate memory of the file's chunks in a Chroma store (texts and vectors)
+
+
+@dataclass
+class StoreInfo:
+    """Bookkeeping the pipeline keeps for each vector store it builds."""
+    fingerprint: str  # Hash of the corpus content and ingest settings
+    sources: Dict[str, SourceInfo] = field(default_factory=dict)  # Keyed by source file name
+    lexical: Optional[BM25Index] = None  # BM25 index over the store's chunks
+    corpus: Optional[CorpusMatrix] = None  # Stored chunk embeddings, loaded on first diverse selection
+
+    @property
+    def page_count(self) -> int:
+        return sum(source.page_count for source in self.sources.values())
+
+    @property
+    def chunk_count(self) -> int:
+        return sum(source.chunk_count for source in self.sources.values())
 
 
 class RAGPipeline:
-    def __init__(self):
-        """Initialize the RAG pipeline with configurations."""
+    def __init__(self, warm_embeddings: bool = True, instrumentation: Optional[Instrumentation] = None):
+        """
+        Initialize the RAG pipeline with configurations.
+
+        Args:
+            warm_embeddings: Load the shared embedding model in a background thread at startup
+            instrumentation: Receives spans and counters for every stage; defaults to the
+                INSTRUMENTATION exporter setting (a no-op when unset)
+        """
         load_dotenv()
+        # Per-stage spans and counters (ingest, retrieval, LLM); a no-op unless configured
+        self.instrumentation = instrumentation if instrumentation is not None else create_instrumentation(
+            os.getenv("INSTRUMENTATION", "none"), os.getenv("INSTRUMENTATION_PATH")
+        )
         self.api_key = os.getenv("GROQ_API_KEY")
         self.model_name = 'gemma2-9b-it'  # Updated to a more stable model
-        self.embedding_model_name = 'sentence-transformers/all-MiniLM-L6-v2'  # More stable embedding model
+        self.embedding_model_name = os.getenv("EMBEDDING_MODEL", 'sentence-transformers/all-MiniLM-L6-v2')  # More stable embedding model
+
+        # One connection-pooled Groq client shared by every request (sync and async)
+        self.llm = LLMClient(
+            api_key=self.api_key,
+            base_url=os.getenv("GROQ_BASE_URL"),
+            timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        )
+
+        # Shared embedding engine: loaded once and reused by every session and every query
+        self.embedding_engine = EmbeddingEngine(
+            model_name=self.embedding_model_name,
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+            max_inflight_batches=int(os.getenv("EMBEDDING_MAX_INFLIGHT_BATCHES", "2"))
+        )
+        if warm_embeddings:
+            self.embedding_engine.warm(background=True)
+
+        # Chunking settings (tiktoken tokens)
+        self.encoding_name = 'cl100k_base'
+        self.chunk_size = int(os.getenv("CHUNK_SIZE", "512"))
+        self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "16"))
+        # 'token' splits each page in one encoding pass; 'recursive' is LangChain's RecursiveCharacterTextSplitter
+        self.chunker = os.getenv("CHUNKER", "token")
+        if self.chunker not in CHUNKERS:
+            raise ValueError(f"Unknown CHUNKER {self.chunker!r}; expected one of {', '.join(CHUNKERS)}")
+
+        # Context token budgets per mode; retrieved chunks are deduplicated, merged and packed into these
+        context_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2048"))
+        self.context_token_budgets = {
+            'qa': context_budget,
+            'citations': context_budget,
+            'quiz': int(os.getenv("QUIZ_CONTEXT_TOKEN_BUDGET", "3072"))
+        }
+        self.prompt_tokens: Dict[str, ValueRecorder] = {}
+
+        # Quizzes are generated in concurrent groups of at most this many questions, each on its own subtopic
+        self.quiz_group_size = int(os.getenv("QUIZ_QUESTIONS_PER_GROUP", "5"))
+
+        # Retrieval per mode: 'vector', 'lexical' (BM25) or 'hybrid' (both, fused by reciprocal rank);
+        # quizzes can also use 'mmr', a diverse selection over the stored chunk embeddings
+        search_type = os.getenv("SEARCH_TYPE", "hybrid")
+        self.search_types = {
+            'qa': search_type,
+            'citations': search_type,
+            'quiz': os.getenv("QUIZ_SEARCH_TYPE", "mmr")
+        }
+        self.mmr_lambda = float(os.getenv("QUIZ_MMR_LAMBDA", "0.5"))
+        # Retrievers are built once per store and search type; stage latencies are shared by all of them
+        self._retrievers: "weakref.WeakKeyDictionary[Any, Dict[str, Retriever]]" = weakref.WeakKeyDictionary()
+        self._retrievers_lock = threading.Lock()
+        self.retrieval_latency = {stage: LatencyRecorder() for stage in STAGES}
+
+        # Optional two-stage retrieval for Q&A: fetch RERANK_CANDIDATES chunks, rescore them with a
+        # local cross-encoder and keep the best k for the prompt; RERANK_CANDIDATES=0 disables it
+        self.rerank_candidates = int(os.getenv("RERANK_CANDIDATES", "0"))
+        self.reranker = None
+        if self.rerank_candidates > 0:
+            self.reranker = CrossEncoderReranker(
+                model_name=os.getenv("RERANK_MODEL", 'cross-encoder/ms-marco-MiniLM-L-6-v2'),
+                batch_size=int(os.getenv("RERANK_BATCH_SIZE", "32")),
+                cache_entries=int(os.getenv("RERANK_CACHE_ENTRIES", "50000"))
+            )
+
+        # Worker processes for parallel PDF parsing and chunking (0 or 1 = serial)
+        self.ingest_workers = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self._ingest_pool = None
+        self._ingest_pool_lock = threading.Lock()
+        # Files are streamed page by page; parsing runs at most this many embedding batches ahead
+        self.ingest_queue_batches = int(os.getenv("INGEST_QUEUE_BATCHES", "4"))
+
+        # Background ingest jobs, so uploads don't block the Streamlit script thread;
+        # sessions are served round-robin and each may only queue a few jobs
+        self.jobs = IngestJobQueue(
+            workers=int(os.getenv("INGEST_JOB_WORKERS", "2")),
+            max_queued_per_session=int(os.getenv("INGEST_JOB_MAX_PER_SESSION", "2")),
+            result_ttl=float(os.getenv("INGEST_JOB_RESULT_TTL", "3600")),
+            release=self.release_vectorstore
+        )
+
+        # Semantic answer cache for near-duplicate questions; ANSWER_CACHE_MAX_ENTRIES=0 disables it
+        answer_cache_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+        self.answer_cache = None
+        if answer_cache_entries > 0:
+            self.answer_cache = SemanticAnswerCache(
+                threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+                ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+                max_entries=answer_cache_entries
+            )
+
+        # Optional read-only, memory-mapped index shared by all sessions on the same corpus
+        self.shared_index = None
+        if os.getenv("SHARED_INDEX", "0") == "1":
+            self.shared_index = SharedIndexRegistry(
+                os.getenv(
+                    "SHARED_INDEX_DIR",
+                    os.path.join(tempfile.gettempdir(), "studymate_shared_index")
+                ),
+                # Compact int8/float16 scan with a float32 rerank of the shortlist
+                quantization=os.getenv("VECTOR_QUANTIZATION", "none"),
+                rerank_factor=int(os.getenv("VECTOR_RERANK_FACTOR", "4"))
+            )
+        elif os.getenv("VECTOR_QUANTIZATION", "none") != "none":
+            # Per-session Chroma stores always keep float32 vectors
+            logger.warning("VECTOR_QUANTIZATION=%s has no effect without SHARED_INDEX=1; vectors stay float32",
+                           os.getenv("VECTOR_QUANTIZATION"))
+
+        # Per-store bookkeeping, dropped automatically when a session's store is garbage collected
+        self._store_info: "weakref.WeakKeyDictionary[Any, StoreInfo]" = weakref.WeakKeyDictionary()
+
+        # Server-wide registry of session stores: when the stores in memory exceed
+        # SESSION_MEMORY_BUDGET_MB (0 = no budget), idle ones are spilled to disk and
+        # reloaded on their next use
+        self.sessions = SessionMemoryManager(
+            spill_dir=os.getenv(
+                "SESSION_SPILL_DIR",
+                os.path.join(tempfile.gettempdir(), "studymate_sessions")
+            ),
+            budget_bytes=int(os.getenv("SESSION_MEMORY_BUDGET_MB", "2048")) * 1024 * 1024,
+            idle_seconds=float(os.getenv("SESSION_IDLE_SECONDS", "300")),
+            spill_ttl=float(os.getenv("SESSION_SPILL_TTL", "3600")),
+            measure=self.store_nbytes,
+            spill=self.spill_vectorstore,
+            restore=self.restore_vectorstore,
+            release=self.release_vectorstore
+        )
+
+        # Streaming answer latencies: time-to-first-token and full generation time
+        self.ttft = LatencyRecorder()
+        self.stream_latency = LatencyRecorder()
+
+        # Opt-in on-disk chunk-and-vector cache keyed by PDF content; it keeps uploaded
+        # text after the session ends, so it stays off unless EMBEDDING_CACHE_MAX_MB > 0
+        cache_max_mb = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "0"))
+        self.embedding_cache = None
+        if cache_max_mb > 0:
+            self.embedding_cache = EmbeddingCache(
+                cache_dir=os.getenv(
+                    "EMBEDDING_CACHE_DIR",
+                    os.path.join(tempfile.gettempdir(), "studymate_embedding_cache")
+                ),
+                max_bytes=cache_max_mb * 1024 * 1024
+            )
         
         # Prompt templates
         self.qna_system_message = """
@@ -72,82 +282,619 @@ class RAGPipeline:
         Continue this pattern for all questions. Make sure questions test different aspects of the material and are at an appropriate difficulty level.
         """
     
-    def build_vectorstore_in_memory(self, pdf_files: List[Any]) -> Tuple[Any, int, int]:
+    def build_vectorstore_in_memory(self, pdf_files: List[Any], parallel: Optional[bool] = None,
+                                    shared: Optional[bool] = None,
+                                    progress: Optional[ProgressCallback] = None) -> Tuple[Any, int, int]:
         """
         Build vector store from uploaded PDF files in memory (no persistence).
+
+        PDFs already seen with the same splitter and embedding settings are served
+        from the embedding cache, so only their cached vectors are loaded into Chroma.
+        Other files are streamed: pages are read and split one at a time on a
+        background thread, and each batch of chunks is embedded and inserted before
+        the next is taken, through a bounded queue, so memory stays flat however
+        large the upload is. In parallel mode, page extraction and chunking run in a
+        worker process pool (a few files ahead at most) and each file is embedded as
+        soon as its chunks are ready, in upload order, so the resulting chunks and
+        metadata match the serial path exactly.
+
+        In shared-index mode the store is a read-only, memory-mapped index shared by
+        every session that uploads the same corpus; if the corpus is already loaded,
+        nothing is parsed or embedded.
         
         Args:
             pdf_files: List of uploaded PDF file objects
+            parallel: Parse PDFs in the worker process pool; defaults to True when
+                INGEST_WORKERS > 1 and more than one file needs parsing
+            shared: Use the shared memory-mapped index; defaults to True when SHARED_INDEX=1
+            progress: Called as each file starts, is parsed, embedded and indexed; an
+                exception raised from it (e.g. a cancelled job) aborts the build
             
         Returns:
             Tuple of (vectorstore, page_count, chunk_count)
         """
-        all_docs = []
-        temp_files = []
+        with self.instrumentation.span('ingest', files=len(pdf_files)) as span:
+            files = self._prepare_files(pdf_files)
 
-        try:
-            # Process each PDF file using temporary files
-            for idx, pdf_file in enumerate(pdf_files, start=1):
-                # Create a temporary file for each PDF
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                    temp_file.write(pdf_file.getvalue())
-                    temp_path = temp_file.name
-                    temp_files.append(temp_path)
-
-                # Load the PDF from temporary file
-                loader = PyPDFLoader(temp_path)
-                docs = loader.load()
-                all_docs.extend(docs)
-
-            # Split documents into chunks
-            text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-                encoding_name='cl100k_base',
-                chunk_size=512,
-                chunk_overlap=16
-            )
-            chunks = text_splitter.split_documents(all_docs)
+            if shared is None:
+                shared = self.shared_index is not None
+            if shared:
+                if self.shared_index is None:
+                    raise ValueError("Shared index mode is not enabled (set SHARED_INDEX=1)")
+                info = StoreInfo(fingerprint=self._fingerprint([content_hash for _, _, _, content_hash in files]))
+                vectorstore = self.shared_index.acquire(
+                    info.fingerprint,
+                    lambda: self._collect_entries(files, parallel, progress),
+                    self.embedding_engine
+                )
+                info.sources = {source: SourceInfo(**stats) for source, stats in vectorstore.sources.items()}
+                info.lexical = self._shared_lexical_index(vectorstore)
+            else:
+                vectorstore = self._new_chroma_store()
+                info = StoreInfo(fingerprint="", lexical=BM25Index())
+                try:
+                    self._add_files_to_chroma(vectorstore, info, files, parallel, progress)
+                except Exception:
+                    # Don't leave a half-built collection behind (failed or cancelled ingest)
+                    vectorstore.delete_collection()
+                    raise
+                info.fingerprint = self._fingerprint([source.content_hash for source in info.sources.values()])
+
+            self._store_info[vectorstore] = info
+            span.set(shared=bool(shared), pages=info.page_count, chunks=info.chunk_count)
+            return vectorstore, info.page_count, info.chunk_count
+
+    def add_documents(self, vectorstore: Any, pdf_files: List[Any], parallel: Optional[bool] = None,
+                      progress: Optional[ProgressCallback] = None) -> Tuple[Any, int, int]:
+        """
+        Add PDFs to an existing store, embedding only the new files' chunks.
+
+        A file whose name is already in the store replaces the old version; an
+        identical re-upload is ignored. Chroma stores are updated in place; shared-index
+        stores are read-only, so a new shared corpus is assembled from the existing
+        vectors plus the new ones (no re-embedding) and the old handle is released.
+
+        Args:
+            vectorstore: Store returned by build_vectorstore_in_memory
+            pdf_files: List of uploaded PDF file objects to add
+            parallel: See ``build_vectorstore_in_memory``
+            progress: See ``build_vectorstore_in_memory``; if it aborts a Chroma update,
+                the files indexed before that stay in the store
+
+        Returns:
+            Tuple of (vectorstore, page_count, chunk_count) for the updated corpus; the
+            vectorstore is a new object in shared-index mode
+        """
+        with self.instrumentation.span('ingest.add', files=len(pdf_files)):
+            info = self._require_store_info(vectorstore)
+            files = [
+                f for f in self._prepare_files(pdf_files)
+                if f[2] not in info.sources or info.sources[f[2]].content_hash != f[3]
+            ]
+            if not files:
+                return vectorstore, info.page_count, info.chunk_count
+            replaced = [source for _, _, source, _ in files if source in info.sources]
+
+            if isinstance(vectorstore, NumpyVectorStore):
+                return self._rebuild_shared(vectorstore, info, drop=replaced, files=files, parallel=parallel,
+                                            progress=progress)
+
+            self._delete_sources_from_chroma(vectorstore, info, replaced)
+            try:
+                self._add_files_to_chroma(vectorstore, info, files, parallel, progress)
+            finally:
+                info.fingerprint = self._fingerprint([source.content_hash for source in info.sources.values()])
+            return vectorstore, info.page_count, info.chunk_count
 
-            # Create in-memory vector store (no persistence) - Fixed embedding model
-            embedding_model = HuggingFaceEmbeddings(model_name=self.embedding_model_name)
-            vectorstore = Chroma.from_documents(
-                documents=chunks,
-                embedding=embedding_model,
+    def submit_ingest(self, session_id: str, pdf_files: List[Any], vectorstore: Any = None,
+                      attach: bool = False) -> IngestJob:
+        """
+        Ingest PDFs on the background job queue instead of the caller's thread.
+
+        Without a vector store the job builds a new one (``build_vectorstore_in_memory``);
+        with one it adds the files to it (``add_documents``), pinning the session's store
+        in ``sessions`` while it runs. Poll the job with
+        ``jobs.get(job.id)``, cancel it with ``jobs.cancel(job.id)`` and take the
+        (vectorstore, page_count, chunk_count) result with ``jobs.claim(job.id)``.
+
+        With ``attach`` the job works on the store registered for the session in
+        ``sessions`` (building one if there is none) and registers the result there
+        itself, so nobody has to claim the job; its result then holds no store.
+
+        Args:
+            session_id: Owner of the job, used to share workers fairly between sessions
+            pdf_files: List of uploaded PDF file objects
+            vectorstore: Existing store to add the files to, if any
+            attach: Register the resulting store for the session when the job finishes
+
+        Returns:
+            The queued IngestJob
+        """
+        # The job keeps its own references to the uploads, so clearing the upload widget doesn't affect it
+        files = list(pdf_files)
+        sources = [getattr(pdf_file, 'name', None) or f"document-{i + 1}.pdf" for i, pdf_file in enumerate(files)]
+        # Set when the job is cancelled, also after its last progress report (e.g. the session was deleted)
+        cancelled = threading.Event()
+        if attach:
+            def work(progress: ProgressCallback) -> Tuple[Any, int, int]:
+                with self.sessions.use(session_id, default=vectorstore) as current:
+                    if current is None:
+                        result = self.build_vectorstore_in_memory(files, progress=progress)
+                    else:
+                        result = self.add_documents(current, files, progress=progress)
+                    if not self.sessions.attach(session_id, result[0], unless=cancelled):
+                        # Cancelled or dropped while finishing: don't bring the session back
+                        if result[0] is not current:
+                            self.release_vectorstore(result[0])
+                        raise JobCancelled(f"Ingest for session {session_id} was cancelled")
+                # The store now belongs to the registry; an expiring job result must not release it
+                return None, result[1], result[2]
+        elif vectorstore is None:
+            work = lambda progress: self.build_vectorstore_in_memory(files, progress=progress)  # noqa: E731
+        else:
+            def work(progress: ProgressCallback) -> Tuple[Any, int, int]:
+                # Not spilled while files are added; if it was spilled since the job was queued, it is reloaded
+                with self.sessions.use(session_id, default=vectorstore) as current:
+                    result = self.add_documents(current, files, progress=progress)
+                    if result[0] is not current and session_id in self.sessions:
+                        # A rebuilt shared-index handle replaces the released one before the pin is let go
+                        self.sessions.attach(session_id, result[0], unless=cancelled)
+                    return result
+        return self.jobs.submit(session_id, sources, work, cancel_event=cancelled)
+
+    def remove_documents(self, vectorstore: Any, sources: List[str]) -> Tuple[Any, int, int]:
+        """
+        Remove PDFs from an existing store by source file name.
+
+        Args:
+            vectorstore: Store returned by build_vectorstore_in_memory
+            sources: File names to remove (the ``source`` metadata of their chunks)
+
+        Returns:
+            Tuple of (vectorstore, page_count, chunk_count) for the updated corpus; the
+            vectorstore is a new object in shared-index mode
+        """
+        with self.instrumentation.span('ingest.remove', sources=len(sources)):
+            info = self._require_store_info(vectorstore)
+            drop = [source for source in sources if source in info.sources]
+            if not drop:
+                return vectorstore, info.page_count, info.chunk_count
+
+            if isinstance(vectorstore, NumpyVectorStore):
+                return self._rebuild_shared(vectorstore, info, drop=drop, files=[])
+
+            self._delete_sources_from_chroma(vectorstore, info, drop)
+            info.fingerprint = self._fingerprint([source.content_hash for source in info.sources.values()])
+            return vectorstore, info.page_count, info.chunk_count
+
+    def _new_chroma_store(self) -> Any:
+        """Create an empty in-memory Chroma store (no persistence) using the shared embedding engine."""
+        # Imported here: chromadb takes about a second to import and isn't needed before the first upload.
+        from langchain_community.vectorstores import Chroma
+
+        # chromadb's shared in-memory client isn't safe to create from several threads at once
+        with _chroma_init_lock:
+            return Chroma(
+                # A unique collection name keeps sessions from sharing Chroma's default collection
+                collection_name=f"studymate-{uuid.uuid4().hex}",
+                embedding_function=self.embedding_engine,
                 # No persist_directory = in-memory only
             )
-            
-            return vectorstore, len(all_docs), len(chunks)
-            
+
+    def _require_store_info(self, vectorstore: Any) -> "StoreInfo":
+        info = self._store_info.get(vectorstore)
+        if info is None:
+            raise ValueError("Vector store was not built by this pipeline")
+        return info
+
+    def _add_files_to_chroma(self, vectorstore: Any, info: "StoreInfo", files: List[Tuple[Any, memoryview, str, str]],
+                             parallel: Optional[bool] = None, progress: Optional[ProgressCallback] = None,
+                             lexical_part: int = 2048) -> None:
+        """
+        Embed (or load from cache) files into a Chroma store and record them in ``info``.
+
+        Each batch is inserted as soon as it is embedded; the BM25 index is built in
+        parts of ``lexical_part`` chunks. A file that fails part-way is removed again.
+        """
+        for (_, _, source, content_hash), batches in zip(files, self._iter_entries(files, parallel, progress)):
+            pages = chunks = nbytes = 0
+            texts: List[str] = []
+            ids: List[str] = []
+            parts = 0
+            info.corpus = None
+            try:
+                with self.instrumentation.span('ingest.index') as span:
+                    for entry in batches:
+                        batch_ids = self._add_to_vectorstore(vectorstore, entry)
+                        pages += entry.page_count
+                        chunks += len(entry.texts)
+                        # Chroma keeps each vector twice: in its HNSW index and in its record store
+                        nbytes += sum(len(text) for text in entry.texts) + 2 * entry.vectors.nbytes
+                        if info.lexical is not None:
+                            texts.extend(entry.texts)
+                            ids.extend(batch_ids)
+                            if len(texts) >= lexical_part:
+                                info.lexical.add_segment(source, texts, ids, append=bool(parts))
+                                texts, ids, parts = [], [], parts + 1
+                    if info.lexical is not None and (texts or not parts):
+                        info.lexical.add_segment(source, texts, ids, append=bool(parts))
+                    span.set(chunks=chunks)
+            except BaseException:
+                # Don't leave part of a file behind (failed or cancelled ingest)
+                vectorstore._collection.delete(where={'source': source})
+                if info.lexical is not None:
+                    info.lexical.remove_segment(source)
+                raise
+            info.sources[source] = SourceInfo(content_hash, pages, chunks, nbytes)
+            if progress is not None:
+                progress('indexed', source, chunks=chunks)
+        if info.lexical is not None:
+            # Merge the new parts now rather than on the first question
+            info.lexical.compact()
+
+    @staticmethod
+    def _delete_sources_from_chroma(vectorstore: Any, info: "StoreInfo", sources: List[str]) -> None:
+        for source in sources:
+            vectorstore._collection.delete(where={'source': source})
+            info.sources.pop(source, None)
+            info.corpus = None
+            if info.lexical is not None:
+                info.lexical.remove_segment(source)
+
+    def _rebuild_shared(self, vectorstore: NumpyVectorStore, info: "StoreInfo", drop: List[str],
+                        files: List[Tuple[Any, memoryview, str, str]], parallel: Optional[bool] = None,
+                        progress: Optional[ProgressCallback] = None) -> Tuple[Any, int, int]:
+        """Assemble a new shared corpus from a handle's kept rows plus new files, then swap handles."""
+        sources = {source: stats for source, stats in info.sources.items() if source not in drop}
+        for _, _, source, content_hash in files:
+            sources.pop(source, None)
+        fingerprint = self._fingerprint(
+            [stats.content_hash for stats in sources.values()] + [content_hash for _, _, _, content_hash in files]
+        )
+
+        def build() -> Tuple[List[str], List[dict], np.ndarray, int, Dict[str, dict]]:
+            keep = [i for i, metadata in enumerate(vectorstore.metadatas) if metadata.get('source') in sources]
+            texts, metadatas, vectors, page_count, new_sources = self._collect_entries(files, parallel, progress)
+            parts = [np.asarray(vectorstore.vectors)[keep]] if keep else []
+            if len(texts):
+                parts.append(vectors)
+            all_vectors = np.concatenate(parts) if parts else np.empty((0, 0), dtype=np.float32)
+            all_sources = {source: asdict(stats) for source, stats in sources.items()}
+            all_sources.update(new_sources)
+            return (
+                [vectorstore.texts[i] for i in keep] + texts,
+                [vectorstore.metadatas[i] for i in keep] + metadatas,
+                all_vectors,
+                sum(stats['page_count'] for stats in all_sources.values()),
+                all_sources
+            )
+
+        new_store = self.shared_index.acquire(fingerprint, build, self.embedding_engine)
+        self.release_vectorstore(vectorstore)
+        new_info = StoreInfo(
+            fingerprint=fingerprint,
+            sources={source: SourceInfo(**stats) for source, stats in new_store.sources.items()},
+            lexical=self._shared_lexical_index(new_store)
+        )
+        self._store_info[new_store] = new_info
+        return new_store, new_info.page_count, new_info.chunk_count
+
+    @staticmethod
+    def _shared_lexical_index(vectorstore: NumpyVectorStore) -> BM25Index:
+        """Return the BM25 index of a shared corpus, building it once for all its sessions."""
+        lexical = vectorstore.extras.get('bm25')
+        if lexical is None:
+            lexical = BM25Index()
+            lexical.add_segment('corpus', vectorstore.texts, range(len(vectorstore.texts)))
+            lexical.compact()
+            lexical = vectorstore.extras.setdefault('bm25', lexical)
+        return lexical
+
+    def _prepare_files(self, pdf_files: List[Any]) -> List[Tuple[Any, memoryview, str, str]]:
+        """
+        Resolve each upload to (pdf_file, buffer, source_name, content_hash).
+
+        Uploads are read through a zero-copy view; no temp files are written.
+        Duplicate names within one upload get a numeric suffix so sources stay unique.
+        """
+        files = []
+        seen = set()
+        for pdf_file in pdf_files:
+            buffer = pdf_buffer(pdf_file)
+            source = getattr(pdf_file, 'name', None) or f"document-{len(files) + 1}.pdf"
+            base, suffix = source, 2
+            while source in seen:
+                source = f"{base} ({suffix})"
+                suffix += 1
+            seen.add(source)
+            files.append((pdf_file, buffer, source, hashlib.sha256(buffer).hexdigest()))
+        return files
+
+    def _iter_entries(self, files: List[Tuple[Any, memoryview, str, str]], parallel: Optional[bool] = None,
+                      progress: Optional[ProgressCallback] = None) -> Iterator[Iterator[CacheEntry]]:
+        """
+        Yield, per file in upload order, an iterator over the file's embedded chunks in batches.
+
+        Each batch is a CacheEntry whose ``page_count`` is the pages completed with it,
+        so a file's batches add up to its page and chunk counts. A file's batches must
+        be consumed before the next file is taken.
+
+        Args:
+            files: Output of ``_prepare_files``
+            parallel: See ``build_vectorstore_in_memory``
+            progress: Receives 'started', 'opened', 'parsed' and 'embedded' events per file
+        """
+        # Resolve cache hits up front so only misses are parsed
+        pending = []
+        for pdf_file, buffer, source, content_hash in files:
+            entry = None
+            cache_key = None
+            if self.embedding_cache is not None:
+                cache_key = self.embedding_cache.make_key(content_hash, self._ingest_settings())
+                entry = self.embedding_cache.get(cache_key, source_bytes=buffer.nbytes)
+                self.instrumentation.count('embedding_cache_lookups', result='hit' if entry is not None else 'miss')
+                if entry is not None:
+                    # The same content may have been uploaded under another name
+                    entry.metadatas = [{**metadata, 'source': source} for metadata in entry.metadatas]
+            pending.append((pdf_file, buffer, source, cache_key, entry))
+
+        misses = [item for item in pending if item[4] is None]
+        if parallel is None:
+            parallel = self.ingest_workers > 1 and len(misses) > 1
+        split_args = (self.encoding_name, self.chunk_size, self.chunk_overlap, self.chunker)
+        batch_size = self.embedding_engine.batch_size
+        if parallel and misses:
+            # Worker processes need their own copy of the bytes; results come back
+            # in submission order while later files are still parsing
+            pool = self._get_ingest_pool()
+
+            def parse_in_pool() -> Iterator[Iterable[ChunkBatch]]:
+                # Only a few files ahead of the embedder, so parsed files don't pile up in memory
+                futures = deque()
+                for _, buffer, source, _, _ in misses:
+                    futures.append(pool.submit(parse_and_split, bytes(buffer), source, *split_args))
+                    if len(futures) > self.ingest_workers:
+                        yield batches_of(futures.popleft().result(), batch_size)
+                while futures:
+                    yield batches_of(futures.popleft().result(), batch_size)
+
+            batch_iters = parse_in_pool()
+        else:
+            batch_iters = (
+                prefetch(iter_chunk_batches(pdf_file if hasattr(pdf_file, 'seek') else bytes(buffer), source,
+                                            *split_args, batch_size=batch_size),
+                         self.ingest_queue_batches)
+                for pdf_file, buffer, source, _, _ in misses
+            )
+
+        for _, _, source, cache_key, entry in pending:
+            if progress is not None:
+                progress('started', source)
+            if entry is None:
+                writer = self.embedding_cache.writer(cache_key) if cache_key is not None else None
+                yield self._embed_batches(next(batch_iters), source, progress, writer)
+            else:
+                if progress is not None:
+                    progress('parsed', source, pages=entry.page_count, chunks=len(entry.texts))
+                    progress('embedded', source, pages=entry.page_count, chunks=len(entry.texts))
+                self.instrumentation.count('pages_ingested', entry.page_count)
+                self.instrumentation.count('chunks_ingested', len(entry.texts))
+                yield iter([entry])
+
+    def _embed_batches(self, batches: Iterable[ChunkBatch], source: str, progress: Optional[ProgressCallback] = None,
+                       writer: Optional[CacheWriter] = None) -> Iterator[CacheEntry]:
+        """
+        Embed a file's chunk batches one at a time, writing them to the embedding cache as they go.
+
+        The cache entry is only committed once the whole file has been embedded.
+
+        Args:
+            batches: Chunk batches of one file, in order
+            source: File name reported with progress events
+            progress: Receives 'opened', then 'parsed' and 'embedded' events per batch
+            writer: Embedding cache entry to stream the file into
+
+        Yields:
+            CacheEntry per batch with chunk texts, metadata, vectors and completed pages
+        """
+        pages = chunks = 0
+        parse_time = split_time = 0.0
+        opened = False
+        try:
+            with self.instrumentation.span('ingest.embed') as span:
+                for batch in batches:
+                    if progress is not None and not opened:
+                        progress('opened', source, pages=batch.page_total)
+                        opened = True
+                    parse_time += batch.parse_time
+                    split_time += batch.split_time
+                    if progress is not None:
+                        progress('parsed', source, pages=batch.pages, chunks=len(batch.texts))
+                    vectors = self.embedding_engine.embed_documents(batch.texts) if batch.texts else []
+                    entry = CacheEntry(
+                        texts=batch.texts,
+                        metadatas=batch.metadatas,
+                        vectors=np.asarray(vectors, dtype=np.float32).reshape(len(batch.texts), -1) if batch.texts else np.empty((0, 0), dtype=np.float32),
+                        page_count=batch.pages
+                    )
+                    if writer is not None:
+                        writer.append(entry)
+                    pages += batch.pages
+                    chunks += len(batch.texts)
+                    # Reported per batch, so progress moves (and cancellation is noticed) within large files
+                    if progress is not None:
+                        progress('embedded', source, pages=batch.pages, chunks=len(batch.texts))
+                    yield entry
+                span.set(pages=pages, chunks=chunks)
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
         finally:
-            # Clean up temporary files
-            for temp_path in temp_files:
-                try:
-                    os.unlink(temp_path)
-                except OSError:
-                    pass  # File already deleted or doesn't exist
-    
-    def make_prediction(self, vectorstore: Any, user_input: str, k: int = 5) -> Tuple[str, List[str]]:
+            close = getattr(batches, 'close', None)
+            if close is not None:
+                # Stops the background parser if the file was abandoned part-way
+                close()
+        if writer is not None:
+            writer.commit(pages)
+        self.instrumentation.record('ingest.parse', parse_time, pages=pages)
+        self.instrumentation.record('ingest.chunk', split_time, chunks=chunks)
+        self.instrumentation.count('pages_ingested', pages)
+        self.instrumentation.count('chunks_ingested', chunks)
+
+    def _collect_entries(self, files: List[Tuple[Any, memoryview, str, str]], parallel: Optional[bool] = None,
+                         progress: Optional[ProgressCallback] = None) -> Tuple[List[str], List[dict], np.ndarray, int, Dict[str, dict]]:
+        """Concatenate all files' entries into (texts, metadatas, vectors, page_count, per-source stats)."""
+        texts: List[str] = []
+        metadatas: List[dict] = []
+        vectors = []
+        page_count = 0
+        sources: Dict[str, dict] = {}
+        for (_, _, source, content_hash), batches in zip(files, self._iter_entries(files, parallel, progress)):
+            file_pages = file_chunks = 0
+            for entry in batches:
+                texts.extend(entry.texts)
+                metadatas.extend(entry.metadatas)
+                if len(entry.texts):
+                    vectors.append(entry.vectors)
+                file_pages += entry.page_count
+                file_chunks += len(entry.texts)
+            page_count += file_pages
+            sources[source] = asdict(SourceInfo(content_hash, file_pages, file_chunks))
+            if progress is not None:
+                progress('indexed', source, chunks=file_chunks)
+        dimension = vectors[0].shape[1] if vectors else 0
+        matrix = np.concatenate(vectors) if vectors else np.empty((0, dimension), dtype=np.float32)
+        return texts, metadatas, matrix, page_count, sources
+
+    def _fingerprint(self, content_hashes: List[str]) -> str:
+        """Fingerprint a corpus from its files' content hashes and the ingest settings."""
+        return EmbeddingCache.make_key("".join(sorted(content_hashes)), self._ingest_settings())
+
+    def _get_ingest_pool(self) -> ProcessPoolExecutor:
+        """Return the shared PDF parsing process pool, creating it on first use."""
+        with self._ingest_pool_lock:
+            if self._ingest_pool is None:
+                # Spawn rather than fork: the parent holds model threads that must not be forked
+                self._ingest_pool = ProcessPoolExecutor(
+                    max_workers=self.ingest_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._ingest_pool
+
+    def _ingest_settings(self) -> dict:
+        """Settings that change chunking or embedding output, used in cache keys."""
+        return {
+            'loader': 'pypdf-in-memory',
+            'splitter': 'token-offset-tiktoken' if self.chunker == 'token' else 'recursive-character-tiktoken',
+            'encoding_name': self.encoding_name,
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'embedding_model': self.embedding_model_name
+        }
+
+    @staticmethod
+    def _add_to_vectorstore(vectorstore: Any, entry: CacheEntry, batch_size: int = 4096) -> List[str]:
         """
-        Generate prediction based on user input and in-memory vector store.
-        
+        Insert precomputed chunks and vectors into a Chroma store without re-embedding.
+
+        Returns:
+            The Chroma ids assigned to the chunks, in order
+        """
+        ids = [str(uuid.uuid4()) for _ in entry.texts]
+        for start in range(0, len(entry.texts), batch_size):
+            end = start + batch_size
+            vectorstore._collection.add(
+                ids=ids[start:end],
+                embeddings=entry.vectors[start:end].tolist(),
+                documents=entry.texts[start:end],
+                metadatas=entry.metadatas[start:end]
+            )
+        return ids
+
+    def _retriever(self, vectorstore: Any, search_type: str = 'vector') -> Retriever:
+        """Return the cached retriever for a store and search type, building it on first use."""
+        with self._retrievers_lock:
+            retrievers = self._retrievers.get(vectorstore)
+            if retrievers is None:
+                retrievers = self._retrievers[vectorstore] = {}
+            retriever = retrievers.get(search_type)
+            if retriever is None:
+                info = self._store_info.get(vectorstore)
+                retriever = retrievers[search_type] = Retriever(
+                    vectorstore,
+                    search_type=search_type,
+                    lexical=info.lexical if info is not None else None,
+                    embedding=self.embedding_engine,
+                    stage_latency=self.retrieval_latency,
+                    instrumentation=self.instrumentation
+                )
+        return retriever
+
+    def _retrieve(self, vectorstore: Any, query: str, k: int, query_vector: Optional[List[float]] = None,
+                  search_type: str = 'vector') -> List[Any]:
+        """
+        Retrieve the k most relevant chunks for a query.
+
         Args:
-            vectorstore: The in-memory vector store to query
-            user_input: User's question
-            k: Number of relevant documents to retrieve
-            
+            vectorstore: Store to search
+            query: Query text
+            k: Number of chunks to return
+            query_vector: Precomputed query embedding, so the question isn't embedded twice
+            search_type: 'vector', 'lexical' (BM25) or 'hybrid' (both, fused by reciprocal rank)
+
         Returns:
-            Tuple of (prediction, context_list)
+            List of Documents, best first
         """
-        # Create retriever directly from the vectorstore
-        retriever = vectorstore.as_retriever(
-            search_type='similarity',
-            search_kwargs={'k': k}
-        )
-        
-        # Fixed deprecated method call
-        relevant_document_chunks = retriever.invoke(user_input)
-        context_list = [d.page_content for d in relevant_document_chunks]
-        context_for_query = ". ".join(context_list)
+        return self._retriever(vectorstore, search_type).search(query, k, query_vector)
+
+    def _corpus_fingerprint(self, vectorstore: Any) -> str:
+        """Return the content fingerprint of a store built by this pipeline."""
+        info = self._store_info.get(vectorstore)
+        if info is not None:
+            return info.fingerprint
+        # Stores built elsewhere are only ever equal to themselves
+        return f"store-{id(vectorstore)}"
+
+    def _cache_lookup(self, vectorstore: Any, mode: str, k: int, query: str) -> Tuple[Any, Tuple, List[float]]:
+        """
+        Embed a query and look it up in the answer cache.
+
+        Returns:
+            Tuple of (cached_value_or_None, cache_bucket, query_vector)
+        """
+        start = time.perf_counter()
+        query_vector = self.embedding_engine.embed_query(query)
+        elapsed = time.perf_counter() - start
+        self.retrieval_latency['embed'].record(elapsed)
+        self.instrumentation.record('retrieve.embed', elapsed)
+        bucket = (self._corpus_fingerprint(vectorstore), mode, k)
+        cached = None
+        if self.answer_cache is not None:
+            cached = self.answer_cache.get(bucket, query_vector, mode=mode)
+            self.instrumentation.count('answer_cache_lookups', mode=mode, result='hit' if cached is not None else 'miss')
+        return cached, bucket, query_vector
 
+    def _cache_store(self, bucket: Tuple, query_vector: List[float], value: Any) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.put(bucket, query_vector, value)
+
+    @staticmethod
+    def _detailed_context(relevant_document_chunks: List[Any]) -> List[dict]:
+        """Build citation entries (content, source, page, chunk_id) for retrieved chunks."""
+        return [
+            {
+                'content': doc.page_content,
+                'source': doc.metadata.get('source', 'Unknown'),
+                'page': doc.metadata.get('page', 'Unknown'),
+                'chunk_id': i + 1
+            }
+            for i, doc in enumerate(relevant_document_chunks)
+        ]
+
+    def _qna_prompt(self, context_list: List[str], user_input: str, mode: str = 'qa') -> List[dict]:
+        """Build the chat messages for a Q&A request and record its prompt-token count."""
+        context_for_query = ". ".join(context_list)
         prompt = [
             {'role': 'system', 'content': self.qna_system_message},
             {'role': 'user', 'content': self.qna_user_message_template.format(
@@ -155,19 +902,136 @@ class RAGPipeline:
                 question=user_input
             )}
         ]
+        self._record_prompt_tokens(mode, prompt)
+        return prompt
+
+    def _pack_context(self, documents: List[Any], mode: str) -> List[Any]:
+        """Deduplicate, merge and pack retrieved chunks into the mode's token budget."""
+        with self.instrumentation.span('pack_context', mode=mode, chunks_in=len(documents)) as span:
+            packed = pack_context(documents, get_encoding(self.encoding_name), self.context_token_budgets[mode])
+            span.set(chunks_out=len(packed.documents), context_tokens=packed.tokens)
+        return packed.documents
+
+    def _fetch_k(self, k: int) -> int:
+        """Chunks to fetch from the index for k prompt chunks: the rerank shortlist when reranking."""
+        return max(k, self.rerank_candidates) if self.reranker is not None else k
+
+    def _rerank(self, query: str, documents: List[Any], k: int, mode: str) -> List[Any]:
+        """Keep the k candidates the cross-encoder scores highest (a no-op when reranking is off)."""
+        if self.reranker is None or not documents:
+            return documents[:k]
+        with self.instrumentation.span('rerank', mode=mode, candidates=len(documents), k=k):
+            return self.reranker.rerank(query, documents, k)
 
-        client = Groq(api_key=self.api_key)
+    def _retrieve_context(self, vectorstore: Any, query: str, k: int, query_vector: Optional[List[float]], mode: str) -> List[Any]:
+        """Retrieve the k most relevant chunks with the mode's search type and pack them for the prompt."""
+        with self.instrumentation.span('retrieve', mode=mode, k=k, search_type=self.search_types[mode]) as span:
+            documents = self._retrieve(vectorstore, query, self._fetch_k(k), query_vector, search_type=self.search_types[mode])
+            span.set(chunks=len(documents))
+        documents = self._rerank(query, documents, k, mode)
+        return self._pack_context(documents, mode)
+
+    def _record_prompt_tokens(self, mode: str, prompt: List[dict]) -> None:
+        tokens = count_message_tokens(prompt, get_encoding(self.encoding_name))
+        self.prompt_tokens.setdefault(mode, ValueRecorder()).record(tokens)
+        self.instrumentation.count('prompt_tokens', tokens, mode=mode)
+
+    def _complete(self, prompt: List[dict], temperature: float) -> str:
+        """Run a blocking chat completion on the shared client and return the answer text."""
+        with self.instrumentation.span('llm', model=self.model_name) as span:
+            answer = self.llm.complete(prompt, model=self.model_name, temperature=temperature)
+            span.set(answer_chars=len(answer))
+        return answer
+
+    async def _acomplete(self, prompt: List[dict], temperature: float) -> str:
+        """Async variant of _complete on the pooled async client."""
+        with self.instrumentation.span('llm', model=self.model_name) as span:
+            answer = await self.llm.acomplete(prompt, model=self.model_name, temperature=temperature)
+            span.set(answer_chars=len(answer))
+        return answer
+
+    def _stream_completion(self, prompt: List[dict], temperature: float,
+                           on_complete: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+        """
+        Stream a chat completion token by token.
+
+        Time-to-first-token is recorded in ``self.ttft`` and the full generation
+        time in ``self.stream_latency``. Errors are yielded as a final message so
+        callers rendering partial output don't need their own error handling.
+        ``on_complete`` receives the full answer once a stream finishes successfully.
+        """
+        start = time.perf_counter()
+        first_token = True
+        tokens = []
         try:
-            response = client.chat.completions.create(
-                model=self.model_name,
-                messages=prompt,
-                temperature=0
-            )
-            prediction = response.choices[0].message.content.strip()
+            for token in self.llm.stream(prompt, model=self.model_name, temperature=temperature):
+                if first_token:
+                    self.ttft.record(time.perf_counter() - start)
+                    self.instrumentation.record('llm.ttft', time.perf_counter() - start, model=self.model_name)
+                    first_token = False
+                tokens.append(token)
+                yield token
+            self.stream_latency.record(time.perf_counter() - start)
+            self.instrumentation.record('llm.stream', time.perf_counter() - start, model=self.model_name, tokens=len(tokens))
+        except Exception as e:
+            self.instrumentation.count('errors', stage='llm.stream')
+            yield f"❌ Error: {e}"
+            return
+        if on_complete is not None:
+            on_complete("".join(tokens).strip())
+
+    async def _astream_completion(self, prompt: List[dict], temperature: float,
+                                  on_complete: Optional[Callable[[str], None]] = None) -> AsyncIterator[str]:
+        """Async variant of _stream_completion on the pooled async client."""
+        start = time.perf_counter()
+        first_token = True
+        tokens = []
+        try:
+            async for token in self.llm.astream(prompt, model=self.model_name, temperature=temperature):
+                if first_token:
+                    self.ttft.record(time.perf_counter() - start)
+                    self.instrumentation.record('llm.ttft', time.perf_counter() - start, model=self.model_name)
+                    first_token = False
+                tokens.append(token)
+                yield token
+            self.stream_latency.record(time.perf_counter() - start)
+            self.instrumentation.record('llm.stream', time.perf_counter() - start, model=self.model_name, tokens=len(tokens))
         except Exception as e:
-            prediction = f"❌ Error: {e}"
+            self.instrumentation.count('errors', stage='llm.stream')
+            yield f"❌ Error: {e}"
+            return
+        if on_complete is not None:
+            on_complete("".join(tokens).strip())
+
+    def make_prediction(self, vectorstore: Any, user_input: str, k: int = 5) -> Tuple[str, List[str]]:
+        """
+        Generate prediction based on user input and in-memory vector store.
+        
+        Args:
+            vectorstore: The in-memory vector store to query
+            user_input: User's question
+            k: Number of relevant documents to retrieve
+            
+        Returns:
+            Tuple of (prediction, context_list)
+        """
+        with self.instrumentation.span('predict', mode='qa'):
+            cached, bucket, query_vector = self._cache_lookup(vectorstore, 'qa', k, user_input)
+            if cached is not None:
+                prediction, context_list = cached
+                return prediction, list(context_list)
+
+            relevant_document_chunks = self._retrieve_context(vectorstore, user_input, k, query_vector, 'qa')
+            context_list = [d.page_content for d in relevant_document_chunks]
+            prompt = self._qna_prompt(context_list, user_input)
+
+            try:
+                prediction = self._complete(prompt, temperature=0)
+                self._cache_store(bucket, query_vector, (prediction, list(context_list)))
+            except Exception as e:
+                prediction = f"❌ Error: {e}"
 
-        return prediction, context_list
+            return prediction, context_list
     
     def make_prediction_with_citations(self, vectorstore: Any, user_input: str, k: int = 5) -> Tuple[str, List[dict]]:
         """
@@ -181,81 +1045,298 @@ class RAGPipeline:
         Returns:
             Tuple of (prediction, detailed_context_list_with_metadata)
         """
-        # Create retriever directly from the vectorstore
-        retriever = vectorstore.as_retriever(
-            search_type='similarity',
-            search_kwargs={'k': k}
-        )
-        
-        # Fixed deprecated method call
-        relevant_document_chunks = retriever.invoke(user_input)
-        
-        # Extract context and metadata
-        context_list = []
-        detailed_context = []
-        
-        for i, doc in enumerate(relevant_document_chunks):
-            context_list.append(doc.page_content)
-            detailed_context.append({
-                'content': doc.page_content,
-                'source': doc.metadata.get('source', 'Unknown'),
-                'page': doc.metadata.get('page', 'Unknown'),
-                'chunk_id': i + 1
-            })
-        
-        context_for_query = ". ".join(context_list)
+        with self.instrumentation.span('predict', mode='citations'):
+            cached, bucket, query_vector = self._cache_lookup(vectorstore, 'citations', k, user_input)
+            if cached is not None:
+                prediction, detailed_context = cached
+                return prediction, list(detailed_context)
 
-        prompt = [
-            {'role': 'system', 'content': self.qna_system_message},
-            {'role': 'user', 'content': self.qna_user_message_template.format(
-                context=context_for_query,
-                question=user_input
-            )}
-        ]
+            relevant_document_chunks = self._retrieve_context(vectorstore, user_input, k, query_vector, 'citations')
+            detailed_context = self._detailed_context(relevant_document_chunks)
+            prompt = self._qna_prompt([d.page_content for d in relevant_document_chunks], user_input, mode='citations')
 
-        client = Groq(api_key=self.api_key)
-        try:
-            response = client.chat.completions.create(
-                model=self.model_name,
-                messages=prompt,
-                temperature=0
+            try:
+                prediction = self._complete(prompt, temperature=0)
+                self._cache_store(bucket, query_vector, (prediction, list(detailed_context)))
+            except Exception as e:
+                prediction = f"❌ Error: {e}"
+
+            return prediction, detailed_context
+
+    def stream_prediction(self, vectorstore: Any, user_input: str, k: int = 5) -> Tuple[Iterator[str], List[str]]:
+        """
+        Streaming variant of make_prediction.
+
+        Retrieval runs before this method returns; the answer is generated lazily
+        as the returned iterator is consumed.
+
+        Args:
+            vectorstore: The in-memory vector store to query
+            user_input: User's question
+            k: Number of relevant documents to retrieve
+
+        Returns:
+            Tuple of (token_iterator, context_list)
+        """
+        with self.instrumentation.span('predict', mode='qa', stream=True):
+            cached, bucket, query_vector = self._cache_lookup(vectorstore, 'qa', k, user_input)
+            if cached is not None:
+                prediction, context_list = cached
+                return iter([prediction]), list(context_list)
+
+            relevant_document_chunks = self._retrieve_context(vectorstore, user_input, k, query_vector, 'qa')
+            context_list = [d.page_content for d in relevant_document_chunks]
+            prompt = self._qna_prompt(context_list, user_input)
+            tokens = self._stream_completion(
+                prompt, temperature=0,
+                on_complete=lambda answer: self._cache_store(bucket, query_vector, (answer, list(context_list)))
             )
-            prediction = response.choices[0].message.content.strip()
-        except Exception as e:
-            prediction = f"❌ Error: {e}"
+            return tokens, context_list
+
+    def stream_prediction_with_citations(self, vectorstore: Any, user_input: str, k: int = 5) -> Tuple[Iterator[str], List[dict]]:
+        """
+        Streaming variant of make_prediction_with_citations.
+
+        Citations are available as soon as this method returns, before the first token.
+
+        Args:
+            vectorstore: The in-memory vector store to query
+            user_input: User's question
+            k: Number of relevant documents to retrieve
+
+        Returns:
+            Tuple of (token_iterator, detailed_context_list_with_metadata)
+        """
+        with self.instrumentation.span('predict', mode='citations', stream=True):
+            cached, bucket, query_vector = self._cache_lookup(vectorstore, 'citations', k, user_input)
+            if cached is not None:
+                prediction, detailed_context = cached
+                return iter([prediction]), list(detailed_context)
 
-        return prediction, detailed_context
+            relevant_document_chunks = self._retrieve_context(vectorstore, user_input, k, query_vector, 'citations')
+            detailed_context = self._detailed_context(relevant_document_chunks)
+            prompt = self._qna_prompt([d.page_content for d in relevant_document_chunks], user_input, mode='citations')
+            tokens = self._stream_completion(
+                prompt, temperature=0,
+                on_complete=lambda answer: self._cache_store(bucket, query_vector, (answer, list(detailed_context)))
+            )
+            return tokens, detailed_context
     
-    def generate_quiz(self, vectorstore: Any, topic: str = "", num_questions: int = 5, k: int = 10) -> str:
+    def make_predictions_batch(self, vectorstore: Any, questions: List[str], k: int = 5,
+                               with_citations: bool = False, max_workers: Optional[int] = None) -> List[dict]:
+        """
+        Answer many questions in one call.
+
+        All questions are embedded in one batched forward pass and retrieved with a
+        single vectorised top-k search; the LLM calls then run concurrently on a
+        bounded thread pool. Near-duplicates of earlier questions are served from the
+        answer cache.
+
+        Args:
+            vectorstore: The in-memory vector store to query
+            questions: List of user questions
+            k: Number of relevant documents to retrieve per question
+            with_citations: Return citation dicts (as make_prediction_with_citations) instead of raw chunks
+            max_workers: Concurrent LLM requests; defaults to the LLM client's concurrency limit
+
+        Returns:
+            One dict per question, in input order, with question, answer, context and
+            timings (batch embed/search seconds, per-question llm and total seconds);
+            answered (non-cached) questions also report prompt_tokens
+        """
+        with self.instrumentation.span('predict_batch', questions=len(questions), with_citations=with_citations):
+            if not questions:
+                return []
+            start = time.perf_counter()
+            mode = 'citations' if with_citations else 'qa'
+
+            retriever = self._retriever(vectorstore, self.search_types[mode])
+            query_vectors = retriever.embed(questions)
+            embed_time = time.perf_counter() - start
+
+            fingerprint = self._corpus_fingerprint(vectorstore)
+            bucket = (fingerprint, mode, k)
+            results: List[Optional[dict]] = [None] * len(questions)
+            misses = []
+            for i, (question, vector) in enumerate(zip(questions, query_vectors)):
+                cached = self.answer_cache.get(bucket, vector, mode=mode) if self.answer_cache is not None else None
+                if cached is not None:
+                    answer, context = cached
+                    results[i] = {'question': question, 'answer': answer, 'context': list(context), 'done': time.perf_counter()}
+                else:
+                    misses.append(i)
+
+            search_start = time.perf_counter()
+            retrieved = retriever.search_batch([questions[i] for i in misses], self._fetch_k(k), [query_vectors[i] for i in misses])
+            search_time = time.perf_counter() - search_start
+
+            def answer(i: int, docs: List[Any]) -> Tuple[int, dict]:
+                llm_start = time.perf_counter()
+                docs = self._pack_context(self._rerank(questions[i], docs, k, mode), mode)
+                if with_citations:
+                    context = self._detailed_context(docs)
+                else:
+                    context = [d.page_content for d in docs]
+                prompt = self._qna_prompt([d.page_content for d in docs], questions[i], mode=mode)
+                try:
+                    prediction = self._complete(prompt, temperature=0)
+                    self._cache_store(bucket, query_vectors[i], (prediction, list(context)))
+                except Exception as e:
+                    prediction = f"❌ Error: {e}"
+                return i, {
+                    'question': questions[i],
+                    'answer': prediction,
+                    'context': context,
+                    'prompt_tokens': count_message_tokens(prompt, get_encoding(self.encoding_name)),
+                    'llm_time': time.perf_counter() - llm_start,
+                    'done': time.perf_counter()
+                }
+
+            workers = max(1, min(max_workers or self.llm.max_concurrency, len(misses) or 1))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for i, result in executor.map(lambda item: answer(*item), zip(misses, retrieved)):
+                    results[i] = result
+
+            for result in results:
+                done = result.pop('done', time.perf_counter())
+                result['timings'] = {
+                    'embed': embed_time,
+                    'search': search_time,
+                    'llm': result.pop('llm_time', 0.0),
+                    'total': done - start
+                }
+            return results
+
+    def generate_quiz(self, vectorstore: Any, topic: str = "", num_questions: int = 5, k: int = 10) -> Quiz:
         """
         Generate a quiz based on the documents in the vector store.
+
+        Quizzes longer than ``quiz_group_size`` questions are split into groups: the
+        retrieved chunks are clustered into one subtopic per group and each group's
+        questions are generated concurrently from its own cluster. The answers are
+        parsed once into a Quiz.
         
         Args:
             vectorstore: The in-memory vector store to query
             topic: Optional specific topic to focus on
             num_questions: Number of questions to generate
-            k: Number of relevant documents to retrieve for context
+            k: Number of relevant documents to retrieve for context, per group
             
         Returns:
-            Generated quiz as a string
+            The generated Quiz; groups that failed are listed in its ``errors``
+        """
+        with self.instrumentation.span('quiz', num_questions=num_questions, k=k) as span:
+            query = self._quiz_query(topic)
+            cached, bucket, query_vector = self._cache_lookup(vectorstore, f'quiz:{num_questions}', k, query)
+            if cached is not None:
+                return cached
+
+            groups = self._quiz_groups(vectorstore, topic, query, query_vector, num_questions, k)
+            workers = max(1, min(len(groups), self.llm.max_concurrency))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # Slightly higher temperature for more creative questions
+                outputs = list(executor.map(self._complete_quiz_group, groups))
+
+            quiz = self._assemble_quiz(topic, outputs)
+            if not quiz.errors:
+                self._cache_store(bucket, query_vector, quiz)
+            span.set(groups=len(groups), questions=len(quiz.questions))
+            return quiz
+
+    def _quiz_groups(self, vectorstore: Any, topic: str, query: str, query_vector: Optional[List[float]],
+                     num_questions: int, k: int) -> List[Tuple[int, List[dict]]]:
         """
+        Plan a quiz as (question count, prompt) per group.
+
+        A single group uses k chunks. For several groups, k chunks per group are
+        retrieved and clustered so that each group covers a different subtopic.
+        With the 'mmr' search type the chunks are a diverse selection from the
+        stored embeddings (for a blank topic, one covering the whole corpus), and
+        clustering reuses those embeddings instead of embedding the chunks again.
+        """
+        counts = split_questions(num_questions, self.quiz_group_size)
+        search_type = self.search_types['quiz']
+        fetch = k if len(counts) == 1 else k * len(counts)
+        with self.instrumentation.span('retrieve', mode='quiz', k=fetch, search_type=search_type) as span:
+            if search_type == 'mmr':
+                documents, rows = self._retriever(vectorstore, 'vector').search_diverse(
+                    self._corpus_matrix(vectorstore), fetch,
+                    query_vector if topic.strip() else None,
+                    lambda_mult=self.mmr_lambda
+                )
+            else:
+                documents = self._retrieve(vectorstore, query, fetch, query_vector, search_type=search_type)
+            span.set(chunks=len(documents))
+        if len(counts) == 1:
+            documents = self._pack_context(documents, 'quiz')
+            return [(num_questions, self._quiz_prompt([d.page_content for d in documents], num_questions))]
+
+        if search_type == 'mmr':
+            vectors = self._corpus_matrix(vectorstore).vectors[rows]
+        else:
+            vectors = self.embedding_engine.embed_documents([d.page_content for d in documents])
+        clusters = [[documents[i] for i in cluster] for cluster in cluster_chunks(vectors, len(counts)) if cluster]
+        if len(clusters) < len(counts):
+            # Fewer chunks than groups: spread the questions over the clusters there are
+            counts = split_questions(num_questions, math.ceil(num_questions / max(1, len(clusters))))
+        groups = []
+        for count, cluster in zip(counts, clusters or [[]]):
+            packed = self._pack_context(cluster, 'quiz')
+            groups.append((count, self._quiz_prompt([d.page_content for d in packed], count)))
+        return groups
+
+    def _corpus_matrix(self, vectorstore: Any) -> CorpusMatrix:
+        """Return a store's chunk embeddings for diverse selection, loading them once per corpus version."""
+        if isinstance(vectorstore, NumpyVectorStore):
+            # Shared by every handle on the corpus, like its BM25 index
+            corpus = vectorstore.extras.get('corpus_matrix')
+            if corpus is None:
+                corpus = CorpusMatrix.build(vectorstore.vectors, vectorstore.metadatas,
+                                            range(len(vectorstore.texts)), normalized=True)
+                corpus = vectorstore.extras.setdefault('corpus_matrix', corpus)
+            return corpus
+
+        info = self._require_store_info(vectorstore)
+        corpus = info.corpus
+        if corpus is None:
+            # The vectors Chroma already stores; nothing is embedded again
+            response = vectorstore._collection.get(include=['embeddings', 'metadatas'])
+            embeddings = response['embeddings']
+            vectors = np.asarray(embeddings if embeddings is not None else [], dtype=np.float32)
+            corpus = CorpusMatrix.build(vectors.reshape(len(response['ids']), -1), response['metadatas'], response['ids'])
+            info.corpus = corpus
+        return corpus
+
+    def _complete_quiz_group(self, group: Tuple[int, List[dict]]) -> Tuple[str, Optional[str]]:
+        """Generate one group's questions; returns (text, error)."""
+        try:
+            return self._complete(group[1], temperature=0.3), None
+        except Exception as e:
+            return "", str(e)
+
+    @staticmethod
+    def _assemble_quiz(topic: str, outputs: List[Tuple[str, Optional[str]]]) -> Quiz:
+        """Parse each group's output and join the groups into one Quiz."""
+        quiz = Quiz(topic=topic)
+        for text, error in outputs:
+            if error is not None:
+                quiz.errors.append(error)
+                continue
+            quiz.raw.append(text)
+            quiz.questions.extend(parse_quiz(text))
+        return quiz
+
+    @staticmethod
+    def _quiz_query(topic: str) -> str:
+        """Return the retrieval query for a quiz topic."""
         # If no specific topic, use a general query to get diverse content
         if not topic.strip():
-            query = "main concepts key points important information"
-        else:
-            query = topic
-        
-        # Create retriever directly from the vectorstore
-        retriever = vectorstore.as_retriever(
-            search_type='similarity',
-            search_kwargs={'k': k}
-        )
-        
-        # Fixed deprecated method call
-        relevant_document_chunks = retriever.invoke(query)
-        context_list = [d.page_content for d in relevant_document_chunks]
-        context_for_query = ". ".join(context_list)
+            return "main concepts key points important information"
+        return topic
 
+    def _quiz_prompt(self, context_list: List[str], num_questions: int) -> List[dict]:
+        """Build the chat messages for a quiz request and record its prompt-token count."""
+        context_for_query = ". ".join(context_list)
         prompt = [
             {'role': 'system', 'content': self.quiz_system_message},
             {'role': 'user', 'content': self.quiz_user_message_template.format(
@@ -263,20 +1344,459 @@ class RAGPipeline:
                 num_questions=num_questions
             )}
         ]
+        self._record_prompt_tokens('quiz', prompt)
+        return prompt
 
-        client = Groq(api_key=self.api_key)
-        try:
-            response = client.chat.completions.create(
-                model=self.model_name,
-                messages=prompt,
-                temperature=0.3  # Slightly higher temperature for more creative questions
+    async def amake_prediction(self, vectorstore: Any, user_input: str, k: int = 5) -> Tuple[str, List[str]]:
+        """
+        Async variant of make_prediction using the pooled async Groq client.
+
+        Retrieval runs in a worker thread so the event loop is never blocked.
+
+        Args:
+            vectorstore: The in-memory vector store to query
+            user_input: User's question
+            k: Number of relevant documents to retrieve
+
+        Returns:
+            Tuple of (prediction, context_list)
+        """
+        with self.instrumentation.span('predict', mode='qa'):
+            cached, bucket, query_vector = await asyncio.to_thread(self._cache_lookup, vectorstore, 'qa', k, user_input)
+            if cached is not None:
+                prediction, context_list = cached
+                return prediction, list(context_list)
+
+            relevant_document_chunks = await asyncio.to_thread(self._retrieve_context, vectorstore, user_input, k, query_vector, 'qa')
+            context_list = [d.page_content for d in relevant_document_chunks]
+            prompt = self._qna_prompt(context_list, user_input)
+
+            try:
+                prediction = await self._acomplete(prompt, temperature=0)
+                self._cache_store(bucket, query_vector, (prediction, list(context_list)))
+            except Exception as e:
+                prediction = f"❌ Error: {e}"
+
+            return prediction, context_list
+
+    async def amake_prediction_with_citations(self, vectorstore: Any, user_input: str, k: int = 5) -> Tuple[str, List[dict]]:
+        """
+        Async variant of make_prediction_with_citations.
+
+        Args:
+            vectorstore: The in-memory vector store to query
+            user_input: User's question
+            k: Number of relevant documents to retrieve
+
+        Returns:
+            Tuple of (prediction, detailed_context_list_with_metadata)
+        """
+        with self.instrumentation.span('predict', mode='citations'):
+            cached, bucket, query_vector = await asyncio.to_thread(self._cache_lookup, vectorstore, 'citations', k, user_input)
+            if cached is not None:
+                prediction, detailed_context = cached
+                return prediction, list(detailed_context)
+
+            relevant_document_chunks = await asyncio.to_thread(self._retrieve_context, vectorstore, user_input, k, query_vector, 'citations')
+            detailed_context = self._detailed_context(relevant_document_chunks)
+            prompt = self._qna_prompt([d.page_content for d in relevant_document_chunks], user_input, mode='citations')
+
+            try:
+                prediction = await self._acomplete(prompt, temperature=0)
+                self._cache_store(bucket, query_vector, (prediction, list(detailed_context)))
+            except Exception as e:
+                prediction = f"❌ Error: {e}"
+
+            return prediction, detailed_context
+
+    async def astream_prediction(self, vectorstore: Any, user_input: str, k: int = 5) -> Tuple[AsyncIterator[str], List[str]]:
+        """
+        Async variant of stream_prediction.
+
+        Args:
+            vectorstore: The in-memory vector store to query
+            user_input: User's question
+            k: Number of relevant documents to retrieve
+
+        Returns:
+            Tuple of (async_token_iterator, context_list)
+        """
+        with self.instrumentation.span('predict', mode='qa', stream=True):
+            cached, bucket, query_vector = await asyncio.to_thread(self._cache_lookup, vectorstore, 'qa', k, user_input)
+            if cached is not None:
+                prediction, context_list = cached
+                return _aiter_of([prediction]), list(context_list)
+
+            relevant_document_chunks = await asyncio.to_thread(self._retrieve_context, vectorstore, user_input, k, query_vector, 'qa')
+            context_list = [d.page_content for d in relevant_document_chunks]
+            prompt = self._qna_prompt(context_list, user_input)
+            tokens = self._astream_completion(
+                prompt, temperature=0,
+                on_complete=lambda answer: self._cache_store(bucket, query_vector, (answer, list(context_list)))
             )
-            quiz = response.choices[0].message.content.strip()
-        except Exception as e:
-            quiz = f"❌ Error generating quiz: {e}"
+            return tokens, context_list
 
-        return quiz
+    async def astream_prediction_with_citations(self, vectorstore: Any, user_input: str,
+                                                k: int = 5) -> Tuple[AsyncIterator[str], List[dict]]:
+        """
+        Async variant of stream_prediction_with_citations.
+
+        Args:
+            vectorstore: The in-memory vector store to query
+            user_input: User's question
+            k: Number of relevant documents to retrieve
+
+        Returns:
+            Tuple of (async_token_iterator, detailed_context_list_with_metadata)
+        """
+        with self.instrumentation.span('predict', mode='citations', stream=True):
+            cached, bucket, query_vector = await asyncio.to_thread(self._cache_lookup, vectorstore, 'citations', k, user_input)
+            if cached is not None:
+                prediction, detailed_context = cached
+                return _aiter_of([prediction]), list(detailed_context)
+
+            relevant_document_chunks = await asyncio.to_thread(self._retrieve_context, vectorstore, user_input, k, query_vector, 'citations')
+            detailed_context = self._detailed_context(relevant_document_chunks)
+            prompt = self._qna_prompt([d.page_content for d in relevant_document_chunks], user_input, mode='citations')
+            tokens = self._astream_completion(
+                prompt, temperature=0,
+                on_complete=lambda answer: self._cache_store(bucket, query_vector, (answer, list(detailed_context)))
+            )
+            return tokens, detailed_context
+
+    async def agenerate_quiz(self, vectorstore: Any, topic: str = "", num_questions: int = 5, k: int = 10) -> Quiz:
+        """
+        Async variant of generate_quiz; question groups are generated concurrently on the event loop.
+
+        Args:
+            vectorstore: The in-memory vector store to query
+            topic: Optional specific topic to focus on
+            num_questions: Number of questions to generate
+            k: Number of relevant documents to retrieve for context, per group
+
+        Returns:
+            The generated Quiz; groups that failed are listed in its ``errors``
+        """
+        with self.instrumentation.span('quiz', num_questions=num_questions, k=k) as span:
+            query = self._quiz_query(topic)
+            cached, bucket, query_vector = await asyncio.to_thread(self._cache_lookup, vectorstore, f'quiz:{num_questions}', k, query)
+            if cached is not None:
+                return cached
+
+            groups = await asyncio.to_thread(self._quiz_groups, vectorstore, topic, query, query_vector, num_questions, k)
+
+            async def complete(group: Tuple[int, List[dict]]) -> Tuple[str, Optional[str]]:
+                try:
+                    return await self._acomplete(group[1], temperature=0.3), None
+                except Exception as e:
+                    return "", str(e)
+
+            outputs = await asyncio.gather(*(complete(group) for group in groups))
+            quiz = self._assemble_quiz(topic, list(outputs))
+            if not quiz.errors:
+                self._cache_store(bucket, query_vector, quiz)
+            span.set(groups=len(groups), questions=len(quiz.questions))
+            return quiz
+
+    def warm(self) -> None:
+        """
+        Import the ingest, vector store and LLM dependencies and load the embedding model
+        (and the cross-encoder, when reranking is on).
+
+        Those imports are deferred to first use so the app can render before they
+        finish; calling this from a background thread at startup takes them off
+        the first request's path.
+        """
+        import chromadb  # noqa: F401
+        import groq  # noqa: F401
+        import pypdf  # noqa: F401
+
+        from backend.ingest import get_text_splitter
+
+        get_text_splitter(self.encoding_name, self.chunk_size, self.chunk_overlap, self.chunker)
+        get_encoding(self.encoding_name)
+        self.embedding_engine.warm()
+        if self.reranker is not None:
+            self.reranker.warm()
+
+    def embedding_metrics(self) -> dict:
+        """
+        Report metrics of the shared embedding engine.
+
+        Returns:
+            Dict with model load time and per-batch latency summary
+        """
+        return self.embedding_engine.metrics()
+
+    def loaded_sources(self, vectorstore: Any) -> List[str]:
+        """Return the source file names currently in a store built by this pipeline."""
+        info = self._store_info.get(vectorstore)
+        return list(info.sources) if info is not None else []
+
+    def corpus_counts(self, vectorstore: Any) -> Tuple[int, int]:
+        """Return (page_count, chunk_count) of a store built by this pipeline."""
+        info = self._store_info.get(vectorstore)
+        return (info.page_count, info.chunk_count) if info is not None else (0, 0)
+
+    def store_nbytes(self, vectorstore: Any) -> int:
+        """
+        Approximate memory held by a store built by this pipeline.
+
+        Counts chunk texts, vectors (twice for Chroma, which keeps them in its HNSW
+        index and its record store), the BM25 index and, once loaded, the corpus
+        matrix. A shared-index corpus is counted once and split evenly between the
+        sessions holding it.
+        """
+        info = self._store_info.get(vectorstore)
+        if info is None:
+            return 0
+        if isinstance(vectorstore, NumpyVectorStore):
+            extras = vectorstore.extras
+            if 'nbytes' not in extras:
+                codes = vectorstore.codes.nbytes if vectorstore.codes is not None else 0
+                extras['nbytes'] = sum(len(text) for text in vectorstore.texts) + vectorstore.vectors.nbytes + codes
+            total = extras['nbytes'] + info.lexical.nbytes
+            if 'corpus_matrix' in extras:
+                total += extras['corpus_matrix'].vectors.nbytes
+            sessions = self.shared_index.stats().get(vectorstore.fingerprint, {}).get('sessions', 1)
+            return total // max(1, sessions)
+        total = sum(source.nbytes for source in info.sources.values())
+        if info.lexical is not None:
+            total += info.lexical.nbytes
+        if info.corpus is not None:
+            total += info.corpus.vectors.nbytes
+        return total
+
+    def release_vectorstore(self, vectorstore: Any) -> None:
+        """
+        Free a session's vector store.
+
+        Shared-index handles drop their reference to the shared corpus; Chroma stores
+        delete their collection, which would otherwise outlive the session.
+        """
+        if vectorstore is None:
+            return
+        self._store_info.pop(vectorstore, None)
+        with self._retrievers_lock:
+            self._retrievers.pop(vectorstore, None)
+        if isinstance(vectorstore, NumpyVectorStore):
+            if self.shared_index is not None:
+                self.shared_index.release(vectorstore)
+        else:
+            try:
+                vectorstore.delete_collection()
+            except Exception:
+                pass  # Collection already deleted
+
+    def spill_vectorstore(self, vectorstore: Any, path: str) -> int:
+        """
+        Write a store's chunks, vectors and bookkeeping to a directory, for ``restore_vectorstore``.
+
+        A Chroma store is read back one file at a time, so spilling never holds more
+        than one file's chunks in memory; a shared-index handle writes its corpus.
+        The store itself is left as it is.
+
+        Returns:
+            Bytes written
+        """
+        with self.instrumentation.span('session.spill') as span:
+            info = self._require_store_info(vectorstore)
+            shared = isinstance(vectorstore, NumpyVectorStore)
+            tmp_dir = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+            os.makedirs(tmp_dir)
+            try:
+                if shared:
+                    parts = [None]
+                    self._write_spill_part(tmp_dir, 0, vectorstore.texts, vectorstore.metadatas,
+                                           np.asarray(vectorstore.vectors))
+                else:
+                    parts = list(info.sources)
+                    for i, source in enumerate(parts):
+                        response = vectorstore._collection.get(
+                            where={'source': source}, include=['documents', 'metadatas', 'embeddings']
+                        )
+                        embeddings = response['embeddings']
+                        vectors = np.asarray(embeddings if embeddings is not None else [], dtype=np.float32)
+                        self._write_spill_part(tmp_dir, i, response['documents'], response['metadatas'],
+                                               vectors.reshape(len(response['ids']), -1))
+                with open(os.path.join(tmp_dir, "store.json"), "w", encoding="utf-8") as f:
+                    json.dump({
+                        'shared': shared,
+                        'fingerprint': info.fingerprint,
+                        'sources': {source: asdict(stats) for source, stats in info.sources.items()},
+                        'parts': parts
+                    }, f)
+                shutil.rmtree(path, ignore_errors=True)
+                os.replace(tmp_dir, path)
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+            nbytes = sum(entry.stat().st_size for entry in os.scandir(path))
+            span.set(shared=shared, chunks=info.chunk_count, bytes=nbytes)
+            return nbytes
+
+    def restore_vectorstore(self, path: str) -> Any:
+        """
+        Rebuild a store from a directory written by ``spill_vectorstore``, without re-embedding.
+
+        Chroma stores get a new collection and BM25 index; a shared-index corpus that
+        other sessions still hold is reopened without reading the spill at all.
+        """
+        with self.instrumentation.span('session.restore') as span:
+            with open(os.path.join(path, "store.json"), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            info = StoreInfo(
+                fingerprint=manifest['fingerprint'],
+                sources={source: SourceInfo(**stats) for source, stats in manifest['sources'].items()}
+            )
+            if manifest['shared']:
+                if self.shared_index is None:
+                    raise ValueError("Shared index mode is not enabled (set SHARED_INDEX=1)")
+
+                def build() -> Tuple[List[str], List[dict], np.ndarray, int, Dict[str, dict]]:
+                    texts, metadatas, vectors = self._read_spill_part(path, 0)
+                    return texts, metadatas, vectors, info.page_count, manifest['sources']
+
+                vectorstore = self.shared_index.acquire(info.fingerprint, build, self.embedding_engine)
+                info.lexical = self._shared_lexical_index(vectorstore)
+            else:
+                vectorstore = self._new_chroma_store()
+                info.lexical = BM25Index()
+                try:
+                    for i, source in enumerate(manifest['parts']):
+                        texts, metadatas, vectors = self._read_spill_part(path, i)
+                        ids = self._add_to_vectorstore(vectorstore, CacheEntry(texts, metadatas, vectors, 0))
+                        info.lexical.add_segment(source, texts, ids)
+                    info.lexical.compact()
+                except BaseException:
+                    vectorstore.delete_collection()
+                    raise
+            self._store_info[vectorstore] = info
+            span.set(shared=manifest['shared'], chunks=info.chunk_count)
+            return vectorstore
+
+    @staticmethod
+    def _write_spill_part(directory: str, index: int, texts: List[str], metadatas: List[dict],
+                          vectors: np.ndarray) -> None:
+        np.save(os.path.join(directory, f"{index}.npy"), np.asarray(vectors, dtype=np.float32))
+        with open(os.path.join(directory, f"{index}.json"), "w", encoding="utf-8") as f:
+            json.dump({'texts': texts, 'metadatas': metadatas}, f)
+
+    @staticmethod
+    def _read_spill_part(directory: str, index: int) -> Tuple[List[str], List[dict], np.ndarray]:
+        with open(os.path.join(directory, f"{index}.json"), "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        # Memory-mapped: rows are copied into the store batch by batch
+        vectors = np.load(os.path.join(directory, f"{index}.npy"), mmap_mode="r")
+        return payload['texts'], payload['metadatas'], vectors
+
+    def shared_index_stats(self) -> dict:
+        """
+        Report corpora loaded in the shared index and how many sessions use each.
+
+        Returns:
+            Dict keyed by corpus fingerprint ('enabled' is False when shared mode is off)
+        """
+        if self.shared_index is None:
+            return {'enabled': False}
+        return {'enabled': True, 'corpora': self.shared_index.stats()}
+
+    def session_memory_stats(self) -> dict:
+        """
+        Report the memory each session's store holds and which stores are spilled to disk.
+
+        Returns:
+            Dict with the memory budget, bytes in memory and on disk, spill and reload
+            counts and latencies, and one row per session, largest first
+        """
+        return self.sessions.report()
+
+    def retrieval_metrics(self) -> dict:
+        """
+        Report per-stage retrieval latency across all stores.
+
+        Returns:
+            Dict mapping each stage (embed, search, hydrate) to its latency summary in seconds
+        """
+        return {stage: recorder.summary() for stage, recorder in self.retrieval_latency.items()}
+
+    def rerank_stats(self) -> dict:
+        """
+        Report cross-encoder latency and (question, chunk) score cache hit rate.
+
+        Returns:
+            Dict with reranker statistics ('enabled' is False when reranking is off)
+        """
+        if self.reranker is None:
+            return {'enabled': False}
+        return {'enabled': True, 'candidates': self.rerank_candidates, **self.reranker.stats()}
+
+    def answer_cache_stats(self) -> dict:
+        """
+        Report semantic answer cache hit rates.
+
+        Returns:
+            Dict with overall and per-mode hit/miss counts ('enabled' is False when disabled)
+        """
+        if self.answer_cache is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.answer_cache.stats()}
+
+    def prompt_token_stats(self) -> dict:
+        """
+        Report prompt-token counts per mode.
+
+        Returns:
+            Dict keyed by mode with count, mean and percentiles of prompt tokens per request
+        """
+        return {mode: recorder.summary() for mode, recorder in self.prompt_tokens.items()}
+
+    def streaming_metrics(self) -> dict:
+        """
+        Report latency of streamed answers.
+
+        Returns:
+            Dict with time-to-first-token and total generation time summaries
+        """
+        return {
+            'ttft': self.ttft.summary(),
+            'generation': self.stream_latency.summary(),
+        }
+
+    def cache_stats(self) -> dict:
+        """
+        Report embedding cache hit/miss counts and bytes saved.
+
+        Returns:
+            Dict with cache statistics ('enabled' is False when the cache is disabled)
+        """
+        if self.embedding_cache is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.embedding_cache.stats()}
+
+
+async def _aiter_of(items: List[str]) -> AsyncIterator[str]:
+    for item in items:
+        yield item
+
+
+_rag_pipeline: Optional[RAGPipeline] = None
+_rag_pipeline_lock = threading.Lock()
+
+
+def get_rag_pipeline() -> RAGPipeline:
+    """Return the process-wide pipeline, creating it on first call."""
+    global _rag_pipeline
+    if _rag_pipeline is None:
+        with _rag_pipeline_lock:
+            if _rag_pipeline is None:
+                _rag_pipeline = RAGPipeline()
+    return _rag_pipeline
 
 
-# Create a singleton instance
-rag_pipeline = RAGPipeline()
+def __getattr__(name: str) -> Any:
+    # ``from backend.rag_pipeline import rag_pipeline`` keeps working, but the
+    # pipeline is only built when somebody asks for it rather than at import time
+    if name == 'rag_pipeline':
+        return get_rag_pipeline()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,162 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from backend.metrics import LatencyRecorder
+
+
+class CrossEncoderReranker:
+    """
+    Process-wide cross-encoder that rescores retrieved chunks against the question.
+
+    The second stage of two-stage retrieval: a wide candidate set is fetched
+    cheaply from the index, scored here with a small local cross-encoder in
+    batched forward passes, and only the best few chunks go into the prompt.
+    The model is loaded once on first use and shared by every session, like the
+    embedding engine. Scores are cached per (question, chunk text) pair in an
+    LRU of ``cache_entries`` entries, so a repeated or rephrased-then-repeated
+    question only scores chunks it hasn't seen.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 32, cache_entries: int = 50000,
+                 max_inflight_batches: int = 1):
+        """
+        Args:
+            model_name: sentence-transformers cross-encoder model name
+            batch_size: (question, chunk) pairs scored per forward pass
+            cache_entries: Pair scores kept in the LRU cache (0 disables caching)
+            max_inflight_batches: Upper bound on batches scored concurrently across all sessions
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_entries = cache_entries
+        self.max_inflight_batches = max_inflight_batches
+        self.load_time: Optional[float] = None
+        self.batch_latency = LatencyRecorder()
+        self.rerank_latency = LatencyRecorder()
+
+        self._model: Any = None
+        self._load_lock = threading.Lock()
+        self._inflight = threading.BoundedSemaphore(max_inflight_batches)
+        self._cache: "OrderedDict[bytes, float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def model(self) -> Any:
+        """Return the loaded cross-encoder, loading it on first use."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    start = time.perf_counter()
+                    model = CrossEncoder(self.model_name, device='cpu')
+                    self.load_time = time.perf_counter() - start
+                    self._model = model
+        return self._model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def warm(self) -> None:
+        """Load the model and score one dummy pair so the first real request is fast."""
+        self._predict([("warm up", "warm up")])
+
+    @staticmethod
+    def _key(query: str, text: str) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(query.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.digest()
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        """
+        Score chunks against a question; higher is more relevant.
+
+        Cached pairs are answered from the LRU; the rest are scored in batches of ``batch_size``.
+
+        Returns:
+            One score per text, in input order
+        """
+        keys = [self._key(query, text) for text in texts]
+        scores: List[Optional[float]] = [None] * len(texts)
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    scores[i] = cached
+            missing = [i for i, value in enumerate(scores) if value is None]
+            self._hits += len(texts) - len(missing)
+            self._misses += len(missing)
+
+        if missing:
+            computed = self._predict([(query, texts[i]) for i in missing])
+            with self._cache_lock:
+                for i, value in zip(missing, computed):
+                    scores[i] = value
+                    if self.cache_entries > 0:
+                        self._cache[keys[i]] = value
+                        self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, documents: List[Any], top_n: int) -> List[Any]:
+        """
+        Reorder retrieved Documents by cross-encoder score and keep the best ``top_n``.
+
+        Ties keep the first-stage order.
+        """
+        if not documents:
+            return []
+        start = time.perf_counter()
+        scores = self.score(query, [doc.page_content for doc in documents])
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])
+        self.rerank_latency.record(time.perf_counter() - start)
+        return [documents[i] for i in order[:top_n]]
+
+    def _predict(self, pairs: List[tuple]) -> List[float]:
+        model = self.model
+        scores: List[float] = []
+        for start in range(0, len(pairs), self.batch_size):
+            batch = pairs[start:start + self.batch_size]
+            # Cap concurrent forward passes so simultaneous questions don't oversubscribe the CPU
+            with self._inflight:
+                batch_start = time.perf_counter()
+                output = model.predict(batch, batch_size=len(batch), show_progress_bar=False)
+                self.batch_latency.record(time.perf_counter() - batch_start)
+            scores.extend(float(value) for value in output)
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report model load time, scoring latency and pair-cache hit rate.
+
+        Returns:
+            Dict with model name, load state, batch and per-rerank latency summaries and cache counters
+        """
+        with self._cache_lock:
+            lookups = self._hits + self._misses
+            cache = {
+                'entries': len(self._cache),
+                'max_entries': self.cache_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+            }
+        return {
+            'model_name': self.model_name,
+            'loaded': self.is_loaded,
+            'load_time': self.load_time,
+            'batch_size': self.batch_size,
+            'batch_latency': self.batch_latency.summary(),
+            'rerank_latency': self.rerank_latency.summary(),
+            'cache': cache,
+        }
@@ -0,0 +1,192 @@
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from backend.diversity import CorpusMatrix, mmr_select
+from backend.instrumentation import Instrumentation
+from backend.lexical import BM25Index, reciprocal_rank_fusion
+from backend.metrics import LatencyRecorder
+from backend.vector_index import NumpyVectorStore
+
+SEARCH_TYPES = ('vector', 'lexical', 'hybrid')
+STAGES = ('embed', 'search', 'hydrate')
+
+
+def fuse_documents(rankings: Sequence[Sequence[Document]], k: int) -> List[Document]:
+    """Reciprocal-rank fusion of ranked Document lists, identifying chunks by source, page and text."""
+    documents = {}
+    keyed_rankings = []
+    for ranking in rankings:
+        keys = []
+        for doc in ranking:
+            key = (doc.metadata.get('source'), doc.metadata.get('page'), doc.page_content)
+            documents.setdefault(key, doc)
+            keys.append(key)
+        keyed_rankings.append(keys)
+    return [documents[key] for key in reciprocal_rank_fusion(keyed_rankings, k)]
+
+
+class Retriever:
+    """
+    Top-k retrieval over one vector store with a fixed search type.
+
+    Built once per store and search type and reused by every request, instead of
+    creating a LangChain retriever per call. Searches take precomputed query
+    vectors and go straight to the backing index (the Chroma collection or the
+    numpy matrix), so no per-request wrapper objects are created. Time spent
+    embedding queries, searching the index and turning hits into Documents is
+    recorded per stage.
+    """
+
+    def __init__(self, vectorstore: Any, search_type: str = 'vector', lexical: Optional[BM25Index] = None,
+                 embedding: Any = None, stage_latency: Optional[Dict[str, LatencyRecorder]] = None,
+                 instrumentation: Optional[Instrumentation] = None):
+        """
+        Args:
+            vectorstore: Store to search; held by weak reference so cached retrievers don't keep it alive
+            search_type: 'vector', 'lexical' (BM25) or 'hybrid' (both, fused by reciprocal rank)
+            lexical: BM25 index over the store's chunks, keyed by Chroma id or shared-index row
+            embedding: Embeddings used for queries without a precomputed vector; defaults to the store's
+            stage_latency: Recorders for the embed, search and hydrate stages, shared between retrievers
+            instrumentation: Receives each stage as a ``retrieve.<stage>`` span
+        """
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"Unknown search type {search_type!r}; expected one of {', '.join(SEARCH_TYPES)}")
+        self._store_ref = weakref.ref(vectorstore)
+        self.search_type = search_type
+        self.lexical = lexical
+        self._embedding = embedding if embedding is not None else getattr(vectorstore, 'embeddings', None)
+        self.stage_latency = stage_latency if stage_latency is not None else {stage: LatencyRecorder() for stage in STAGES}
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+
+    @property
+    def vectorstore(self) -> Any:
+        vectorstore = self._store_ref()
+        if vectorstore is None:
+            raise ReferenceError("The vector store behind this retriever has been released")
+        return vectorstore
+
+    def _record(self, stage: str, start: float) -> float:
+        now = time.perf_counter()
+        self.stage_latency[stage].record(now - start)
+        self.instrumentation.record(f'retrieve.{stage}', now - start, search_type=self.search_type)
+        return now
+
+    def embed(self, queries: List[str]) -> List[List[float]]:
+        """Embed queries in one batch, recording the embed stage."""
+        start = time.perf_counter()
+        vectors = self._embedding.embed_documents(list(queries))
+        self._record('embed', start)
+        return vectors
+
+    def search(self, query: str, k: int, query_vector: Optional[List[float]] = None) -> List[Document]:
+        """
+        Retrieve the k most relevant chunks for a query.
+
+        Args:
+            query: Query text (used by lexical search, and embedded if no vector is given)
+            k: Number of chunks to return
+            query_vector: Precomputed query embedding, so the question isn't embedded twice
+
+        Returns:
+            List of Documents, best first
+        """
+        vectors = None if query_vector is None else [query_vector]
+        return self.search_batch([query], k, vectors)[0]
+
+    def search_batch(self, queries: List[str], k: int,
+                     query_vectors: Optional[List[List[float]]] = None) -> List[List[Document]]:
+        """
+        Retrieve the k most relevant chunks for each of several queries.
+
+        Vector search scores all queries at once (one matrix product or one
+        Chroma query); lexical search runs per query on the BM25 index.
+
+        Returns:
+            One list of Documents per query, best first
+        """
+        if not queries:
+            return []
+        lexical = self.lexical if self.search_type != 'vector' and self.lexical is not None and len(self.lexical) else None
+        if lexical is None:
+            return self._vector_search(queries, k, query_vectors)
+
+        fetch_k = max(2 * k, 20)
+        lexical_results = []
+        for query in queries:
+            start = time.perf_counter()
+            hits = lexical.search(query, fetch_k)
+            start = self._record('search', start)
+            lexical_results.append(self._hydrate([key for key, _ in hits]))
+            self._record('hydrate', start)
+        if self.search_type == 'lexical':
+            return [docs[:k] for docs in lexical_results]
+        vector_results = self._vector_search(queries, fetch_k, query_vectors)
+        return [fuse_documents([vector_docs, lexical_docs], k)
+                for vector_docs, lexical_docs in zip(vector_results, lexical_results)]
+
+    def search_diverse(self, corpus: CorpusMatrix, k: int, query_vector: Optional[List[float]] = None,
+                       lambda_mult: float = 0.5) -> Tuple[List[Document], np.ndarray]:
+        """
+        Select k relevant, mutually different chunks from the store's embeddings (see ``mmr_select``).
+
+        Args:
+            corpus: Stored embeddings of this retriever's store
+            k: Number of chunks to return
+            query_vector: Query embedding; None selects for coverage of the whole corpus
+            lambda_mult: 1 ranks purely by relevance, 0 purely by diversity
+
+        Returns:
+            Tuple of (Documents in selection order, their rows in ``corpus``)
+        """
+        start = time.perf_counter()
+        rows = mmr_select(corpus, k, query_vector, lambda_mult=lambda_mult)
+        start = self._record('search', start)
+        documents = self._hydrate([corpus.keys[row] for row in rows])
+        self._record('hydrate', start)
+        return documents, rows
+
+    def _vector_search(self, queries: List[str], k: int,
+                       query_vectors: Optional[List[List[float]]] = None) -> List[List[Document]]:
+        if query_vectors is None:
+            query_vectors = self.embed(queries)
+        vectorstore = self.vectorstore
+        start = time.perf_counter()
+
+        if isinstance(vectorstore, NumpyVectorStore):
+            hits = vectorstore.search_rows(np.asarray(query_vectors, dtype=np.float32), k)
+            start = self._record('search', start)
+            results = [[vectorstore.get_document(int(row)) for row in rows] for rows, _ in hits]
+        elif hasattr(vectorstore, '_collection'):
+            response = vectorstore._collection.query(
+                query_embeddings=[list(map(float, vector)) for vector in query_vectors],
+                n_results=k,
+                include=['documents', 'metadatas']
+            )
+            start = self._record('search', start)
+            results = [
+                [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+                for texts, metadatas in zip(response['documents'], response['metadatas'])
+            ]
+        else:
+            results = [vectorstore.similarity_search_by_vector(vector, k=k) for vector in query_vectors]
+            start = self._record('search', start)
+        self._record('hydrate', start)
+        return results
+
+    def _hydrate(self, keys: List[Any]) -> List[Document]:
+        """Turn lexical index keys (Chroma ids or shared-index rows) back into Documents."""
+        if not keys:
+            return []
+        vectorstore = self.vectorstore
+        if isinstance(vectorstore, NumpyVectorStore):
+            return [vectorstore.get_document(key) for key in keys]
+        response = vectorstore._collection.get(ids=list(keys), include=['documents', 'metadatas'])
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(response['ids'], response['documents'], response['metadatas'])
+        }
+        return [by_id[key] for key in keys if key in by_id]
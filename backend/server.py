@@ -0,0 +1,385 @@
+import asyncio
+import io
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from backend.jobs import IngestJob
+from backend.metrics import LatencyRecorder
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+MAX_K = 20
+MAX_QUIZ_QUESTIONS = 20
+
+
+def _error(exc_class: type, message: str, **kwargs: Any) -> web.HTTPException:
+    """Build an HTTP error whose body is ``{"error": message}``."""
+    return exc_class(text=json.dumps({'error': message}), content_type='application/json', **kwargs)
+
+
+def _job_view(job: IngestJob) -> dict:
+    view = {
+        'job_id': job.id,
+        'corpus_id': job.session_id,
+        'state': job.state,
+        'sources': job.sources,
+        'progress': {**asdict(job.progress), 'fraction': round(job.progress.fraction, 4)},
+        'error': job.error,
+    }
+    if job.state == 'done' and job.result is not None:
+        view['pages'], view['chunks'] = job.result[1], job.result[2]
+    return view
+
+
+class RAGServer:
+    """
+    Headless HTTP/JSON front end to a RAGPipeline, for load tests and integrations without the Streamlit UI.
+
+    A corpus is what a browser session is in the app: the vector store built from a
+    set of uploaded PDFs, registered in the pipeline's session registry under its
+    corpus id, so idle corpora are spilled to disk and reloaded like idle sessions.
+    Uploads are ingested on the pipeline's job queue and polled through ``/jobs``.
+    Questions and quizzes use the pipeline's async methods on the server's event
+    loop; with ``"stream": true`` an answer is sent as newline-delimited JSON, the
+    retrieved context first and then one line per token.
+
+    At most ``max_concurrency`` ingest, question and quiz requests are served at
+    once and ``max_pending`` more may wait for a slot; beyond that requests are
+    refused with 503 and a Retry-After header instead of queueing without bound.
+    Job polling, ``/stats`` and ``/health`` are never refused.
+
+    Routes:
+        POST   /corpora                            multipart ``file`` parts -> 202 {corpus_id, job}
+        GET    /corpora/{id}                       sources, page and chunk counts, ingest jobs
+        DELETE /corpora/{id}                       cancel its jobs and release the store
+        POST   /corpora/{id}/documents             add multipart ``file`` parts -> 202 {corpus_id, job}
+        POST   /corpora/{id}/ask                   {question, k?, stream?} -> {answer, context}
+        POST   /corpora/{id}/ask-with-citations    {question, k?, stream?} -> {answer, citations}
+        POST   /corpora/{id}/quiz                  {topic?, num_questions?, k?} -> quiz
+        GET    /jobs/{id}                          ingest state and progress
+        DELETE /jobs/{id}                          cancel an ingest
+        GET    /stats                              pipeline, job, session memory and request statistics
+        GET    /health
+    """
+
+    def __init__(self, pipeline: Any, max_concurrency: int = 16, max_pending: int = 64,
+                 max_upload_bytes: int = 200 * 2 ** 20, enforce_interval: float = 30.0):
+        """
+        Args:
+            pipeline: The RAGPipeline serving every request
+            max_concurrency: Ingest, question and quiz requests served at once
+            max_pending: Further requests allowed to wait for a slot before new ones get 503
+            max_upload_bytes: Total size of the files in one upload
+            enforce_interval: Seconds between applying the session memory budget while
+                no request does (0 disables the periodic check)
+        """
+        self.pipeline = pipeline
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_pending = max(0, max_pending)
+        self.max_upload_bytes = max_upload_bytes
+        self.enforce_interval = enforce_interval
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.latency: Dict[str, LatencyRecorder] = {}
+        # Created on the serving loop
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._enforcer: Optional[asyncio.Task] = None
+
+    def app(self) -> web.Application:
+        """Build the aiohttp application."""
+        app = web.Application(client_max_size=self.max_upload_bytes, middlewares=[self._timing])
+        app.router.add_post('/corpora', self._limited(self.create_corpus))
+        app.router.add_get('/corpora/{corpus_id}', self.get_corpus)
+        app.router.add_delete('/corpora/{corpus_id}', self.delete_corpus)
+        app.router.add_post('/corpora/{corpus_id}/documents', self._limited(self.add_documents))
+        app.router.add_post('/corpora/{corpus_id}/ask', self._limited(self.ask))
+        app.router.add_post('/corpora/{corpus_id}/ask-with-citations', self._limited(self.ask_with_citations))
+        app.router.add_post('/corpora/{corpus_id}/quiz', self._limited(self.quiz))
+        app.router.add_get('/jobs/{job_id}', self.get_job)
+        app.router.add_delete('/jobs/{job_id}', self.cancel_job)
+        app.router.add_get('/stats', self.stats)
+        app.router.add_get('/health', self.health)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app: web.Application) -> None:
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        # Load the embedding model before the first request rather than during it
+        await asyncio.to_thread(self.pipeline.warm)
+        if self.enforce_interval > 0:
+            self._enforcer = asyncio.create_task(self._enforce_periodically())
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        if self._enforcer is not None:
+            self._enforcer.cancel()
+
+    async def _enforce_periodically(self) -> None:
+        # Requests apply the budget as they finish; this spills corpora that went idle after the last one
+        while True:
+            await asyncio.sleep(self.enforce_interval)
+            await asyncio.to_thread(self.pipeline.sessions.enforce)
+
+    @web.middleware
+    async def _timing(self, request: web.Request, handler: Handler) -> web.StreamResponse:
+        start = time.perf_counter()
+        try:
+            return await handler(request)
+        finally:
+            route = request.match_info.route.resource
+            if route is not None:
+                name = f"{request.method} {route.canonical}"
+                self.latency.setdefault(name, LatencyRecorder()).record(time.perf_counter() - start)
+
+    def _limited(self, handler: Handler) -> Handler:
+        """Wrap a handler in the concurrency limit, refusing requests once too many are waiting."""
+        async def limited(request: web.Request) -> web.StreamResponse:
+            if self.in_flight + self.waiting >= self.max_concurrency + self.max_pending:
+                self.rejected += 1
+                raise _error(web.HTTPServiceUnavailable, "Server busy; retry shortly", headers={'Retry-After': '1'})
+            self.waiting += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            try:
+                return await handler(request)
+            finally:
+                self.in_flight -= 1
+                self._slots.release()
+        return limited
+
+    def _has_jobs(self, corpus_id: str) -> bool:
+        return any(not job.finished for job in self.pipeline.jobs.jobs(corpus_id))
+
+    @asynccontextmanager
+    async def _corpus(self, corpus_id: str) -> AsyncIterator[Any]:
+        """Pin a corpus's store for the duration of a request, reloading it if it was spilled."""
+        pin = self.pipeline.sessions.use(corpus_id)
+        # Entering may read a spilled store back from disk and leaving may spill others
+        vectorstore = await asyncio.to_thread(pin.__enter__)
+        try:
+            if vectorstore is None:
+                if self._has_jobs(corpus_id):
+                    raise _error(web.HTTPConflict, "Corpus is still being ingested")
+                raise _error(web.HTTPNotFound, f"Unknown corpus: {corpus_id}")
+            yield vectorstore
+        finally:
+            await asyncio.to_thread(pin.__exit__, None, None, None)
+
+    async def _read_pdfs(self, request: web.Request) -> List[io.BytesIO]:
+        """Read the ``file`` parts of a multipart upload into named in-memory files."""
+        if not request.content_type.startswith('multipart/'):
+            raise _error(web.HTTPBadRequest, "Upload PDFs as multipart/form-data 'file' parts")
+        reader = await request.multipart()
+        files, total = [], 0
+        async for part in reader:
+            if part.name != 'file':
+                continue
+            buffer = io.BytesIO()
+            while True:
+                chunk = await part.read_chunk()
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > self.max_upload_bytes:
+                    raise _error(web.HTTPRequestEntityTooLarge, f"Upload exceeds {self.max_upload_bytes} bytes",
+                                 max_size=self.max_upload_bytes, actual_size=total)
+                buffer.write(chunk)
+            buffer.name = part.filename or f"document-{len(files) + 1}.pdf"
+            files.append(buffer)
+        if not files:
+            raise _error(web.HTTPBadRequest, "No 'file' parts in the upload")
+        return files
+
+    @staticmethod
+    async def _read_json(request: web.Request) -> dict:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise _error(web.HTTPBadRequest, "Request body must be a JSON object")
+        if not isinstance(body, dict):
+            raise _error(web.HTTPBadRequest, "Request body must be a JSON object")
+        return body
+
+    @staticmethod
+    def _int_field(body: dict, name: str, default: int, low: int, high: int) -> int:
+        value = body.get(name, default)
+        if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+            raise _error(web.HTTPBadRequest, f"'{name}' must be an integer from {low} to {high}")
+        return value
+
+    def _submit(self, corpus_id: str, files: List[io.BytesIO]) -> IngestJob:
+        try:
+            return self.pipeline.submit_ingest(corpus_id, files, attach=True)
+        except ValueError as e:
+            raise _error(web.HTTPTooManyRequests, str(e), headers={'Retry-After': '5'})
+
+    async def create_corpus(self, request: web.Request) -> web.Response:
+        files = await self._read_pdfs(request)
+        corpus_id = uuid.uuid4().hex
+        job = self._submit(corpus_id, files)
+        return web.json_response({'corpus_id': corpus_id, 'job': _job_view(job)}, status=202)
+
+    async def add_documents(self, request: web.Request) -> web.Response:
+        corpus_id = request.match_info['corpus_id']
+        if corpus_id not in self.pipeline.sessions and not self._has_jobs(corpus_id):
+            raise _error(web.HTTPNotFound, f"Unknown corpus: {corpus_id}")
+        files = await self._read_pdfs(request)
+        job = self._submit(corpus_id, files)
+        return web.json_response({'corpus_id': corpus_id, 'job': _job_view(job)}, status=202)
+
+    async def get_corpus(self, request: web.Request) -> web.Response:
+        corpus_id = request.match_info['corpus_id']
+        jobs = [_job_view(job) for job in self.pipeline.jobs.jobs(corpus_id)]
+        sources, pages, chunks = [], 0, 0
+        if corpus_id in self.pipeline.sessions:
+            async with self._corpus(corpus_id) as vectorstore:
+                sources = self.pipeline.loaded_sources(vectorstore)
+                pages, chunks = self.pipeline.corpus_counts(vectorstore)
+        elif not self._has_jobs(corpus_id):
+            raise _error(web.HTTPNotFound, f"Unknown corpus: {corpus_id}")
+        return web.json_response({
+            'corpus_id': corpus_id,
+            'ready': bool(sources),
+            'sources': sources,
+            'pages': pages,
+            'chunks': chunks,
+            'jobs': jobs,
+        })
+
+    async def delete_corpus(self, request: web.Request) -> web.Response:
+        corpus_id = request.match_info['corpus_id']
+        if corpus_id not in self.pipeline.sessions and not self._has_jobs(corpus_id):
+            raise _error(web.HTTPNotFound, f"Unknown corpus: {corpus_id}")
+        # Cancel before dropping, so a job that is just finishing can't attach the corpus again
+        for job in self.pipeline.jobs.jobs(corpus_id):
+            self.pipeline.jobs.cancel(job.id)
+        await asyncio.to_thread(self.pipeline.sessions.drop, corpus_id)
+        return web.Response(status=204)
+
+    async def get_job(self, request: web.Request) -> web.Response:
+        job = self.pipeline.jobs.get(request.match_info['job_id'])
+        if job is None:
+            raise _error(web.HTTPNotFound, "Unknown job")
+        return web.json_response(_job_view(job))
+
+    async def cancel_job(self, request: web.Request) -> web.Response:
+        job = self.pipeline.jobs.get(request.match_info['job_id'])
+        if job is None:
+            raise _error(web.HTTPNotFound, "Unknown job")
+        if not self.pipeline.jobs.cancel(job.id):
+            raise _error(web.HTTPConflict, f"Job already {job.state}")
+        return web.json_response(_job_view(job), status=202)
+
+    async def ask(self, request: web.Request) -> web.StreamResponse:
+        return await self._answer(request, citations=False)
+
+    async def ask_with_citations(self, request: web.Request) -> web.StreamResponse:
+        return await self._answer(request, citations=True)
+
+    async def _answer(self, request: web.Request, citations: bool) -> web.StreamResponse:
+        body = await self._read_json(request)
+        question = body.get('question')
+        if not isinstance(question, str) or not question.strip():
+            raise _error(web.HTTPBadRequest, "'question' must be a non-empty string")
+        k = self._int_field(body, 'k', 5, 1, MAX_K)
+        context_key = 'citations' if citations else 'context'
+
+        async with self._corpus(request.match_info['corpus_id']) as vectorstore:
+            if not body.get('stream'):
+                predict = self.pipeline.amake_prediction_with_citations if citations else self.pipeline.amake_prediction
+                answer, context = await predict(vectorstore, question, k)
+                return web.json_response({'answer': answer, context_key: context})
+
+            stream = self.pipeline.astream_prediction_with_citations if citations else self.pipeline.astream_prediction
+            tokens, context = await stream(vectorstore, question, k)
+            response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+            await response.prepare(request)
+            try:
+                # The store stays pinned until the last token, so it can't be spilled mid-answer
+                await response.write(_ndjson({context_key: context}))
+                async for token in tokens:
+                    await response.write(_ndjson({'token': token}))
+                await response.write(_ndjson({'done': True}))
+            finally:
+                await tokens.aclose()
+            await response.write_eof()
+            return response
+
+    async def quiz(self, request: web.Request) -> web.Response:
+        body = await self._read_json(request)
+        topic = body.get('topic', "")
+        if not isinstance(topic, str):
+            raise _error(web.HTTPBadRequest, "'topic' must be a string")
+        num_questions = self._int_field(body, 'num_questions', 5, 1, MAX_QUIZ_QUESTIONS)
+        k = self._int_field(body, 'k', 10, 1, MAX_K)
+        async with self._corpus(request.match_info['corpus_id']) as vectorstore:
+            quiz = await self.pipeline.agenerate_quiz(vectorstore, topic, num_questions, k)
+        return web.json_response(quiz.to_dict())
+
+    def server_stats(self) -> dict:
+        """
+        Report request admission and per-route latency.
+
+        Returns:
+            Dict with the concurrency limits, requests in flight and waiting, requests
+            refused with 503, and a latency summary per route
+        """
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'rejected': self.rejected,
+            'routes': {name: recorder.summary() for name, recorder in sorted(self.latency.items())},
+        }
+
+    async def stats(self, request: web.Request) -> web.Response:
+        pipeline = self.pipeline
+        return web.json_response({
+            'server': self.server_stats(),
+            'jobs': pipeline.jobs.stats(),
+            'session_memory': pipeline.session_memory_stats(),
+            'retrieval': pipeline.retrieval_metrics(),
+            'streaming': pipeline.streaming_metrics(),
+            'prompt_tokens': pipeline.prompt_token_stats(),
+            'answer_cache': pipeline.answer_cache_stats(),
+            'embedding_cache': pipeline.cache_stats(),
+            'embeddings': pipeline.embedding_metrics(),
+            'rerank': pipeline.rerank_stats(),
+            'shared_index': pipeline.shared_index_stats(),
+        }, dumps=lambda value: json.dumps(value, default=str))
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({'status': 'ok'})
+
+
+def _ndjson(value: dict) -> bytes:
+    return (json.dumps(value) + "\n").encode("utf-8")
+
+
+def run_server(host: str = "127.0.0.1", port: int = 8000) -> None:
+    """Serve the process-wide pipeline over HTTP until interrupted."""
+    from backend.rag_pipeline import get_rag_pipeline
+
+    server = RAGServer(
+        get_rag_pipeline(),
+        # Ingest, question and quiz requests served at once
+        max_concurrency=int(os.getenv("SERVER_MAX_CONCURRENCY", "16")),
+        # Requests allowed to wait for a slot before new ones are refused with 503
+        max_pending=int(os.getenv("SERVER_MAX_PENDING", "64")),
+        # Total size of the PDFs in one upload
+        max_upload_bytes=int(float(os.getenv("SERVER_MAX_UPLOAD_MB", "200")) * 2 ** 20),
+    )
+    web.run_app(server.app(), host=host, port=port)
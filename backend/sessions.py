@@ -0,0 +1,329 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from backend.metrics import LatencyRecorder
+
+_SPILL_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+@dataclass
+class SessionEntry:
+    """A session's vector store (or its spill on disk) and the accounting for it."""
+    session_id: str
+    vectorstore: Any = None  # None while spilled
+    nbytes: int = 0  # Approximate memory of the store, measured when attached or reloaded
+    spilled: bool = False
+    spilled_store: Optional[weakref.ref] = None  # The store object that was spilled, to recognise it if re-attached
+    disk_bytes: int = 0  # Size of the spill on disk
+    last_access: float = field(default_factory=time.time)
+    pins: int = 0  # Requests or jobs using the store right now; a pinned store is never spilled
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)  # Held while spilling or reloading
+
+
+class SessionMemoryManager:
+    """
+    Server-wide registry of each session's vector store, kept under a global memory budget.
+
+    Streamlit keeps a session's objects alive for as long as its websocket lives,
+    so an abandoned browser tab would pin its whole store. Sessions register their
+    store here instead (``attach``) and borrow it for each request (``use``), which
+    pins it and records the access. Whenever the stores in memory add up to more
+    than ``budget_bytes``, the least recently used ones that have been idle for at
+    least ``idle_seconds`` are spilled to disk and released; the next ``use`` of a
+    spilled store reloads it transparently. Spills not used again within
+    ``spill_ttl`` seconds are deleted, and the session with them. Pinned stores are
+    never spilled, so the budget may be exceeded while many sessions are active.
+
+    How a store is measured, written, read back and freed is left to the callbacks,
+    so the registry itself knows nothing about Chroma or the shared index.
+    """
+
+    def __init__(self, spill_dir: str, budget_bytes: int, idle_seconds: float = 300.0, spill_ttl: float = 3600.0,
+                 measure: Optional[Callable[[Any], int]] = None,
+                 spill: Optional[Callable[[Any, str], int]] = None,
+                 restore: Optional[Callable[[str], Any]] = None,
+                 release: Optional[Callable[[Any], None]] = None):
+        """
+        Args:
+            spill_dir: Directory holding one sub-directory per spilled session (created if missing)
+            budget_bytes: Memory allowed for all stores in memory; 0 never spills
+            idle_seconds: Time since a store was last used before it may be spilled
+            spill_ttl: Seconds a spilled store is kept on disk before the session is forgotten
+            measure: Returns the approximate bytes a store holds in memory
+            spill: Writes a store into the given directory and returns the bytes written
+            restore: Reads a store back from a directory written by ``spill``
+            release: Frees a store's memory once it is spilled, replaced or dropped
+        """
+        self.spill_dir = spill_dir
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.spill_ttl = spill_ttl
+        self._measure = measure or (lambda vectorstore: 0)
+        self._spill = spill
+        self._restore = restore
+        self._release = release or (lambda vectorstore: None)
+
+        self.spills = 0
+        self.restores = 0
+        self.expired = 0
+        self.failures = 0
+        self.spill_latency = LatencyRecorder()
+        self.restore_latency = LatencyRecorder()
+        self._entries: Dict[str, SessionEntry] = {}
+        self._lock = threading.Lock()
+        # Spills hold uploaded text and vectors, so other local users must not be able to read
+        # them; chmod also tightens a directory left behind by an older version
+        os.makedirs(spill_dir, mode=0o700, exist_ok=True)
+        os.chmod(spill_dir, 0o700)
+        self._remove_stale_spills()
+
+    def _path(self, session_id: str) -> str:
+        # Hashed so any session id string maps to a fixed-length, path-safe name
+        return os.path.join(self.spill_dir, hashlib.sha256(session_id.encode("utf-8")).hexdigest())
+
+    def _remove_stale_spills(self) -> None:
+        """Delete spills an earlier process left behind once they are older than ``spill_ttl``."""
+        cutoff = time.time() - self.spill_ttl
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            try:
+                stale = _SPILL_NAME.match(name) and os.path.getmtime(path) < cutoff
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def attach(self, session_id: str, vectorstore: Any, unless: Optional[threading.Event] = None) -> bool:
+        """
+        Register a session's store, replacing (and releasing) any store it had before.
+
+        Call again whenever the session's corpus changes, so its size is measured anew.
+        Re-attaching the store the session already has is a no-op, also when that
+        store has been spilled in the meantime (it stays on disk until next used).
+
+        Args:
+            session_id: Session the store belongs to
+            vectorstore: The session's store
+            unless: Event (e.g. a job's cancel event) that, once set, keeps the store from
+                being registered unless the session is still registered; it is checked under
+                the same lock as ``drop``, so setting it before dropping the session means a
+                late attach can't bring the session back
+
+        Returns:
+            False if the store was not registered because ``unless`` was set; releasing
+            it is then up to the caller
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            created = entry is None
+            if created:
+                if unless is not None and unless.is_set():
+                    return False
+                entry = self._entries[session_id] = SessionEntry(session_id)
+        with entry.lock:
+            spilled_store = entry.spilled_store() if entry.spilled_store is not None else None
+            if entry.spilled and spilled_store is vectorstore:
+                with self._lock:
+                    entry.last_access = time.time()
+                return True
+            nbytes = self._measure(vectorstore)
+            with self._lock:
+                current = self._entries.get(session_id) is entry
+                if unless is not None and unless.is_set() and (not current or created and entry.vectorstore is None):
+                    if current:
+                        # The entry was only created for this store
+                        del self._entries[session_id]
+                    return False
+                previous, spilled = entry.vectorstore, entry.spilled
+                entry.vectorstore, entry.nbytes = vectorstore, nbytes
+                entry.spilled, entry.spilled_store, entry.disk_bytes = False, None, 0
+                entry.last_access = time.time()
+                # Dropped or expired meanwhile: the new store starts a fresh entry
+                self._entries[session_id] = entry
+            if spilled:
+                shutil.rmtree(self._path(session_id), ignore_errors=True)
+        if previous is not None and previous is not vectorstore:
+            self._release(previous)
+        self.enforce()
+        return True
+
+    @contextmanager
+    def use(self, session_id: str, default: Any = None) -> Iterator[Any]:
+        """
+        Borrow a session's store for one request, reloading it first if it was spilled.
+
+        The store stays pinned in memory until the block exits.
+
+        Args:
+            session_id: Session whose store to use
+            default: Yielded when the session has no store (never attached, dropped,
+                or spilled so long ago that the spill expired)
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.pins += 1
+                entry.last_access = time.time()
+        if entry is None:
+            yield default
+            return
+        try:
+            with entry.lock:
+                if entry.spilled:
+                    self._reload(entry)
+                vectorstore = entry.vectorstore
+            yield vectorstore if vectorstore is not None else default
+        finally:
+            with self._lock:
+                entry.pins -= 1
+                entry.last_access = time.time()
+            self.enforce()
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._entries
+
+    def drop(self, session_id: str) -> None:
+        """Forget a session, releasing its store or deleting its spill."""
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return
+        with entry.lock:
+            vectorstore, entry.vectorstore = entry.vectorstore, None
+            entry.spilled_store = None
+            if entry.spilled:
+                shutil.rmtree(self._path(session_id), ignore_errors=True)
+        if vectorstore is not None:
+            self._release(vectorstore)
+
+    def _reload(self, entry: SessionEntry) -> None:
+        """Read a spilled store back into memory (call with ``entry.lock`` held)."""
+        path = self._path(entry.session_id)
+        start = time.perf_counter()
+        try:
+            vectorstore = self._restore(path)
+        except Exception:
+            # Unreadable spill: the session has to upload its files again
+            with self._lock:
+                self.failures += 1
+                if self._entries.get(entry.session_id) is entry:
+                    del self._entries[entry.session_id]
+                entry.spilled, entry.spilled_store = False, None
+            shutil.rmtree(path, ignore_errors=True)
+            return
+        nbytes = self._measure(vectorstore)
+        self.restore_latency.record(time.perf_counter() - start)
+        with self._lock:
+            entry.vectorstore, entry.nbytes = vectorstore, nbytes
+            entry.spilled, entry.spilled_store, entry.disk_bytes = False, None, 0
+            self.restores += 1
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _spill_entry(self, entry: SessionEntry) -> None:
+        """Write an idle store to disk and release it, unless it was used in the meantime."""
+        with entry.lock:
+            with self._lock:
+                if entry.pins or entry.vectorstore is None or self._entries.get(entry.session_id) is not entry:
+                    return
+                vectorstore = entry.vectorstore
+            start = time.perf_counter()
+            try:
+                disk_bytes = self._spill(vectorstore, self._path(entry.session_id))
+            except Exception:
+                # Keep the store in memory rather than lose it
+                with self._lock:
+                    self.failures += 1
+                return
+            self.spill_latency.record(time.perf_counter() - start)
+            with self._lock:
+                entry.vectorstore = None
+                entry.spilled, entry.spilled_store, entry.disk_bytes = True, weakref.ref(vectorstore), disk_bytes
+                self.spills += 1
+        self._release(vectorstore)
+
+    def enforce(self) -> None:
+        """
+        Delete expired spills, then spill idle stores until those in memory fit the budget.
+
+        Runs after every ``attach`` and ``use``; call it directly to apply the budget
+        without a request (e.g. from a periodic task).
+        """
+        now = time.time()
+        with self._lock:
+            expired = [
+                entry for entry in self._entries.values()
+                if entry.spilled and not entry.pins and now - entry.last_access > self.spill_ttl
+            ]
+            for entry in expired:
+                del self._entries[entry.session_id]
+            self.expired += len(expired)
+
+            victims: List[SessionEntry] = []
+            resident = sum(entry.nbytes for entry in self._entries.values() if entry.vectorstore is not None)
+            if self._spill is not None and self.budget_bytes > 0 and resident > self.budget_bytes:
+                idle = sorted(
+                    (entry for entry in self._entries.values()
+                     if entry.vectorstore is not None and not entry.pins
+                     and now - entry.last_access >= self.idle_seconds),
+                    key=lambda entry: entry.last_access
+                )
+                for entry in idle:
+                    if resident <= self.budget_bytes:
+                        break
+                    victims.append(entry)
+                    resident -= entry.nbytes
+
+        for entry in expired:
+            shutil.rmtree(self._path(entry.session_id), ignore_errors=True)
+        for entry in victims:
+            self._spill_entry(entry)
+
+    def report(self) -> dict:
+        """
+        Report memory held per session and the spill activity so far.
+
+        Returns:
+            Dict with the budget, bytes in memory and on disk, spill/reload counters and
+            latency summaries, and 'sessions': one row per session, largest first, with
+            a shortened session id (full ids double as URLs to the session)
+        """
+        now = time.time()
+        with self._lock:
+            rows = [
+                {
+                    'session': entry.session_id[:8],
+                    'state': 'disk' if entry.spilled else 'memory',
+                    'bytes': entry.nbytes if entry.vectorstore is not None else 0,
+                    'disk_bytes': entry.disk_bytes,
+                    'idle_s': round(now - entry.last_access, 1),
+                    'in_use': entry.pins,
+                }
+                for entry in self._entries.values()
+            ]
+            counters = {
+                'spills': self.spills,
+                'restores': self.restores,
+                'expired': self.expired,
+                'failures': self.failures,
+            }
+        rows.sort(key=lambda row: (row['bytes'], row['disk_bytes']), reverse=True)
+        return {
+            'budget_bytes': self.budget_bytes,
+            'resident_bytes': sum(row['bytes'] for row in rows),
+            'disk_bytes': sum(row['disk_bytes'] for row in rows),
+            'in_memory': sum(row['state'] == 'memory' for row in rows),
+            'on_disk': sum(row['state'] == 'disk' for row in rows),
+            **counters,
+            'spill_latency': self.spill_latency.summary(),
+            'restore_latency': self.restore_latency.summary(),
+            'sessions': rows,
+        }
@@ -0,0 +1,82 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Only the standard library is imported here, so the app can import this module
+# and render its first page before any ML or vector-store code is loaded.
+
+_lock = threading.Lock()
+_warm_thread: Optional[threading.Thread] = None
+_ready = threading.Event()
+_error: Optional[BaseException] = None
+_timings: Dict[str, float] = {}
+
+
+def get_pipeline() -> Any:
+    """
+    Return the shared RAGPipeline, importing and building it on first use.
+
+    Blocks until the pipeline exists; the embedding model may still be loading
+    in the background, and is waited for by the first call that needs it.
+    """
+    start = time.perf_counter()
+    from backend.rag_pipeline import get_rag_pipeline
+
+    pipeline = get_rag_pipeline()
+    _timings.setdefault('pipeline_s', time.perf_counter() - start)
+    return pipeline
+
+
+def _warm_up() -> None:
+    global _error
+    start = time.perf_counter()
+    try:
+        pipeline = get_pipeline()
+        pipeline.warm()
+    except Exception as exc:
+        # Leave the failure to the first real request, which reports it to the user
+        _error = exc
+    finally:
+        _timings['warm_up_s'] = time.perf_counter() - start
+        _ready.set()
+
+
+def warm_up_in_background() -> threading.Thread:
+    """
+    Build the pipeline and load its heavy dependencies in a daemon thread.
+
+    Safe to call on every Streamlit rerun: only the first call starts a thread.
+
+    Returns:
+        The warm-up thread
+    """
+    global _warm_thread
+    with _lock:
+        if _warm_thread is None:
+            _warm_thread = threading.Thread(target=_warm_up, name="pipeline-warmup", daemon=True)
+            _warm_thread.start()
+        return _warm_thread
+
+
+def is_ready() -> bool:
+    """True once the background warm-up has finished (successfully or not)."""
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """Block until the warm-up finishes; returns False on timeout."""
+    return _ready.wait(timeout)
+
+
+def startup_stats() -> dict:
+    """
+    Report how long building and warming the pipeline took.
+
+    Returns:
+        Dict with 'ready', 'error' and the timings measured so far, in seconds
+    """
+    return {
+        'ready': is_ready(),
+        'error': repr(_error) if _error is not None else None,
+        **_timings,
+    }
@@ -0,0 +1,396 @@
+import json
+import os
+import shutil
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    # LangChain's vector store base pulls in its retriever and tracing stack
+    # (about half a second), which the app shouldn't pay for at startup
+    from langchain_core.documents import Document
+    from langchain_core.vectorstores import VectorStoreRetriever
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+QUANTIZATIONS = ("none", "float16", "int8")
+
+
+def quantize_rows(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Compress unit-normalised vectors for approximate scoring.
+
+    Args:
+        vectors: (N, d) float32 matrix
+        quantization: 'float16' (2x smaller) or 'int8' (4x smaller, symmetric per-row scale)
+
+    Returns:
+        Tuple of (codes, per-row scales or None)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if quantization == "float16":
+        return vectors.astype(np.float16), None
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.empty(0, dtype=np.float32)
+        scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown quantization {quantization!r}; expected one of {', '.join(QUANTIZATIONS)}")
+
+
+def approximate_scores(codes: np.ndarray, scales: Optional[np.ndarray], queries: np.ndarray,
+                       block_rows: int = 2048) -> np.ndarray:
+    """
+    Score queries against quantized rows, dequantizing one block at a time.
+
+    Only ``block_rows`` rows are ever expanded to float32, so scanning a large
+    memory-mapped code matrix doesn't materialise a full-precision copy.
+
+    Returns:
+        (Q, N) float32 approximate dot products
+    """
+    scores = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+    queries_t = np.ascontiguousarray(queries.T, dtype=np.float32)
+    for start in range(0, codes.shape[0], block_rows):
+        block = np.asarray(codes[start:start + block_rows], dtype=np.float32) @ queries_t
+        if scales is not None:
+            block *= np.asarray(scales[start:start + block_rows])[:, None]
+        scores[:, start:start + block_rows] = block.T
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class NumpyVectorStore:
+    """
+    Read-only vector store over a unit-normalised float32 matrix and its chunk store.
+
+    The matrix may be a read-only ``np.memmap``, in which case the vectors live in the
+    OS page cache and are shared by every store opened on the same file. Search is
+    exact cosine similarity, so results match a brute-force scan of the corpus.
+
+    With quantized ``codes`` the scan runs over the compact int8 or float16 matrix
+    instead, and only a shortlist of ``rerank_factor * k`` candidates is rescored
+    against the float32 rows, so the full-precision matrix can stay on disk.
+
+    It implements LangChain's ``VectorStore`` search interface without inheriting
+    from it, so importing this module doesn't import LangChain's vector store stack;
+    the class is registered as a virtual ``VectorStore`` subclass on the first
+    ``as_retriever`` call.
+    """
+
+    def __init__(self, vectors: np.ndarray, texts: List[str], metadatas: List[dict], embedding: Any,
+                 page_count: int = 0, sources: Optional[Dict[str, dict]] = None,
+                 extras: Optional[Dict[str, Any]] = None, codes: Optional[np.ndarray] = None,
+                 scales: Optional[np.ndarray] = None, rerank_factor: int = 4):
+        """
+        Args:
+            vectors: (N, d) unit-normalised float32 matrix, row i embedding texts[i]
+            texts: Chunk texts
+            metadatas: Chunk metadata dicts
+            embedding: Embeddings implementation used for text queries
+            page_count: Number of PDF pages the chunks came from
+            sources: Per-file stats (content_hash, page_count, chunk_count) keyed by file name
+            extras: Derived structures (e.g. a lexical index) shared by all handles on the corpus
+            codes: Optional quantized copy of ``vectors`` (see ``quantize_rows``) used for the scan
+            scales: Per-row int8 scales for ``codes``
+            rerank_factor: Shortlist size, as a multiple of k, rescored in float32 when ``codes`` is set
+        """
+        self.vectors = vectors
+        self.texts = texts
+        self.metadatas = metadatas
+        self.page_count = page_count
+        self.sources = sources or {}
+        self.extras = extras if extras is not None else {}
+        self.codes = codes
+        self.scales = scales
+        self.rerank_factor = rerank_factor
+        self._embedding = embedding
+
+    @property
+    def embeddings(self) -> Any:
+        return self._embedding
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.texts)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("NumpyVectorStore is read-only")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Any, metadatas: Optional[List[dict]] = None,
+                   **kwargs: Any) -> "NumpyVectorStore":
+        vectors = normalize_rows(np.asarray(embedding.embed_documents(list(texts)), dtype=np.float32))
+        return cls(vectors, list(texts), metadatas or [{} for _ in texts], embedding)
+
+    def as_retriever(self, **kwargs: Any) -> "VectorStoreRetriever":
+        """Return a LangChain retriever over this store (kwargs as for ``VectorStore.as_retriever``)."""
+        from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
+
+        VectorStore.register(NumpyVectorStore)
+        return VectorStoreRetriever(vectorstore=self, **kwargs)
+
+    def get_document(self, index: int) -> "Document":
+        """Return the chunk at row ``index`` as a Document."""
+        from langchain_core.documents import Document
+
+        return Document(page_content=self.texts[index], metadata=dict(self.metadatas[index]))
+
+    def search_rows(self, query_vectors: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Vectorised top-k search returning row indices, without building Documents.
+
+        Args:
+            query_vectors: (Q, d) matrix of query embeddings
+            k: Number of results per query
+
+        Returns:
+            One (rows, cosine_similarities) pair per query, best first
+        """
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        if not self.texts:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        if self.codes is None:
+            scores = queries @ np.asarray(self.vectors).T
+            results = []
+            for row in scores:
+                best = top_k(row, k)
+                results.append((best, row[best]))
+            return results
+
+        scores = approximate_scores(self.codes, self.scales, queries)
+        results = []
+        for query, row in zip(queries, scores):
+            # Sorted row order keeps reads from a memory-mapped matrix sequential
+            shortlist = np.sort(top_k(row, max(k, k * self.rerank_factor)))
+            exact = np.asarray(self.vectors[shortlist], dtype=np.float32) @ query
+            best = top_k(exact, k)
+            results.append((shortlist[best], exact[best]))
+        return results
+
+    def search_by_vectors(self, query_vectors: np.ndarray, k: int) -> List[List[Tuple["Document", float]]]:
+        """
+        Vectorised top-k search for a batch of query embeddings.
+
+        Returns:
+            One list of (Document, cosine_similarity) per query, best first
+        """
+        return [
+            [(self.get_document(int(i)), float(score)) for i, score in zip(rows, scores)]
+            for rows, scores in self.search_rows(query_vectors, k)
+        ]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple["Document", float]]:
+        return self.search_by_vectors(np.asarray([embedding], dtype=np.float32), k)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List["Document"]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple["Document", float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List["Document"]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda score: score
+
+
+class _SharedCorpus:
+    """One memory-mapped corpus loaded in this process, plus its reference count."""
+
+    def __init__(self, vectors: np.ndarray, texts: List[str], metadatas: List[dict], page_count: int,
+                 sources: Dict[str, dict], codes: Optional[np.ndarray] = None, scales: Optional[np.ndarray] = None):
+        self.vectors = vectors
+        self.codes = codes
+        self.scales = scales
+        self.texts = texts
+        self.metadatas = metadatas
+        self.page_count = page_count
+        self.sources = sources
+        self.extras: Dict[str, Any] = {}
+        self.refs = 0
+
+
+class SharedIndexRegistry:
+    """
+    Process-wide registry of read-only, memory-mapped corpora.
+
+    Corpora are deduplicated by fingerprint: every session opening the same corpus
+    gets its own lightweight ``NumpyVectorStore`` handle over one shared vector file
+    and chunk store, so many users on one course pack cost one copy of RAM. Handles
+    are reference counted; when the last one is released or garbage collected the
+    corpus is unloaded and its files are removed.
+
+    With quantization enabled, a compact int8 or float16 copy of the vectors is
+    written next to the float32 file and used for the scan; the float32 rows are
+    only read for the shortlist being reranked.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    CODES_FILE = "codes.npy"
+    SCALES_FILE = "scales.npy"
+    CHUNKS_FILE = "chunks.json"
+
+    def __init__(self, root_dir: str, quantization: str = "none", rerank_factor: int = 4):
+        """
+        Args:
+            root_dir: Directory holding one sub-directory per corpus fingerprint
+            quantization: 'none', 'float16' or 'int8' storage for the scanned vectors
+            rerank_factor: Shortlist size, as a multiple of k, rescored in float32 when quantized
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}; expected one of {', '.join(QUANTIZATIONS)}")
+        self.root_dir = root_dir
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self._corpora: Dict[str, _SharedCorpus] = {}
+        # Re-entrant because handles may be released by the garbage collector at any point
+        self._build_locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.RLock()
+        # Corpora hold the text of uploaded documents, so other local users must not be able
+        # to read them; chmod also tightens a directory left behind by an older version
+        os.makedirs(root_dir, mode=0o700, exist_ok=True)
+        os.chmod(root_dir, 0o700)
+
+    def _corpus_dir(self, fingerprint: str) -> str:
+        return os.path.join(self.root_dir, fingerprint)
+
+    def _write(self, fingerprint: str, texts: List[str], metadatas: List[dict], vectors: np.ndarray, page_count: int,
+               sources: Dict[str, dict]) -> None:
+        corpus_dir = self._corpus_dir(fingerprint)
+        tmp_dir = f"{corpus_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp_dir, mode=0o700, exist_ok=True)
+        os.chmod(tmp_dir, 0o700)
+        vectors = normalize_rows(vectors.reshape(len(texts), -1) if len(texts) else vectors)
+        np.save(os.path.join(tmp_dir, self.VECTORS_FILE), vectors)
+        if self.quantization != "none" and len(texts):
+            codes, scales = quantize_rows(vectors, self.quantization)
+            np.save(os.path.join(tmp_dir, self.CODES_FILE), codes)
+            if scales is not None:
+                np.save(os.path.join(tmp_dir, self.SCALES_FILE), scales)
+        with open(os.path.join(tmp_dir, self.CHUNKS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"texts": texts, "metadatas": metadatas, "page_count": page_count, "sources": sources}, f)
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+        os.replace(tmp_dir, corpus_dir)
+
+    def _load(self, fingerprint: str) -> _SharedCorpus:
+        corpus_dir = self._corpus_dir(fingerprint)
+        vectors = np.load(os.path.join(corpus_dir, self.VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(corpus_dir, self.CHUNKS_FILE), "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        codes = scales = None
+        if os.path.exists(os.path.join(corpus_dir, self.CODES_FILE)):
+            codes = np.load(os.path.join(corpus_dir, self.CODES_FILE), mmap_mode="r")
+            if os.path.exists(os.path.join(corpus_dir, self.SCALES_FILE)):
+                scales = np.load(os.path.join(corpus_dir, self.SCALES_FILE))
+        return _SharedCorpus(vectors, payload["texts"], payload["metadatas"], payload["page_count"], payload["sources"],
+                             codes=codes, scales=scales)
+
+    def acquire(self, fingerprint: str, build: Callable[[], Tuple[List[str], List[dict], np.ndarray, int, Dict[str, dict]]],
+                embedding: Any) -> NumpyVectorStore:
+        """
+        Open a handle on a shared corpus, building it if no session has it loaded.
+
+        Args:
+            fingerprint: Corpus fingerprint (content hashes plus ingest settings)
+            build: Called once per corpus to produce (texts, metadatas, vectors, page_count, per-file stats)
+            embedding: Embeddings implementation used by the handle for text queries
+
+        Returns:
+            A NumpyVectorStore handle; release it with ``release`` or by dropping it
+        """
+        while True:
+            with self._lock:
+                build_lock = self._build_locks.setdefault(fingerprint, threading.RLock())
+
+            # Concurrent sessions uploading the same corpus wait for a single build
+            with build_lock:
+                with self._lock:
+                    if self._build_locks.get(fingerprint) is not build_lock:
+                        # The corpus was released and its lock dropped while we waited
+                        continue
+                    corpus = self._corpora.get(fingerprint)
+                if corpus is None:
+                    texts, metadatas, vectors, page_count, sources = build()
+                    self._write(fingerprint, texts, metadatas, np.asarray(vectors, dtype=np.float32), page_count, sources)
+                    corpus = self._load(fingerprint)
+
+                with self._lock:
+                    corpus = self._corpora.setdefault(fingerprint, corpus)
+                    corpus.refs += 1
+            break
+
+        handle = NumpyVectorStore(corpus.vectors, corpus.texts, corpus.metadatas, embedding,
+                                  page_count=corpus.page_count, sources=corpus.sources, extras=corpus.extras,
+                                  codes=corpus.codes, scales=corpus.scales, rerank_factor=self.rerank_factor)
+        handle.fingerprint = fingerprint
+        handle._finalizer = weakref.finalize(handle, self._release, fingerprint)
+        return handle
+
+    def release(self, handle: NumpyVectorStore) -> None:
+        """Release a handle now instead of waiting for garbage collection."""
+        finalizer = getattr(handle, "_finalizer", None)
+        if finalizer is not None:
+            finalizer()
+
+    def _release(self, fingerprint: str) -> None:
+        while True:
+            with self._lock:
+                build_lock = self._build_locks.get(fingerprint)
+            if build_lock is None:
+                return
+            # Hold the build lock so a concurrent rebuild can't lose its files to this cleanup
+            with build_lock:
+                with self._lock:
+                    if self._build_locks.get(fingerprint) is not build_lock:
+                        continue
+                    corpus = self._corpora.get(fingerprint)
+                    if corpus is None:
+                        return
+                    corpus.refs -= 1
+                    if corpus.refs > 0:
+                        return
+                    del self._corpora[fingerprint]
+                    # The next acquire creates a fresh lock, so there is no lock left behind
+                    # for every corpus ever loaded
+                    del self._build_locks[fingerprint]
+                shutil.rmtree(self._corpus_dir(fingerprint), ignore_errors=True)
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report loaded corpora and their reference counts.
+
+        Returns:
+            Dict with per-fingerprint session count, chunk count, float32 vector bytes
+            and quantized code bytes (0 when quantization is off)
+        """
+        with self._lock:
+            return {
+                fingerprint: {
+                    'sessions': corpus.refs,
+                    'chunks': len(corpus.texts),
+                    'vector_bytes': int(corpus.vectors.nbytes),
+                    'code_bytes': int(corpus.codes.nbytes) + (int(corpus.scales.nbytes) if corpus.scales is not None else 0)
+                    if corpus.codes is not None else 0,
+                }
+                for fingerprint, corpus in self._corpora.items()
+            }
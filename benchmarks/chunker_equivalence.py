@@ -0,0 +1,151 @@
+"""
+Chunker benchmark: single-pass TokenChunker vs. LangChain's recursive splitter.
+
+Splits the pages of synthetic PDFs (or of the PDFs given with --pdf) with both
+chunkers at the pipeline's settings, page by page as ingest does, and reports:
+
+  * speed        - chunks/s and pages/s of each chunker
+  * chunk counts - total chunks and mean / max tokens per chunk
+  * agreement    - share of the recursive splitter's chunks produced verbatim
+  * coverage     - share of each page's non-whitespace text found in some chunk
+
+and checks that the token chunker stays within tolerance of the recursive
+splitter: chunk count within --tolerance, no chunk over the chunk size and
+full coverage. Pages of non-ASCII text (CJK without spaces, accented words and
+emoji, whose characters span several tokens) are split by the token chunker as
+well and held to the same size and coverage checks. Exits non-zero if a check fails.
+
+Usage:
+    python benchmarks/chunker_equivalence.py [--pages 200] [--chunk-size 512] [--chunk-overlap 16] [--tolerance 0.05] [--non-ascii-pages 50] [--pdf notes.pdf ...]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import make_pdf  # noqa: E402
+
+from backend.context import get_encoding  # noqa: E402
+from backend.ingest import get_text_splitter, load_pdf_pages  # noqa: E402
+
+
+def coverage(page: str, chunks: List[str]) -> float:
+    """Share of the page's non-whitespace characters that lie inside some chunk."""
+    covered = [False] * len(page)
+    position = 0
+    for chunk in chunks:
+        found = page.find(chunk, max(0, position - 4 * len(chunk)))
+        if found < 0:
+            found = page.find(chunk)
+        if found < 0:
+            continue
+        covered[found:found + len(chunk)] = [True] * len(chunk)
+        position = found + len(chunk)
+    visible = [i for i, char in enumerate(page) if not char.isspace()]
+    return sum(covered[i] for i in visible) / len(visible) if visible else 1.0
+
+
+def non_ascii_pages(count: int, lines_per_page: int, seed: int = 0) -> List[str]:
+    """Pages of unspaced CJK sentences, accented words and emoji, with line and paragraph breaks."""
+    rng = random.Random(seed)
+    letters = "aeiouàáâäåçèéêëìíîïñòóôöøùúûüßæœbcdfghjklmnprstvz"
+    emoji = "😀🚀📚🧠✅"
+    pages = []
+    for _ in range(count):
+        lines = []
+        for _ in range(lines_per_page):
+            parts = []
+            for _ in range(rng.randint(1, 4)):
+                if rng.random() < 0.6:
+                    sentence = "".join(chr(rng.randint(0x4E00, 0x9FFF)) for _ in range(rng.randint(5, 40)))
+                    parts.append(sentence + "".join(rng.choice(emoji) for _ in range(rng.randint(0, 2))) + "。")
+                else:
+                    parts.extend("".join(rng.choice(letters) for _ in range(rng.randint(3, 10)))
+                                 for _ in range(rng.randint(1, 6)))
+            lines.append(" ".join(parts))
+            if rng.random() < 0.1:
+                lines.append("")
+        pages.append("\n".join(lines))
+    return pages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="Pages of synthetic text (ignored with --pdf)")
+    parser.add_argument("--lines-per-page", type=int, default=48)
+    parser.add_argument("--pdf", nargs="*", default=[], help="Real PDFs to split instead of synthetic pages")
+    parser.add_argument("--encoding", default="cl100k_base")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("CHUNK_SIZE", "512")))
+    parser.add_argument("--chunk-overlap", type=int, default=int(os.getenv("CHUNK_OVERLAP", "16")))
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Allowed relative difference in chunk count")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--non-ascii-pages", type=int, default=50, help="Pages of CJK, accented and emoji text")
+    args = parser.parse_args()
+
+    if args.pdf:
+        pages = [page.page_content for path in args.pdf for page in load_pdf_pages(open(path, "rb").read(), path)]
+    else:
+        pages = [page.page_content for page in load_pdf_pages(make_pdf(args.pages, args.lines_per_page), "synthetic.pdf")]
+    encoding = get_encoding(args.encoding)
+    print(f"{len(pages)} pages, chunk size {args.chunk_size}, overlap {args.chunk_overlap}\n")
+
+    outputs = {}
+    print(f"{'chunker':<10} {'chunks':>7} {'chunks/s':>10} {'pages/s':>9} {'mean tok':>9} {'max tok':>8} {'coverage':>9}")
+    for name in ("recursive", "token"):
+        splitter = get_text_splitter(args.encoding, args.chunk_size, args.chunk_overlap, name)
+        splitter.split_text(pages[0])  # Warm up
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            chunks = [splitter.split_text(page) for page in pages]
+            best = min(best, time.perf_counter() - start)
+        outputs[name] = chunks
+        flat = [chunk for page_chunks in chunks for chunk in page_chunks]
+        sizes = [len(encoding.encode_ordinary(chunk)) for chunk in flat]
+        covered = min((coverage(page, page_chunks) for page, page_chunks in zip(pages, chunks)), default=1.0)
+        print(f"{name:<10} {len(flat):>7} {len(flat) / best:>10.0f} {len(pages) / best:>9.0f} "
+              f"{sum(sizes) / max(1, len(sizes)):>9.1f} {max(sizes, default=0):>8} {covered:>9.2%}")
+
+    reference = [chunk for page_chunks in outputs["recursive"] for chunk in page_chunks]
+    candidate = [chunk for page_chunks in outputs["token"] for chunk in page_chunks]
+    produced = set(candidate)
+    agreement = sum(chunk in produced for chunk in reference) / max(1, len(reference))
+    count_change = (len(candidate) - len(reference)) / max(1, len(reference))
+    print(f"\nIdentical chunks: {agreement:.1%} of the recursive splitter's; chunk count {count_change:+.1%}")
+
+    failures = []
+    if abs(count_change) > args.tolerance:
+        failures.append(f"chunk count differs by {count_change:+.1%} (tolerance {args.tolerance:.0%})")
+    oversized = sum(len(encoding.encode_ordinary(chunk)) > args.chunk_size for chunk in candidate)
+    if oversized:
+        failures.append(f"{oversized} chunks longer than {args.chunk_size} tokens")
+    uncovered = sum(coverage(page, page_chunks) < 1.0 for page, page_chunks in zip(pages, outputs["token"]))
+    if uncovered:
+        failures.append(f"{uncovered} pages not fully covered")
+
+    if args.non_ascii_pages:
+        splitter = get_text_splitter(args.encoding, args.chunk_size, args.chunk_overlap, "token")
+        extra = non_ascii_pages(args.non_ascii_pages, args.lines_per_page)
+        extra_chunks = [splitter.split_text(page) for page in extra]
+        sizes = [len(encoding.encode_ordinary(chunk)) for page_chunks in extra_chunks for chunk in page_chunks]
+        print(f"Non-ASCII: {len(extra)} pages, {len(sizes)} chunks, max {max(sizes, default=0)} tokens")
+        oversized = sum(size > args.chunk_size for size in sizes)
+        if oversized:
+            failures.append(f"{oversized} non-ASCII chunks longer than {args.chunk_size} tokens")
+        uncovered = sum(coverage(page, page_chunks) < 1.0 for page, page_chunks in zip(extra, extra_chunks))
+        if uncovered:
+            failures.append(f"{uncovered} non-ASCII pages not fully covered")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: within tolerance")
+
+
+if __name__ == "__main__":
+    main()
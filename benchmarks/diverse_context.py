@@ -0,0 +1,98 @@
+"""
+Micro-benchmark: plain top-k vs. MMR selection of quiz context.
+
+Builds a synthetic corpus of unit vectors in which consecutive chunks of a
+page overlap (near-duplicate vectors) and pages cluster around a handful of
+topics per document, then compares for a topic query and for a blank topic
+(coverage of the whole corpus):
+
+  * top-k - the k most similar chunks
+  * mmr   - ``mmr_select`` over the stored vectors
+
+Reported: selection time and the distinct pages, distinct documents and mean
+pairwise cosine similarity of the selected chunks.
+
+Usage:
+    python benchmarks/diverse_context.py [--chunks 50000] [--k 10] [--dim 384] [--repeat 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.diversity import CorpusMatrix, mmr_select  # noqa: E402
+from backend.vector_index import normalize_rows, top_k  # noqa: E402
+
+
+def make_corpus(chunks: int, dim: int, chunks_per_page: int = 3, pages_per_doc: int = 200,
+                topics: int = 40, seed: int = 0) -> CorpusMatrix:
+    rng = np.random.default_rng(seed)
+    pages = -(-chunks // chunks_per_page)
+    topic_vectors = normalize_rows(rng.normal(size=(topics, dim)))
+    page_topics = rng.integers(0, topics, size=pages)
+    page_vectors = normalize_rows(topic_vectors[page_topics] + 0.6 * normalize_rows(rng.normal(size=(pages, dim))))
+    vectors = np.repeat(page_vectors, chunks_per_page, axis=0)[:chunks]
+    vectors = normalize_rows(vectors + 0.15 * normalize_rows(rng.normal(size=(chunks, dim))))
+    metadatas = [
+        {'source': f"doc-{(i // chunks_per_page) // pages_per_doc}.pdf", 'page': i // chunks_per_page}
+        for i in range(chunks)
+    ]
+    return CorpusMatrix.build(vectors, metadatas, range(chunks), normalized=True)
+
+
+def describe(corpus: CorpusMatrix, rows: np.ndarray) -> dict:
+    vectors = corpus.vectors[rows]
+    similarity = vectors @ vectors.T
+    pairs = similarity[np.triu_indices(len(rows), k=1)]
+    return {
+        'pages': len(set(corpus.page_ids[rows].tolist())),
+        'documents': len(set(corpus.source_ids[rows].tolist())),
+        'mean_similarity': float(pairs.mean()) if len(pairs) else 0.0,
+    }
+
+
+def timed(fn, repeat: int):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, 1000 * statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.chunks, args.dim)
+    query = corpus.vectors[len(corpus) // 2]
+    print(f"{len(corpus)} chunks, {len(set(corpus.page_ids.tolist()))} pages, "
+          f"{len(set(corpus.source_ids.tolist()))} documents, k={args.k}\n")
+    print(f"{'query':<8} {'method':<6} {'ms':>7} {'pages':>6} {'docs':>5} {'mean sim':>9}")
+
+    for label, vector in (("topic", query), ("blank", None)):
+        target = corpus.centroid if vector is None else vector
+        methods = {
+            'top-k': lambda: top_k(corpus.vectors @ target, args.k),
+            'mmr': lambda: mmr_select(corpus, args.k, vector, lambda_mult=args.lambda_mult),
+        }
+        for name, fn in methods.items():
+            rows, ms = timed(fn, args.repeat)
+            stats = describe(corpus, rows)
+            print(f"{label:<8} {name:<6} {ms:>7.2f} {stats['pages']:>6} {stats['documents']:>5} {stats['mean_similarity']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
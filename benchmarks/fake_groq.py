@@ -0,0 +1,176 @@
+"""
+Local stand-in for the Groq chat completions API.
+
+Serves ``POST /openai/v1/chat/completions`` in the OpenAI-compatible format the
+Groq SDK expects, both as a single JSON response and as a server-sent event
+stream, after a configurable delay that can grow with prompt length. Point the pipeline at it with
+``GROQ_BASE_URL=http://127.0.0.1:<port>`` to measure end-to-end latency without
+network variance or API cost.
+
+Usage:
+    python benchmarks/fake_groq.py [--port 8787] [--delay 0.5] [--tokens 64] [--token-delay 0.01] [--prompt-token-delay 0.0001]
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+
+class FakeGroqServer:
+    """Threaded HTTP server answering chat completions with canned text."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, tokens: int = 64,
+                 token_delay: float = 0.0, responder: Optional[Callable[[dict], str]] = None,
+                 prompt_token_delay: float = 0.0):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            delay: Seconds before the response (or, when streaming, the first token)
+            tokens: Tokens per answer
+            token_delay: Seconds per generated token (between streamed tokens, and
+                added to the delay of a non-streamed response)
+            responder: Builds the answer text from the request body; its words are the
+                tokens. Defaults to ``tokens`` placeholder words.
+            prompt_token_delay: Seconds per prompt word added to the delay, so longer
+                prompts take longer to answer, as with a real model's prefill
+        """
+        self.delay = delay
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.responder = responder
+        self.prompt_token_delay = prompt_token_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGroqServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeGroqServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, delayed ACKs add ~40 ms
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                with server._lock:
+                    server.requests += 1
+                if server.responder is not None:
+                    words = server.responder(body).split(" ")
+                else:
+                    words = [f"token{i}" for i in range(server.tokens)]
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                model = body.get("model", "fake")
+                prompt_words = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+                time.sleep(server.delay + server.prompt_token_delay * prompt_words)
+
+                if not body.get("stream"):
+                    # Generation time grows with answer length, as with a real model
+                    time.sleep(server.token_delay * len(words))
+                    payload = json.dumps({
+                        "id": completion_id,
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": " ".join(words)},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+                    }).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for i, word in enumerate(words):
+                    if i and server.token_delay:
+                        time.sleep(server.token_delay)
+                    self._event({
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                    })
+                self._event({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                })
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _event(self, payload: dict) -> None:
+                self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--prompt-token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeGroqServer(args.host, args.port, args.delay, args.tokens, args.token_delay,
+                            prompt_token_delay=args.prompt_token_delay)
+    print(f"Fake Groq API listening on {server.url} (set GROQ_BASE_URL to this)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
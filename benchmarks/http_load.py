@@ -0,0 +1,197 @@
+"""
+HTTP serving benchmark: throughput and latency of ``run.py --serve`` under concurrent load.
+
+Starts the API in a separate interpreter (``python run.py --serve``) against a local
+fake Groq server (``fake_groq.py``), uploads synthetic PDFs through ``POST /corpora``
+and polls the ingest job, then drives the question endpoints with a closed-loop
+load generator: at each concurrency level, that many clients send requests back to
+back until --requests have been answered. Reported per endpoint and concurrency:
+
+  * req/s        - answered requests per second
+  * p50/p95/p99  - request latency; for streamed answers also time to the first token
+  * 503          - requests refused by the server's admission limit
+
+The semantic answer cache is off by default so every question reaches the LLM;
+--server-concurrency and --max-pending set SERVER_MAX_CONCURRENCY and
+SERVER_MAX_PENDING to see where the server starts refusing load.
+
+Usage:
+    python benchmarks/http_load.py [--pages 40] [--concurrency 1 8 32] [--requests 200] [--llm-delay 0.2]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp  # noqa: E402
+from fake_groq import FakeGroqServer  # noqa: E402
+from synthetic_pdf import make_pdf_files, make_questions  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))]
+
+
+def ms(value: Optional[float]) -> str:
+    return f"{1000 * value:.0f}" if value is not None else "-"
+
+
+async def wait_ready(session: aiohttp.ClientSession, url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            async with session.get(f"{url}/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientConnectionError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("Server did not become ready")
+
+
+async def ingest(session: aiohttp.ClientSession, url: str, files: int, pages: int) -> str:
+    form = aiohttp.FormData()
+    for pdf in make_pdf_files(files, pages):
+        form.add_field("file", pdf.getvalue(), filename=pdf.name, content_type="application/pdf")
+    start = time.perf_counter()
+    async with session.post(f"{url}/corpora", data=form) as response:
+        response.raise_for_status()
+        created = await response.json()
+    job_id = created["job"]["job_id"]
+    while True:
+        async with session.get(f"{url}/jobs/{job_id}") as response:
+            job = await response.json()
+        if job["state"] in ("done", "failed", "cancelled"):
+            break
+        await asyncio.sleep(0.1)
+    if job["state"] != "done":
+        raise RuntimeError(f"Ingest {job['state']}: {job['error']}")
+    elapsed = time.perf_counter() - start
+    print(f"Ingested {files} x {pages} pages ({job['chunks']} chunks) in {elapsed:.1f}s over HTTP\n")
+    return created["corpus_id"]
+
+
+async def one_request(session: aiohttp.ClientSession, endpoint: str, body: dict, stream: bool) -> dict:
+    start = time.perf_counter()
+    async with session.post(endpoint, json={**body, "stream": stream}) as response:
+        if response.status != 200:
+            await response.read()
+            return {"status": response.status}
+        ttft = None
+        if stream:
+            async for line in response.content:
+                if ttft is None and line.startswith(b'{"token"'):
+                    ttft = time.perf_counter() - start
+        else:
+            await response.read()
+    return {"status": 200, "latency": time.perf_counter() - start, "ttft": ttft}
+
+
+async def load(session: aiohttp.ClientSession, endpoint: str, questions: List[str], concurrency: int,
+               requests: int, stream: bool) -> dict:
+    results = []
+    counter = iter(range(requests))
+
+    async def client() -> None:
+        for i in counter:
+            results.append(await one_request(session, endpoint, {"question": questions[i % len(questions)]}, stream))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    answered = [result for result in results if result["status"] == 200]
+    latencies = [result["latency"] for result in answered]
+    ttfts = [result["ttft"] for result in answered if result["ttft"] is not None]
+    return {
+        "rps": len(answered) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "ttft_p50": statistics.median(ttfts) if ttfts else None,
+        "rejected": sum(result["status"] == 503 for result in results),
+        "errors": sum(result["status"] not in (200, 503) for result in results),
+    }
+
+
+async def run(args: argparse.Namespace, url: str, process: subprocess.Popen) -> None:
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await wait_ready(session, url, process, args.startup_timeout)
+        corpus_id = await ingest(session, url, args.files, args.pages)
+        questions = make_questions(max(args.requests, 1))
+
+        print(f"{'endpoint':<22} {'stream':>6} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'ttft p50':>9} {'503':>5} {'errors':>6}")
+        for route in ("ask", "ask-with-citations"):
+            endpoint = f"{url}/corpora/{corpus_id}/{route}"
+            for stream in (False, True):
+                for concurrency in args.concurrency:
+                    result = await load(session, endpoint, questions, concurrency, args.requests, stream)
+                    print(f"{route:<22} {'yes' if stream else 'no':>6} {concurrency:>7} {result['rps']:>8.1f} "
+                          f"{ms(result['p50']):>8} {ms(result['p95']):>8} {ms(result['p99']):>8} "
+                          f"{ms(result['ttft_p50']):>9} {result['rejected']:>5} {result['errors']:>6}")
+
+        async with session.get(f"{url}/stats") as response:
+            server = (await response.json())["server"]
+        print(f"\nServer: {server['rejected']} requests refused with 503 "
+              f"(max concurrency {server['max_concurrency']}, max pending {server['max_pending']})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=40, help="Pages per synthetic PDF")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrent clients to test")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="Fake LLM delay before the first token, in seconds")
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--llm-token-delay", type=float, default=0.002)
+    parser.add_argument("--server-concurrency", type=int, default=None, help="SERVER_MAX_CONCURRENCY for the server")
+    parser.add_argument("--max-pending", type=int, default=None, help="SERVER_MAX_PENDING for the server")
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the semantic answer cache enabled")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    port = free_port()
+    with FakeGroqServer(delay=args.llm_delay, tokens=args.llm_tokens, token_delay=args.llm_token_delay) as llm:
+        env = {**os.environ, "GROQ_BASE_URL": llm.url, "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "benchmark")}
+        if not args.answer_cache:
+            env["ANSWER_CACHE_MAX_ENTRIES"] = "0"
+        if args.server_concurrency is not None:
+            env["SERVER_MAX_CONCURRENCY"] = str(args.server_concurrency)
+        if args.max_pending is not None:
+            env["SERVER_MAX_PENDING"] = str(args.max_pending)
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "run.py"), "--serve", "--port", str(port)],
+                                   env=env, stdout=subprocess.DEVNULL)
+        try:
+            asyncio.run(run(args, f"http://127.0.0.1:{port}", process))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
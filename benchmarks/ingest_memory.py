@@ -0,0 +1,93 @@
+"""
+Ingest memory benchmark: peak RSS of building a store from ever larger uploads.
+
+For each page count, a fresh interpreter loads the embedding model, builds one
+synthetic PDF of that many pages and ingests it with
+``build_vectorstore_in_memory`` into an in-memory Chroma store. Reported per
+size: pages, chunks, ingest time, the RSS the finished store keeps
+(``retained``) and how far RSS peaked above that during ingest
+(``transient``). The store itself necessarily grows with the corpus; the
+transient buffers of parsing, chunking and embedding should not.
+
+Usage:
+    python benchmarks/ingest_memory.py [--pages 250 1000 3000] [--files 1]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def measure(pages: int, files: int) -> dict:
+    """Ingest in this process and report memory; run once per fresh interpreter."""
+    from synthetic_pdf import make_pdf_files
+
+    from backend.rag_pipeline import RAGPipeline
+
+    pipeline = RAGPipeline(warm_embeddings=False)
+    pipeline.warm()
+    pdf_files = make_pdf_files(files, pages)
+    # Load the vector store stack before the baseline is taken
+    pipeline.release_vectorstore(pipeline.build_vectorstore_in_memory(make_pdf_files(1, 1, seed=1000))[0])
+
+    # ru_maxrss can't be reset, so the peak during ingest only shows once it exceeds everything before
+    baseline = rss_mb()
+    start = time.perf_counter()
+    vectorstore, page_count, chunk_count = pipeline.build_vectorstore_in_memory(pdf_files, parallel=False)
+    elapsed = time.perf_counter() - start
+    retained = rss_mb() - baseline
+    peak = max(peak_rss_mb() - baseline, retained)
+    return {
+        "pages": page_count,
+        "chunks": chunk_count,
+        "seconds": elapsed,
+        "retained_mb": retained,
+        "transient_mb": peak - retained,
+        "peak_mb": peak,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[250, 1000, 3000], help="Pages per run")
+    parser.add_argument("--files", type=int, default=1, help="PDFs per run, each of --pages pages")
+    parser.add_argument("--child", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args.files)))
+        return
+
+    # Each run in a fresh interpreter: peak RSS only ever goes up within a process
+    env = {**os.environ, "ANSWER_CACHE_MAX_ENTRIES": "0", "EMBEDDING_CACHE_MAX_MB": "0"}
+    print(f"{'pages':>6} {'chunks':>7} {'seconds':>8} {'retained MB':>12} {'transient MB':>13} {'peak MB':>8}")
+    for pages in args.pages:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", str(pages), "--files", str(args.files)],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['pages']:>6} {result['chunks']:>7} {result['seconds']:>8.1f} {result['retained_mb']:>12.1f} "
+              f"{result['transient_mb']:>13.1f} {result['peak_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Lexical search benchmark: BM25 latency on natural-language questions over a large corpus.
+
+Builds a BM25Index over synthetic chunks whose words follow a Zipf distribution
+over a large vocabulary, mixed with English function words at their usual
+frequency, so common and rare terms have realistic document frequencies. The
+chunks are added in per-file segments as the pipeline indexes them, then merged. Questions
+are phrased the way students ask them ("what is the <term> algorithm", "how
+does <term> relate to <term>"), with terms drawn from common, mid-frequency and
+rare parts of the vocabulary. Reported per term rarity:
+
+  * exhaustive - every query term's postings scored in full, as before pruning
+  * search     - BM25Index.search (stopwords dropped, MaxScore pruning)
+
+and a check that ``search`` returns exactly the chunks and scores of exhaustively
+scoring the same (stopword-free) terms. Exits non-zero if a result differs.
+
+Usage:
+    python benchmarks/lexical_latency.py [--chunks 100000] [--files 50] [--queries 300] [--k 20]
+"""
+
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lexical import STOPWORDS, BM25Index, tokenize  # noqa: E402
+
+FUNCTION_WORDS = "the of and to a in is that for it as with was on be by this are from at an which or".split()
+TEMPLATES = [
+    "what is the {} algorithm",
+    "what is {}",
+    "how does {} relate to {}",
+    "explain the role of {} in {}",
+    "why is the {} important for {}",
+    "what are the main differences between {} and {}",
+]
+
+
+def make_chunks(count: int, vocabulary: int, words: int, rng: np.random.Generator) -> List[str]:
+    """Chunks of Zipf-distributed vocabulary terms, about a third of their words function words."""
+    ranks = np.minimum(rng.zipf(1.1, size=(count, words)), vocabulary) - 1
+    fillers = rng.integers(0, len(FUNCTION_WORDS), size=(count, words))
+    is_filler = rng.random((count, words)) < 0.35
+    return [
+        " ".join(FUNCTION_WORDS[f] if filler else f"term{r}" for r, f, filler in zip(row, fill, mask))
+        for row, fill, mask in zip(ranks, fillers, is_filler)
+    ]
+
+
+def make_queries(count: int, ranks: Tuple[int, int], rng: np.random.Generator) -> List[str]:
+    queries = []
+    for i in range(count):
+        template = TEMPLATES[i % len(TEMPLATES)]
+        terms = [f"term{rng.integers(*ranks)}" for _ in range(template.count("{}"))]
+        queries.append(template.format(*terms))
+    return queries
+
+
+def exhaustive_search(index: BM25Index, query: str, k: int, drop_stopwords: bool) -> List[Tuple[object, float]]:
+    """Score every posting of every query term, as BM25Index did before pruning."""
+    terms = set(tokenize(query))
+    if drop_stopwords:
+        terms = {term for term in terms if term not in STOPWORDS} or terms
+    segment = index._segment()
+    docs_parts, score_parts = [], []
+    for term in terms:
+        term_id = index._vocab.get(term)
+        if term_id is None:
+            continue
+        start, end = int(segment.offsets[term_id]), int(segment.offsets[term_id + 1])
+        if start == end:
+            continue
+        df = end - start
+        weight = math.log(1.0 + (segment.n_docs - df + 0.5) / (df + 0.5))
+        docs, scores = index._term_scores(segment, slice(start, end), weight)
+        docs_parts.append(docs)
+        score_parts.append(scores)
+    if not docs_parts:
+        return []
+    docs, inverse = np.unique(np.concatenate(docs_parts), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+    best = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+    results = [(segment.keys[int(docs[i])], float(scores[i])) for i in best]
+    results.sort(key=lambda item: -item[1])
+    return results
+
+
+def time_queries(search, queries: List[str]) -> Tuple[float, float]:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))]
+
+
+def same_results(expected: List[Tuple[object, float]], actual: List[Tuple[object, float]]) -> bool:
+    if len(expected) != len(actual):
+        return False
+    # Chunks tied with the k-th score may be returned in either order
+    cutoff = expected[-1][1] if expected else 0.0
+    strict = {key for key, score in expected if score > cutoff + 1e-9}
+    returned = dict(actual)
+    return (strict <= returned.keys()
+            and all(abs(returned[key] - score) <= 1e-6 * max(1.0, score) for key, score in expected if key in returned)
+            and all(abs(a[1] - e[1]) <= 1e-6 * max(1.0, e[1]) for a, e in zip(actual, expected)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--files", type=int, default=50, help="Source files (index segments) the chunks are split into")
+    parser.add_argument("--words", type=int, default=120, help="Words per chunk (about 512 tokens of prose)")
+    parser.add_argument("--vocabulary", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=300, help="Queries per rarity band")
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    chunks = make_chunks(args.chunks, args.vocabulary, args.words, rng)
+    index = BM25Index()
+    per_file = math.ceil(args.chunks / args.files)
+    for file in range(args.files):
+        part = range(file * per_file, min(args.chunks, (file + 1) * per_file))
+        index.add_segment(f"file-{file}.pdf", [chunks[i] for i in part], list(part))
+    index.compact()
+    index.search(chunks[0], 1)  # the first search fills in the length normalization
+    print(f"{args.chunks} chunks in {args.files} segments, {index.nbytes / 2 ** 20:.1f} MB index, "
+          f"built in {time.perf_counter() - start:.1f}s; k={args.k}\n")
+
+    bands = {"common": (0, 50), "mid": (50, 2000), "rare": (2000, 50000)}
+    print(f"{'terms':<8} {'exhaustive p50 ms':>18} {'p95 ms':>8} {'search p50 ms':>14} {'p95 ms':>8} {'exact':>7}")
+    mismatches = 0
+    for band, ranks in bands.items():
+        queries = make_queries(args.queries, ranks, rng)
+        for query in queries[:5]:
+            index.search(query, args.k)
+        base = time_queries(lambda q: exhaustive_search(index, q, args.k, drop_stopwords=False), queries)
+        fast = time_queries(lambda q: index.search(q, args.k), queries)
+        exact = sum(
+            same_results(exhaustive_search(index, query, args.k, drop_stopwords=True), index.search(query, args.k))
+            for query in queries
+        )
+        mismatches += len(queries) - exact
+        print(f"{band:<8} {1000 * base[0]:>18.3f} {1000 * base[1]:>8.3f} {1000 * fast[0]:>14.3f} "
+              f"{1000 * fast[1]:>8.3f} {exact / len(queries):>7.0%}")
+
+    print(f"\nExample: {make_queries(1, bands['mid'], rng)[0]!r}")
+    if mismatches:
+        print(f"FAILED: {mismatches} queries differ from exhaustive scoring")
+        sys.exit(1)
+    print("OK: every result matches exhaustive scoring")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: float32 Chroma vs. quantized (float16 / int8) shared-index storage.
+
+Generates a clustered synthetic corpus shaped like MiniLM embeddings (384-dim,
+unit length), loads it into an in-memory Chroma collection and into the shared
+memory-mapped index at each quantization level, and reports per configuration:
+
+  * memory    - bytes scanned per query (Chroma: resident-set growth while loading)
+  * latency   - p50 / p95 per single-query top-k search
+  * recall@k  - overlap with an exact float32 brute-force top-k
+
+Usage:
+    python benchmarks/quantized_storage.py [--chunks 30000] [--queries 200] [--k 5] [--rerank-factor 4]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import Callable, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import Chroma  # noqa: E402
+
+from backend.vector_index import QUANTIZATIONS, SharedIndexRegistry, normalize_rows, top_k  # noqa: E402
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def clustered_corpus(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((clusters, dim)))
+    assignment = rng.integers(0, clusters, n)
+    return normalize_rows(centers[assignment] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def evaluate(search: Callable[[np.ndarray], List[int]], queries: np.ndarray, truth: List[set], k: int) -> dict:
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        rows = search(query)
+        latencies.append(time.perf_counter() - start)
+        hits += len(expected.intersection(rows[:k]))
+    latencies.sort()
+    return {
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "recall": hits / (k * len(queries)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    vectors = clustered_corpus(args.chunks, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, args.chunks, args.queries)
+    queries = normalize_rows(vectors[picks] + 0.25 * rng.standard_normal((args.queries, args.dim)).astype(np.float32))
+    truth = [set(top_k(vectors @ query, args.k).tolist()) for query in queries]
+    texts = [f"chunk {i}" for i in range(args.chunks)]
+    metadatas = [{"source": "synthetic.pdf", "page": i} for i in range(args.chunks)]
+
+    print(f"{args.chunks} x {args.dim} vectors, {args.queries} queries, k={args.k}, "
+          f"rerank factor {args.rerank_factor}\n")
+    print(f"{'configuration':<22}{'memory MB':>12}{'p50 ms':>10}{'p95 ms':>10}{'recall@k':>10}")
+
+    def report(name: str, memory: int, result: dict) -> None:
+        print(f"{name:<22}{memory / 2 ** 20:>12.1f}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+              f"{result['recall']:>10.3f}")
+
+    before = rss_bytes()
+    chroma = Chroma(collection_name=f"bench-{uuid.uuid4().hex}")
+    for start in range(0, args.chunks, 4096):
+        end = min(start + 4096, args.chunks)
+        chroma._collection.add(ids=[str(i) for i in range(start, end)], embeddings=vectors[start:end].tolist(),
+                               documents=texts[start:end], metadatas=metadatas[start:end])
+    chroma_memory = rss_bytes() - before
+
+    def chroma_search(query: np.ndarray) -> List[int]:
+        response = chroma._collection.query(query_embeddings=[query.tolist()], n_results=args.k, include=[])
+        return [int(i) for i in response["ids"][0]]
+
+    chroma_search(queries[0])
+    report("chroma float32", chroma_memory, evaluate(chroma_search, queries, truth, args.k))
+    chroma.delete_collection()
+
+    with tempfile.TemporaryDirectory() as root:
+        for quantization in QUANTIZATIONS:
+            registry = SharedIndexRegistry(os.path.join(root, quantization), quantization=quantization,
+                                           rerank_factor=args.rerank_factor)
+            store = registry.acquire(
+                quantization, lambda: (texts, metadatas, vectors, args.chunks, {}), embedding=None
+            )
+            scanned = store.codes if store.codes is not None else store.vectors
+            memory = scanned.nbytes + (store.scales.nbytes if store.scales is not None else 0)
+
+            def search(query: np.ndarray) -> List[int]:
+                return store.search_rows(query[None, :], args.k)[0][0].tolist()
+
+            search(queries[0])
+            report(f"shared {quantization}", memory, evaluate(search, queries, truth, args.k))
+            registry.release(store)
+
+
+if __name__ == "__main__":
+    main()
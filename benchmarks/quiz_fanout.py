@@ -0,0 +1,94 @@
+"""
+Quiz generation benchmark: one long completion vs. concurrent subtopic groups.
+
+Ingests synthetic PDFs, then times ``generate_quiz`` for the same quiz with
+QUIZ_QUESTIONS_PER_GROUP set to the whole quiz (a single completion, as before)
+and to each of the given group sizes. A local fake Groq server writes
+well-formed questions, and its generation time grows with the number of
+questions requested (``--token-delay`` per word), as with a real model.
+Reported per setting: wall-clock time, number of LLM calls and questions parsed.
+
+Usage:
+    python benchmarks/quiz_fanout.py [--questions 20] [--group-sizes 5 10] [--token-delay 0.002] [--repeat 3]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_groq import FakeGroqServer  # noqa: E402
+from synthetic_pdf import TOPICS, make_pdf_files  # noqa: E402
+
+REQUESTED = re.compile(r"quiz with (\d+) multiple choice", re.IGNORECASE)
+
+
+def quiz_responder(body: dict) -> str:
+    """Answer a quiz prompt with as many well-formed questions as it asks for."""
+    prompt = body["messages"][-1]["content"]
+    match = REQUESTED.search(prompt)
+    count = int(match.group(1)) if match else 5
+    blocks = []
+    for i in range(1, count + 1):
+        topic = TOPICS[i % len(TOPICS)]
+        blocks.append("\n".join([
+            f"Question {i}: Which statement about {topic} is supported by the notes?",
+            f"A) {topic} increases the rate of every process in the system",
+            f"B) {topic} is defined by the key concept described in the context",
+            f"C) {topic} has no measurable effect on the output",
+            f"D) {topic} only applies during the first stage of the cycle",
+            "Correct Answer: B",
+            f"Explanation: The context defines {topic} and explains its role in the model.",
+        ]))
+    return "\n\n".join(blocks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20, help="Questions per quiz")
+    parser.add_argument("--group-sizes", type=int, nargs="+", default=[5], help="QUIZ_QUESTIONS_PER_GROUP values to compare")
+    parser.add_argument("--pages", type=int, default=50, help="Pages per synthetic PDF")
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--k", type=int, default=10, help="Chunks retrieved per question group")
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="Fake LLM seconds before generating")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Fake LLM seconds per generated word")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    server = FakeGroqServer(delay=args.llm_delay, token_delay=args.token_delay, responder=quiz_responder).start()
+    os.environ["GROQ_BASE_URL"] = server.url
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["ANSWER_CACHE_MAX_ENTRIES"] = "0"
+
+    from backend.rag_pipeline import RAGPipeline
+
+    pipeline = RAGPipeline(warm_embeddings=False)
+    pipeline.embedding_engine.warm()
+    vectorstore, pages, chunks = pipeline.build_vectorstore_in_memory(make_pdf_files(args.files, args.pages))
+    print(f"Ingested {pages} pages / {chunks} chunks\n")
+
+    print(f"{'group size':>10} {'groups':>7} {'questions':>10} {'median s':>9} {'min s':>7}")
+    for group_size in [args.questions] + [size for size in args.group_sizes if size != args.questions]:
+        pipeline.quiz_group_size = group_size
+        samples = []
+        for _ in range(args.repeat):
+            before = server.requests
+            start = time.perf_counter()
+            quiz = pipeline.generate_quiz(vectorstore, "", args.questions, args.k)
+            samples.append(time.perf_counter() - start)
+            calls = server.requests - before
+            if quiz.errors:
+                raise RuntimeError(f"Quiz generation failed: {quiz.errors[0]}")
+        print(f"{group_size:>10} {calls:>7} {len(quiz.questions):>10} {statistics.median(samples):>9.2f} {min(samples):>7.2f}")
+
+    pipeline.release_vectorstore(vectorstore)
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Two-stage retrieval benchmark: single-stage top-k vs. cross-encoder reranking.
+
+Ingests synthetic PDFs, then answers the same questions with
+``make_prediction_with_citations`` in three setups:
+
+  * k=5              - the current single-stage path
+  * k=<--wide-k>     - pushing k up for better recall (longer prompts)
+  * rerank N -> 5    - fetch --candidates chunks, rerank them with the local
+                       cross-encoder and send the best 5 (cold score cache,
+                       then the same questions again with the cache warm)
+
+A local fake Groq server answers after a delay that grows with prompt length
+(``--prompt-token-delay`` per prompt word), so longer contexts cost time as
+they would against the real API. Reported per setup: end-to-end p50/p95,
+median cross-encoder time per question, mean prompt tokens and the share of
+context chunks that mention the question's topic.
+
+Usage:
+    python benchmarks/rerank_latency.py [--questions 32] [--candidates 30] [--wide-k 20] [--rerank-model cross-encoder/ms-marco-MiniLM-L-6-v2]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_groq import FakeGroqServer  # noqa: E402
+from synthetic_pdf import TOPICS, make_pdf_files  # noqa: E402
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100, help="Pages per synthetic PDF")
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--questions", type=int, default=32)
+    parser.add_argument("--k", type=int, default=5, help="Chunks sent to the LLM")
+    parser.add_argument("--wide-k", type=int, default=20, help="k of the single-stage run with a wide context")
+    parser.add_argument("--candidates", type=int, default=30, help="Shortlist reranked by the cross-encoder")
+    parser.add_argument("--rerank-model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="Fake LLM seconds before answering")
+    parser.add_argument("--prompt-token-delay", type=float, default=0.0002, help="Fake LLM seconds per prompt word")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(delay=args.llm_delay, tokens=48, prompt_token_delay=args.prompt_token_delay).start()
+    os.environ["GROQ_BASE_URL"] = server.url
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["ANSWER_CACHE_MAX_ENTRIES"] = "0"
+    os.environ["CHUNK_SIZE"] = str(args.chunk_size)
+    # Large enough that the wide-k context isn't cut down by packing
+    os.environ["CONTEXT_TOKEN_BUDGET"] = str(args.chunk_size * (max(args.k, args.wide_k) + 1))
+
+    from backend.metrics import LatencyRecorder
+    from backend.rag_pipeline import RAGPipeline
+    from backend.rerank import CrossEncoderReranker
+
+    pipeline = RAGPipeline(warm_embeddings=False)
+    pipeline.embedding_engine.warm()
+    reranker = CrossEncoderReranker(args.rerank_model)
+    reranker.warm()
+    print(f"Cross-encoder {args.rerank_model} loaded in {reranker.load_time:.2f}s")
+    vectorstore, pages, chunks = pipeline.build_vectorstore_in_memory(make_pdf_files(args.files, args.pages))
+    print(f"Ingested {pages} pages / {chunks} chunks\n")
+
+    aspects = ["rate", "energy", "structure", "function"]
+    questions = []
+    for i in range(args.questions):
+        topic = TOPICS[i % len(TOPICS)]
+        questions.append((topic, f"How does {topic} relate to the key concept of {aspects[i % len(aspects)]}?"))
+    setups = [
+        (f"k={args.k}", None, args.k),
+        (f"k={args.wide_k}", None, args.wide_k),
+        (f"rerank {args.candidates}->{args.k} (cold)", reranker, args.k),
+        (f"rerank {args.candidates}->{args.k} (cached)", reranker, args.k),
+    ]
+
+    print(f"{'setup':<24} {'p50 s':>7} {'p95 s':>7} {'rerank ms':>10} {'prompt tok':>11} {'on topic':>9}")
+    for label, setup_reranker, k in setups:
+        pipeline.reranker = setup_reranker
+        pipeline.rerank_candidates = args.candidates if setup_reranker is not None else 0
+        pipeline.prompt_tokens.clear()
+        reranker.rerank_latency = LatencyRecorder()
+        totals, on_topic = [], []
+        for topic, question in questions:
+            start = time.perf_counter()
+            _, context = pipeline.make_prediction_with_citations(vectorstore, question, k)
+            totals.append(time.perf_counter() - start)
+            on_topic.append(sum(topic.lower() in chunk['content'].lower() for chunk in context) / max(1, len(context)))
+        tokens = pipeline.prompt_token_stats()['citations']['mean']
+        rerank_ms = 1000 * (reranker.rerank_latency.percentile(50) or 0.0)
+        print(f"{label:<24} {statistics.median(totals):>7.2f} {percentile(totals, 0.95):>7.2f} "
+              f"{rerank_ms:>10.1f} {tokens:>11.0f} {statistics.mean(on_topic):>9.0%}")
+
+    cache = reranker.stats()['cache']
+    print(f"\nRerank score cache: {cache['hits']} hits / {cache['misses']} misses")
+    pipeline.release_vectorstore(vectorstore)
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Micro-benchmark: per-request LangChain retriever vs. the cached direct top-k path.
+
+Builds a synthetic corpus of random unit vectors in an in-memory Chroma
+collection and in a NumpyVectorStore, then times, per query:
+
+  * baseline  - ``vectorstore.as_retriever(...).invoke(query)``, as the pipeline
+                used to do for every request
+  * fast path - one cached ``Retriever`` searching with a precomputed query vector
+
+Queries are embedded by a cheap deterministic hashing embedder so that the
+numbers isolate retrieval overhead rather than model inference.
+
+Usage:
+    python benchmarks/retrieval_overhead.py [--chunks 5000] [--queries 200] [--k 5]
+"""
+
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import time
+import uuid
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import Chroma  # noqa: E402
+
+from backend.retrieval import Retriever  # noqa: E402
+from backend.vector_index import NumpyVectorStore, normalize_rows  # noqa: E402
+
+
+class HashingEmbedder:
+    """Deterministic stand-in for the sentence-transformer: a seeded random unit vector per text."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def percentiles(samples: List[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": 1000 * statistics.median(ordered),
+        "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+    }
+
+
+def time_calls(fn, queries: List[str]) -> List[float]:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(args.dim)
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(rng.standard_normal((args.chunks, args.dim)).astype(np.float32))
+    texts = [f"chunk {i} " + " ".join(f"w{j}" for j in rng.integers(0, 5000, 40)) for i in range(args.chunks)]
+    metadatas = [{"source": f"doc{i % 10}.pdf", "page": i // 10} for i in range(args.chunks)]
+    queries = [f"question {i}" for i in range(args.queries)]
+
+    chroma = Chroma(collection_name=f"bench-{uuid.uuid4().hex}", embedding_function=embedder)
+    for start in range(0, args.chunks, 4096):
+        end = min(start + 4096, args.chunks)
+        chroma._collection.add(
+            ids=[str(i) for i in range(start, end)],
+            embeddings=vectors[start:end].tolist(),
+            documents=texts[start:end],
+            metadatas=metadatas[start:end]
+        )
+    numpy_store = NumpyVectorStore(vectors, texts, metadatas, embedder)
+
+    print(f"{args.chunks} chunks, {args.queries} queries, k={args.k}")
+    for name, store in (("chroma", chroma), ("numpy", numpy_store)):
+        # Warm both paths once so index loading isn't measured
+        store.as_retriever(search_type="similarity", search_kwargs={"k": args.k}).invoke(queries[0])
+        Retriever(store, embedding=embedder).search(queries[0], args.k)
+        retriever = Retriever(store, embedding=embedder)
+
+        baseline = time_calls(
+            lambda q: store.as_retriever(search_type="similarity", search_kwargs={"k": args.k}).invoke(q),
+            queries
+        )
+        fast = time_calls(lambda q: retriever.search(q, args.k, retriever.embed([q])[0]), queries)
+
+        base, quick = percentiles(baseline), percentiles(fast)
+        print(f"\n[{name}]")
+        print(f"  baseline  as_retriever().invoke   p50 {base['p50_ms']:7.3f} ms   p95 {base['p95_ms']:7.3f} ms")
+        print(f"  fast path cached Retriever        p50 {quick['p50_ms']:7.3f} ms   p95 {quick['p95_ms']:7.3f} ms")
+        for stage, recorder in retriever.stage_latency.items():
+            summary = recorder.summary()
+            if summary["count"]:
+                print(f"    {stage:<8} p50 {1000 * summary['p50']:7.3f} ms")
+        print(f"  p50 overhead saved: {base['p50_ms'] - quick['p50_ms']:.3f} ms "
+              f"({100 * (1 - quick['p50_ms'] / base['p50_ms']):.0f}%)")
+
+    chroma.delete_collection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+End-to-end benchmark harness for RAGPipeline.
+
+Generates synthetic PDFs, starts a local fake Groq server and measures:
+
+  * ingest throughput (pages/s, chunks/s) and embedding model load time
+  * retrieval latency (query embedding + search + hydration) p50/p95/p99
+  * end-to-end Q&A latency (make_prediction) p50/p95/p99
+  * streaming time-to-first-token and full stream latency
+  * concurrent Q&A throughput
+  * peak resident set size
+
+Answer and embedding caches are disabled unless --keep-caches is given, so every
+run measures cold work. Results are written as JSON; pass --baseline with an
+earlier result file to print the change in each headline metric.
+
+Usage:
+    python benchmarks/run_benchmarks.py --pages 200 --files 2 --chunk-size 512 --k 5 \\
+        --llm-delay 0.3 --output results.json [--baseline previous.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.metrics import ValueRecorder  # noqa: E402
+from fake_groq import FakeGroqServer  # noqa: E402
+from synthetic_pdf import make_pdf_files, make_questions  # noqa: E402
+
+HEADLINE_METRICS = [
+    ("ingest", "pages_per_s"),
+    ("ingest", "chunks_per_s"),
+    ("retrieval", "p50_ms"),
+    ("retrieval", "p95_ms"),
+    ("end_to_end", "p50_ms"),
+    ("end_to_end", "p95_ms"),
+    ("streaming_ttft", "p50_ms"),
+    ("concurrent", "questions_per_s"),
+    ("memory", "peak_rss_mb"),
+]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(samples: List[float]) -> Dict[str, Optional[float]]:
+    """Latency percentiles in milliseconds."""
+    recorder = ValueRecorder(window=max(1, len(samples)))
+    for sample in samples:
+        recorder.record(sample * 1000)
+    summary = recorder.summary()
+    return {
+        "count": summary["count"],
+        "mean_ms": summary["mean"],
+        "p50_ms": summary["p50"],
+        "p95_ms": summary["p95"],
+        "p99_ms": summary["p99"],
+    }
+
+
+def timed(fn: Callable[[str], object], questions: List[str]) -> List[float]:
+    samples = []
+    for question in questions:
+        start = time.perf_counter()
+        fn(question)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print("\nChange vs. baseline:")
+    for section, key in HEADLINE_METRICS:
+        new = results.get(section, {}).get(key)
+        old = baseline.get(section, {}).get(key)
+        if new is None or old is None:
+            continue
+        change = f"{100 * (new - old) / old:+.1f}%" if old else "n/a"
+        print(f"  {section + '.' + key:<30} {old:>10.2f} -> {new:>10.2f}  ({change})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100, help="Pages per synthetic PDF")
+    parser.add_argument("--files", type=int, default=1, help="Number of synthetic PDFs")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Chunk size in tokens (default: CHUNK_SIZE)")
+    parser.add_argument("--chunk-overlap", type=int, default=None)
+    parser.add_argument("--embedding-model", default=None, help="Embedding model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per question")
+    parser.add_argument("--queries", type=int, default=50, help="Questions for retrieval and Q&A latency")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel questions in the throughput run")
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="Fake LLM seconds to first token")
+    parser.add_argument("--llm-tokens", type=int, default=64, help="Fake LLM tokens per answer")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Fake LLM seconds between streamed tokens")
+    parser.add_argument("--keep-caches", action="store_true", help="Leave answer and embedding caches enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", default=None, help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(delay=args.llm_delay, tokens=args.llm_tokens, token_delay=args.token_delay).start()
+    os.environ["GROQ_BASE_URL"] = server.url
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    if args.chunk_size is not None:
+        os.environ["CHUNK_SIZE"] = str(args.chunk_size)
+    if args.chunk_overlap is not None:
+        os.environ["CHUNK_OVERLAP"] = str(args.chunk_overlap)
+    if args.embedding_model:
+        os.environ["EMBEDDING_MODEL"] = args.embedding_model
+    if not args.keep_caches:
+        os.environ["ANSWER_CACHE_MAX_ENTRIES"] = "0"
+        os.environ["EMBEDDING_CACHE_MAX_MB"] = "0"
+
+    # Imported after the environment is set so the shared pipeline picks the settings up
+    from backend.rag_pipeline import get_rag_pipeline
+
+    pipeline = get_rag_pipeline()
+
+    results: dict = {
+        "config": {
+            **vars(args),
+            "chunk_size": pipeline.chunk_size,
+            "chunk_overlap": pipeline.chunk_overlap,
+            "embedding_model": pipeline.embedding_model_name,
+            "search_type": pipeline.search_types["qa"],
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+    }
+
+    pipeline.embedding_engine.warm()
+    results["embedding_model_load_s"] = pipeline.embedding_engine.load_time
+
+    files = make_pdf_files(args.files, args.pages, seed=args.seed)
+    start = time.perf_counter()
+    vectorstore, pages, chunks = pipeline.build_vectorstore_in_memory(files)
+    elapsed = time.perf_counter() - start
+    results["ingest"] = {
+        "files": args.files,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "pages_per_s": pages / elapsed,
+        "chunks_per_s": chunks / elapsed,
+    }
+    print(f"Ingested {pages} pages / {chunks} chunks in {elapsed:.2f}s")
+
+    questions = make_questions(args.queries, seed=args.seed)
+    search_type = pipeline.search_types["qa"]
+    pipeline._retrieve(vectorstore, questions[0], args.k, search_type=search_type)
+    results["retrieval"] = summarize(timed(
+        lambda q: pipeline._retrieve(vectorstore, q, args.k, search_type=search_type), questions
+    ))
+    results["retrieval_stages"] = pipeline.retrieval_metrics()
+
+    results["end_to_end"] = summarize(timed(lambda q: pipeline.make_prediction(vectorstore, q, args.k), questions))
+
+    ttft, streamed = [], []
+    for question in questions:
+        start = time.perf_counter()
+        tokens, _ = pipeline.stream_prediction(vectorstore, question, args.k)
+        first = None
+        for _ in tokens:
+            if first is None:
+                first = time.perf_counter() - start
+        ttft.append(first if first is not None else time.perf_counter() - start)
+        streamed.append(time.perf_counter() - start)
+    results["streaming_ttft"] = summarize(ttft)
+    results["streaming_total"] = summarize(streamed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(lambda q: pipeline.make_prediction(vectorstore, q, args.k), questions))
+    elapsed = time.perf_counter() - start
+    results["concurrent"] = {
+        "concurrency": args.concurrency,
+        "questions": len(questions),
+        "seconds": elapsed,
+        "questions_per_s": len(questions) / elapsed,
+    }
+
+    results["llm_requests"] = server.requests
+    results["memory"] = {"peak_rss_mb": peak_rss_mb()}
+    pipeline.release_vectorstore(vectorstore)
+    server.stop()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    sections = dict.fromkeys(section for section, _ in HEADLINE_METRICS)
+    print(json.dumps({section: results[section] for section in sections}, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Session memory benchmark: many sessions' stores with and without a memory budget.
+
+For each budget, a fresh interpreter builds one in-memory store per simulated
+session from its own synthetic PDFs, registers it with the pipeline's session
+registry and leaves it idle, as abandoned browser tabs would. Reported per
+budget: the RSS the stores keep, how many of them ended up spilled to disk and
+the registry's own estimate of what stays in memory, then the time a spilled
+session's next question waits for its store to be reloaded, and how much of
+each session's top-5 vector search before the spill it still returns after.
+Chroma rebuilds its approximate HNSW index on reload, so, as with any fresh
+build of the same PDFs, the last ranks may change.
+
+Usage:
+    python benchmarks/session_memory.py [--sessions 12] [--pages 60] [--budgets 0 64]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def measure(sessions: int, pages: int) -> dict:
+    """Build and idle every session in this process; run once per fresh interpreter."""
+    from synthetic_pdf import make_pdf_files
+
+    from backend.rag_pipeline import RAGPipeline
+
+    pipeline = RAGPipeline(warm_embeddings=False)
+    pipeline.warm()
+    # Load the vector store stack before the baseline is taken
+    pipeline.release_vectorstore(pipeline.build_vectorstore_in_memory(make_pdf_files(1, 1, seed=1000))[0])
+
+    baseline = rss_mb()
+    query = "How does energy relate to structure?"
+    expected = {}
+    for i in range(sessions):
+        session_id = f"benchmark-session-{i}"
+        vectorstore, _, _ = pipeline.build_vectorstore_in_memory(make_pdf_files(1, pages, seed=i), parallel=False)
+        expected[session_id] = [doc.page_content for doc in pipeline._retrieve(vectorstore, query, 5)]
+        pipeline.sessions.attach(session_id, vectorstore)
+        del vectorstore
+    pipeline.sessions.enforce()
+    retained = rss_mb() - baseline
+    report = pipeline.session_memory_stats()
+
+    reloads, overlaps = [], []
+    for session_id, before in expected.items():
+        restores = pipeline.sessions.restores
+        start = time.perf_counter()
+        with pipeline.sessions.use(session_id) as vectorstore:
+            elapsed = time.perf_counter() - start
+            after = {doc.page_content for doc in pipeline._retrieve(vectorstore, query, 5)}
+        overlaps.append(len(after.intersection(before)) / max(1, len(before)))
+        if pipeline.sessions.restores > restores:
+            reloads.append(elapsed)
+    return {
+        "retained_mb": retained,
+        "estimated_mb": report['resident_bytes'] / 2 ** 20,
+        "on_disk": report['on_disk'],
+        "disk_mb": report['disk_bytes'] / 2 ** 20,
+        "reload_p50_ms": 1000 * statistics.median(reloads) if reloads else 0.0,
+        "reload_max_ms": 1000 * max(reloads, default=0.0),
+        "top5_overlap": statistics.mean(overlaps),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=12)
+    parser.add_argument("--pages", type=int, default=60, help="Pages of each session's PDF")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 64],
+                        help="SESSION_MEMORY_BUDGET_MB values to compare (0 = no budget)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.sessions, args.pages)))
+        return
+
+    print(f"{args.sessions} sessions x {args.pages} pages, all idle\n")
+    print(f"{'budget MB':>10} {'retained MB':>12} {'estimated MB':>13} {'on disk':>8} {'disk MB':>8} "
+          f"{'reload p50 ms':>14} {'reload max ms':>14} {'top-5 kept':>11}")
+    for budget in args.budgets:
+        with tempfile.TemporaryDirectory() as spill_dir:
+            env = {
+                **os.environ,
+                "ANSWER_CACHE_MAX_ENTRIES": "0",
+                "EMBEDDING_CACHE_MAX_MB": "0",
+                "SESSION_MEMORY_BUDGET_MB": str(budget),
+                "SESSION_IDLE_SECONDS": "0",
+                "SESSION_SPILL_DIR": spill_dir,
+            }
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child",
+                 "--sessions", str(args.sessions), "--pages", str(args.pages)],
+                env=env, check=True, capture_output=True, text=True
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{budget or '-':>10} {result['retained_mb']:>12.1f} {result['estimated_mb']:>13.1f} "
+              f"{result['on_disk']:>8} {result['disk_mb']:>8.1f} {result['reload_p50_ms']:>14.1f} "
+              f"{result['reload_max_ms']:>14.1f} {result['top5_overlap']:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
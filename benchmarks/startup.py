@@ -0,0 +1,123 @@
+"""
+Startup benchmark: import time, time to first paint and time until the pipeline is warm.
+
+Every measurement runs in a fresh interpreter so module caches from earlier runs
+don't hide import cost. Measured:
+
+  * import time of ``backend.startup`` (what the app imports before rendering)
+    and of ``backend.rag_pipeline`` (ML, vector-store and LLM dependencies)
+  * building the pipeline eagerly, as the app did before rendering anything
+  * time to first paint: the first Streamlit script run, via streamlit's AppTest
+  * time from first paint until the background warm-up has finished
+
+Usage:
+    python benchmarks/startup.py [--repeat 5] [--app frontend/app.py] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each snippet prints the seconds it measured as its last line of output
+IMPORT_STARTUP = """
+import time
+start = time.perf_counter()
+import backend.startup
+print(time.perf_counter() - start)
+"""
+
+IMPORT_PIPELINE = """
+import time
+start = time.perf_counter()
+import backend.rag_pipeline
+print(time.perf_counter() - start)
+"""
+
+EAGER_PIPELINE = """
+import time
+start = time.perf_counter()
+from backend.rag_pipeline import RAGPipeline
+RAGPipeline(warm_embeddings=False)
+print(time.perf_counter() - start)
+"""
+
+FIRST_PAINT = """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({app!r}, default_timeout=600)
+app.run()
+if app.exception:
+    raise SystemExit(str(app.exception))
+print(time.perf_counter() - start)
+"""
+
+WARM_AFTER_PAINT = FIRST_PAINT.replace(
+    "print(time.perf_counter() - start)",
+    "painted = time.perf_counter()\n"
+    "from backend.startup import startup_stats, wait_until_ready\n"
+    "wait_until_ready()\n"
+    "import sys\n"
+    "print(startup_stats(), file=sys.stderr)\n"
+    "print(time.perf_counter() - painted)",
+)
+
+
+def measure(snippet: str, repeat: int) -> List[float]:
+    samples = []
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Benchmark subprocess failed:\n{result.stderr.strip()}")
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "runs": len(samples),
+        "median_ms": 1000 * statistics.median(samples),
+        "min_ms": 1000 * min(samples),
+        "max_ms": 1000 * max(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--app", default=os.path.join(ROOT, "frontend", "app.py"), help="Streamlit script to paint")
+    parser.add_argument("--skip-app", action="store_true", help="Only measure imports (no Streamlit run)")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    cases = {
+        "import_startup": IMPORT_STARTUP,
+        "import_rag_pipeline": IMPORT_PIPELINE,
+        "eager_pipeline": EAGER_PIPELINE,
+    }
+    if not args.skip_app:
+        app = os.path.abspath(args.app)
+        cases["first_paint"] = FIRST_PAINT.format(app=app)
+        cases["warm_after_paint"] = WARM_AFTER_PAINT.format(app=app)
+
+    results = {}
+    for name, snippet in cases.items():
+        results[name] = summarize(measure(snippet, args.repeat))
+        print(f"{name:<22} median {results[name]['median_ms']:9.1f} ms "
+              f"(min {results[name]['min_ms']:.1f}, max {results[name]['max_ms']:.1f})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Deterministic synthetic PDFs for benchmarks.
+
+Pages are filled with study-notes-like sentences drawn from a fixed vocabulary
+and a handful of topic terms, so chunking, embedding and retrieval see text of
+realistic density without shipping sample documents. PDFs are written by hand
+(one Helvetica text stream per page), so no PDF library is needed to create them.
+"""
+
+import io
+import random
+from typing import List
+
+TOPICS = [
+    "gradient descent", "backpropagation", "photosynthesis", "mitochondria", "supply and demand",
+    "the French Revolution", "Newton's second law", "entropy", "binary search trees", "the Krebs cycle",
+    "plate tectonics", "opportunity cost", "eigenvalues", "the water cycle", "hash tables", "osmosis",
+]
+WORDS = (
+    "the a of and to in is that for it as with was on be by this are from at an which or have not "
+    "process system energy model value function data theory result change rate structure form level "
+    "example method cause effect increase decrease important key concept principle define describe "
+    "explain compare measure observe equation variable constant factor stage cycle layer input output "
+    "each between during because therefore however while when where first second finally also often"
+).split()
+
+
+def make_sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+    words.insert(rng.randint(0, len(words)), rng.choice(TOPICS))
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def page_lines(rng: random.Random, lines: int, width: int = 95) -> List[str]:
+    """Wrap random sentences into fixed-width lines."""
+    out: List[str] = []
+    current = ""
+    while len(out) < lines:
+        for word in make_sentence(rng).split():
+            if len(current) + len(word) + 1 > width:
+                out.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+    return out[:lines]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace").decode("latin-1")
+
+
+def make_pdf(pages: int, lines_per_page: int = 48, seed: int = 0) -> bytes:
+    """
+    Build a text PDF.
+
+    Args:
+        pages: Number of pages
+        lines_per_page: Text lines per page (48 lines is roughly 500 words)
+        seed: Seed for the sentence generator; equal seeds give byte-identical PDFs
+
+    Returns:
+        PDF file contents
+    """
+    rng = random.Random(seed)
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then a (page, content) pair per page
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for page in range(pages):
+        page_id, content_id = 4 + 2 * page, 5 + 2 * page
+        kids.append(f"{page_id} 0 R")
+        text = " T* ".join(f"({_escape(line)}) Tj" for line in page_lines(rng, lines_per_page))
+        stream = f"BT /F1 10 Tf 14 TL 50 760 Td {text} ET".encode("latin-1")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode("latin-1")
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode("latin-1")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = out.tell()
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, objects[number]))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for number in sorted(objects):
+        out.write(b"%010d 00000 n \n" % offsets[number])
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+class NamedPDF(io.BytesIO):
+    """In-memory PDF with a file name, shaped like Streamlit's UploadedFile."""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+
+
+def make_pdf_files(files: int, pages: int, seed: int = 0) -> List[NamedPDF]:
+    """Build ``files`` distinct synthetic PDFs of ``pages`` pages each."""
+    return [NamedPDF(make_pdf(pages, seed=seed + i), f"synthetic-{seed + i}.pdf") for i in range(files)]
+
+
+def make_questions(count: int, seed: int = 0) -> List[str]:
+    """Study-style questions about the synthetic topics."""
+    rng = random.Random(seed)
+    templates = ["What is {}?", "Explain {} with an example.", "How does {} relate to {}?", "Why is {} important?"]
+    questions = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        questions.append(template.format(*rng.sample(TOPICS, template.count("{}"))))
+    return questions
@@ -1,12 +1,15 @@
 import streamlit as st
 import sys
 import os
-import re
+import uuid
+from contextlib import contextmanager
 
 # Add the parent directory to the path to import backend
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.rag_pipeline import rag_pipeline
+# Only the lightweight startup helpers are imported here; the pipeline and its
+# ML / vector-store dependencies load in a background thread after the first paint
+from backend.startup import get_pipeline, is_ready, warm_up_in_background
 
 
 class StudyMateUI:
@@ -15,6 +18,7 @@ class StudyMateUI:
         self.setup_page_config()
         self.setup_custom_css()
         self.initialize_session_state()
+        warm_up_in_background()
         
     def setup_page_config(self):
         """Configure Streamlit page settings."""
@@ -206,8 +210,6 @@ class StudyMateUI:
     
     def initialize_session_state(self):
         """Initialize Streamlit session state variables."""
-        if "vectorstore" not in st.session_state:
-            st.session_state.vectorstore = None
         if "pdf_uploaded" not in st.session_state:
             st.session_state.pdf_uploaded = False
         if "page_count" not in st.session_state:
@@ -226,10 +228,26 @@ class StudyMateUI:
             st.session_state.quiz_topic = ""
         if "num_questions" not in st.session_state:
             st.session_state.num_questions = 5
+        if "uploader_version" not in st.session_state:
+            st.session_state.uploader_version = 0
+        if "session_id" not in st.session_state:
+            # The session id keys the server-wide store registry, so it is never taken from
+            # the URL; a refresh during an upload reattaches through the unguessable job id,
+            # which stops working once the job's result has been claimed
+            st.query_params.pop("session", None)
+            job_id = st.query_params.get("job")
+            job = get_pipeline().jobs.get(job_id) if job_id else None
+            st.session_state.session_id = job.session_id if job is not None else uuid.uuid4().hex
+            st.session_state.ingest_job = job.id if job is not None else None
+            if job is None:
+                st.query_params.pop("job", None)
     
     def reset_session(self):
         """Reset the entire session - clear all data and return to initial state."""
-        st.session_state.vectorstore = None
+        if st.session_state.ingest_job:
+            get_pipeline().jobs.cancel(st.session_state.ingest_job)
+            self.track_ingest_job(None)
+        get_pipeline().sessions.drop(st.session_state.session_id)
         st.session_state.pdf_uploaded = False
         st.session_state.page_count = 0
         st.session_state.chunk_count = 0
@@ -265,15 +283,43 @@ class StudyMateUI:
                 st.success(f"📄 Session Active: {st.session_state.page_count} pages loaded")
             else:
                 st.info("📂 No PDFs loaded - Upload to start")
+            if not is_ready():
+                st.caption("⏳ Loading models in the background...")
+            notice = st.session_state.pop("ingest_notice", None)
+            if notice:
+                kind, message = notice
+                getattr(st, kind)(message)
+                if kind == "success":
+                    st.balloons()
             
             pdf_files = None
-            if not st.session_state.pdf_uploaded:
+            if st.session_state.ingest_job:
+                self.render_ingest_job()
+            elif not st.session_state.pdf_uploaded:
                 pdf_files = st.file_uploader(
                     "Upload PDF files", 
                     type=["pdf"], 
                     accept_multiple_files=True,
-                    key="pdf_uploader"
+                    key=f"pdf_uploader_{st.session_state.uploader_version}"
                 )
+            else:
+                # Add or remove files mid-session; only changed files are (re-)embedded
+                with st.expander("📂 Manage Documents"):
+                    new_files = st.file_uploader(
+                        "Add PDF files", 
+                        type=["pdf"], 
+                        accept_multiple_files=True,
+                        key=f"pdf_adder_{st.session_state.uploader_version}"
+                    )
+                    if new_files and st.button("➕ Add to Session"):
+                        self.add_pdfs(new_files)
+                    
+                    files_to_remove = st.multiselect(
+                        "Remove files:", 
+                        st.session_state.uploaded_files
+                    )
+                    if files_to_remove and st.button("🗑️ Remove Selected"):
+                        self.remove_pdfs(files_to_remove)
             
             if st.button("🔄 Reset Session", type="primary"):
                 self.reset_session()
@@ -301,23 +347,126 @@ class StudyMateUI:
             return pdf_files
     
     def process_pdfs(self, pdf_files):
-        """Process uploaded PDF files in memory."""
-        if pdf_files and not st.session_state.pdf_uploaded:
-            with st.spinner("📚 Processing PDFs in memory..."):
-                try:
-                    vectorstore, pages, chunks = rag_pipeline.build_vectorstore_in_memory(pdf_files)
-                    st.session_state.vectorstore = vectorstore
-                    st.session_state.page_count = pages
-                    st.session_state.chunk_count = chunks
-                    st.session_state.pdf_uploaded = True
-                    st.session_state.uploaded_files = [f.name for f in pdf_files]
-                    
-                    st.success(f"✅ {pages} pages loaded | {chunks} chunks created (In Memory)")
-                    st.balloons()
-                except Exception as e:
-                    st.error(f"❌ Error processing PDFs: {str(e)}")
-                    st.session_state.pdf_uploaded = False
-                    st.session_state.vectorstore = None
+        """Queue uploaded PDF files for processing in the background."""
+        if pdf_files and not st.session_state.pdf_uploaded and not st.session_state.ingest_job:
+            try:
+                job = get_pipeline().submit_ingest(st.session_state.session_id, pdf_files)
+            except Exception as e:
+                st.error(f"❌ Error processing PDFs: {str(e)}")
+                return
+            self.track_ingest_job(job.id)
+            st.rerun()
+    
+    def add_pdfs(self, pdf_files):
+        """Queue PDF files to be added to the active session's vector store."""
+        try:
+            with self.session_store() as vectorstore:
+                job = get_pipeline().submit_ingest(
+                    st.session_state.session_id, 
+                    pdf_files, 
+                    vectorstore=vectorstore
+                )
+        except Exception as e:
+            st.error(f"❌ Error adding PDFs: {str(e)}")
+            return
+        self.track_ingest_job(job.id)
+        st.rerun()
+    
+    def track_ingest_job(self, job_id):
+        """Remember the session's ingest job, in the URL too so a refresh can reattach to it."""
+        st.session_state.ingest_job = job_id
+        if job_id:
+            st.query_params["job"] = job_id
+        else:
+            st.query_params.pop("job", None)
+    
+    def render_ingest_job(self):
+        """Show the ingest job's progress, polling it until it finishes."""
+        job_id = st.session_state.ingest_job
+        
+        @st.fragment(run_every=1.0)
+        def job_progress():
+            job = get_pipeline().jobs.get(job_id)
+            if job is None or job.session_id != st.session_state.session_id or job.finished:
+                self.finish_ingest_job(job)
+                st.rerun()
+            
+            progress = job.progress
+            if job.state == "queued":
+                label = "⏳ Waiting for a free worker..."
+            else:
+                label = (
+                    f"📚 {progress.current_file or 'Processing'} | "
+                    f"{progress.files_done}/{progress.files_total} files, {progress.pages} pages, "
+                    f"{progress.chunks_embedded}/{progress.chunks} chunks embedded"
+                )
+            st.progress(progress.fraction, text=label)
+            if st.button("✖️ Cancel Upload"):
+                get_pipeline().jobs.cancel(job_id)
+                st.rerun()
+        
+        job_progress()
+    
+    def finish_ingest_job(self, job):
+        """Attach a finished job's vector store to the session, or report why there is none."""
+        self.track_ingest_job(None)
+        # A new uploader key clears the files that were just processed
+        st.session_state.uploader_version += 1
+        if job is None or job.session_id != st.session_state.session_id:
+            st.session_state.ingest_notice = ("warning", "⚠️ The upload is no longer available - please upload again")
+            return
+        job = get_pipeline().jobs.claim(job.id) or job
+        
+        if job.state == "done":
+            vectorstore, pages, chunks = job.result
+            self.update_corpus(vectorstore, pages, chunks)
+            st.session_state.pdf_uploaded = True
+            st.session_state.ingest_notice = ("success", f"✅ {pages} pages loaded | {chunks} chunks created (In Memory)")
+            return
+        
+        with get_pipeline().sessions.use(st.session_state.session_id) as vectorstore:
+            if vectorstore is not None:
+                # Files indexed before a failed or cancelled addition stay in the store
+                self.update_corpus(vectorstore, *get_pipeline().corpus_counts(vectorstore))
+        if job.state == "failed":
+            st.session_state.ingest_notice = ("error", f"❌ Error processing PDFs: {job.error}")
+        else:
+            st.session_state.ingest_notice = ("info", "Upload cancelled")
+    
+    def remove_pdfs(self, sources):
+        """Remove PDF files from the active session's vector store."""
+        try:
+            with self.session_store() as vectorstore:
+                vectorstore, pages, chunks = get_pipeline().remove_documents(
+                    vectorstore, 
+                    sources
+                )
+        except Exception as e:
+            st.error(f"❌ Error removing PDFs: {str(e)}")
+            return
+        self.update_corpus(vectorstore, pages, chunks)
+        if not st.session_state.uploaded_files:
+            # Nothing left to study - go back to the upload screen
+            self.reset_session()
+        st.rerun()
+    
+    def update_corpus(self, vectorstore, pages, chunks):
+        """Register an updated vector store for the session and keep its counters."""
+        # The store lives in the server-wide registry, which may spill it to disk while the session is idle
+        get_pipeline().sessions.attach(st.session_state.session_id, vectorstore)
+        st.session_state.page_count = pages
+        st.session_state.chunk_count = chunks
+        # Read from the registry's store: a job result claimed late may have been spilled already
+        with get_pipeline().sessions.use(st.session_state.session_id, default=vectorstore) as current:
+            st.session_state.uploaded_files = get_pipeline().loaded_sources(current)
+    
+    @contextmanager
+    def session_store(self):
+        """Borrow the session's vector store for one request, reloading it if it was spilled to disk."""
+        with get_pipeline().sessions.use(st.session_state.session_id) as vectorstore:
+            if vectorstore is None:
+                raise RuntimeError("This session's documents are no longer loaded - please reset and upload them again")
+            yield vectorstore
     
     def submit_question(self):
         """Handle question submission based on current mode."""
@@ -325,7 +474,7 @@ class StudyMateUI:
         if not user_question:
             return
         
-        if not st.session_state.vectorstore:
+        if not st.session_state.pdf_uploaded:
             st.error("❌ No documents loaded. Please upload PDFs first.")
             return
         
@@ -339,14 +488,16 @@ class StudyMateUI:
             })
             
             try:
-                quiz = rag_pipeline.generate_quiz(
-                    st.session_state.vectorstore, 
-                    user_question, 
-                    st.session_state.num_questions
-                )
+                with self.session_store() as vectorstore:
+                    quiz = get_pipeline().generate_quiz(
+                        vectorstore, 
+                        user_question, 
+                        st.session_state.num_questions
+                    )
                 st.session_state.chat_history[-1] = {
                     "question": f"Generate quiz: {user_question}", 
-                    "answer": quiz, 
+                    "answer": quiz.to_text(), 
+                    "quiz": quiz,
                     "context": [],
                     "type": "quiz"
                 }
@@ -359,65 +510,121 @@ class StudyMateUI:
                 }
         
         elif st.session_state.app_mode == "Q&A with Citations":
-            # Q&A with citations
+            # Q&A with citations - the answer is streamed while the history is rendered
             st.session_state.chat_history.append({
                 "question": user_question, 
-                "answer": "⏳ Generating response with citations...", 
+                "answer": "", 
                 "context": [],
-                "type": "qa_citations"
+                "type": "qa_citations",
+                "pending": True
             })
-            
-            try:
-                answer, detailed_context = rag_pipeline.make_prediction_with_citations(
-                    st.session_state.vectorstore, 
-                    user_question
-                )
-                st.session_state.chat_history[-1] = {
-                    "question": user_question, 
-                    "answer": answer, 
-                    "context": detailed_context,
-                    "type": "qa_citations"
-                }
-            except Exception as e:
-                st.session_state.chat_history[-1] = {
-                    "question": user_question, 
-                    "answer": f"❌ Error generating response: {str(e)}", 
-                    "context": [],
-                    "type": "qa_citations"
-                }
         
         else:  # Regular Q&A
             st.session_state.chat_history.append({
                 "question": user_question, 
-                "answer": "⏳ Generating response...", 
+                "answer": "", 
                 "context": [],
-                "type": "qa"
+                "type": "qa",
+                "pending": True
             })
-            
-            try:
-                answer, context_list = rag_pipeline.make_prediction(
-                    st.session_state.vectorstore, 
-                    user_question
+        
+        st.session_state.question_input = ""
+    
+    def stream_pending_answer(self, chat):
+        """Stream the answer of a pending Q&A entry into the page token by token."""
+        placeholder = st.empty()
+        placeholder.markdown(self.qa_box_html(chat['question'], "⏳ Generating response..."), unsafe_allow_html=True)
+        
+        try:
+            with self.session_store() as vectorstore:
+                if chat.get("type") == "qa_citations":
+                    tokens, context = get_pipeline().stream_prediction_with_citations(
+                        vectorstore, 
+                        chat['question']
+                    )
+                    # Citations are known before the first token arrives
+                    self.render_citations(context)
+                else:
+                    tokens, context = get_pipeline().stream_prediction(
+                        vectorstore, 
+                        chat['question']
+                    )
+                
+                answer = ""
+                for token in tokens:
+                    answer += token
+                    placeholder.markdown(self.qa_box_html(chat['question'], answer + "▌"), unsafe_allow_html=True)
+                answer = answer.strip()
+        except Exception as e:
+            answer = f"❌ Error generating response: {str(e)}"
+            context = []
+        
+        placeholder.markdown(self.qa_box_html(chat['question'], answer), unsafe_allow_html=True)
+        chat["answer"] = answer
+        chat["context"] = context
+        chat.pop("pending", None)
+    
+    def qa_box_html(self, question, answer):
+        """Return the HTML for a question/answer box."""
+        return f"""
+            <div class='qa-box'>
+                <div class='question'>Q: {question}</div>
+                <div class='answer'>A: {answer}</div>
+            </div>
+            """
+    
+    def render_citations(self, context):
+        """Render source citations for a Q&A with citations answer."""
+        if context:
+            st.markdown("**📚 Sources & Citations:**")
+            for i, ctx in enumerate(context, 1):
+                source_file = ctx.get('source', 'Unknown').split('/')[-1] if ctx.get('source') else 'Unknown'
+                st.markdown(
+                    f"""
+                    <div class='citation-box'>
+                        <div class='citation-header'>Source {i}: {source_file} (Page {ctx.get('page', 'Unknown')})</div>
+                        <div>{ctx.get('content', '')[:200]}{'...' if len(ctx.get('content', '')) > 200 else ''}</div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
                 )
-                st.session_state.chat_history[-1] = {
-                    "question": user_question, 
-                    "answer": answer, 
-                    "context": context_list,
-                    "type": "qa"
-                }
+    
+    def submit_bulk_questions(self):
+        """Answer a pasted list of questions (one per line) in a single batch."""
+        questions = [q.strip() for q in st.session_state.bulk_questions_input.splitlines() if q.strip()]
+        if not questions:
+            return
+        
+        if not st.session_state.pdf_uploaded:
+            st.error("❌ No documents loaded. Please upload PDFs first.")
+            return
+        
+        with_citations = st.session_state.app_mode == "Q&A with Citations"
+        with st.spinner(f"💬 Answering {len(questions)} questions..."):
+            try:
+                with self.session_store() as vectorstore:
+                    results = get_pipeline().make_predictions_batch(
+                        vectorstore, 
+                        questions, 
+                        with_citations=with_citations
+                    )
             except Exception as e:
-                st.session_state.chat_history[-1] = {
-                    "question": user_question, 
-                    "answer": f"❌ Error generating response: {str(e)}", 
-                    "context": [],
-                    "type": "qa"
-                }
+                st.error(f"❌ Error answering questions: {str(e)}")
+                return
         
-        st.session_state.question_input = ""
+        for result in results:
+            st.session_state.chat_history.append({
+                "question": result["question"], 
+                "answer": result["answer"], 
+                "context": result["context"],
+                "type": "qa_citations" if with_citations else "qa"
+            })
+        total = max(result["timings"]["total"] for result in results)
+        st.success(f"✅ Answered {len(results)} questions in {total:.1f}s")
     
     def generate_quiz_from_topic(self):
         """Generate quiz from topic input."""
-        if not st.session_state.vectorstore:
+        if not st.session_state.pdf_uploaded:
             st.error("❌ No documents loaded. Please upload PDFs first.")
             return
         
@@ -425,74 +632,27 @@ class StudyMateUI:
         
         with st.spinner("🎯 Generating quiz..."):
             try:
-                quiz = rag_pipeline.generate_quiz(
-                    st.session_state.vectorstore, 
-                    topic, 
-                    st.session_state.num_questions
-                )
+                with self.session_store() as vectorstore:
+                    quiz = get_pipeline().generate_quiz(
+                        vectorstore, 
+                        topic, 
+                        st.session_state.num_questions
+                    )
                 st.session_state.chat_history.append({
                     "question": f"Quiz on: {topic}", 
-                    "answer": quiz, 
+                    "answer": quiz.to_text(), 
+                    "quiz": quiz,
                     "context": [],
                     "type": "quiz"
                 })
             except Exception as e:
                 st.error(f"❌ Error generating quiz: {str(e)}")
     
-    def parse_quiz(self, quiz_text):
-        """Parse quiz text into structured format with improved correct answer detection."""
-        questions = []
-        
-        # More flexible regex patterns to handle various formats
-        patterns = [
-            r'(?:\*\*)?Question (\d+)(?:\*\*)?:?\s*(.*?)(?=(?:\*\*)?Question \d+|$)',
-            r'(\d+)\.\s*(.*?)(?=\d+\.|$)'
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, quiz_text, re.DOTALL | re.IGNORECASE)
-            if matches:
-                for match in matches:
-                    question_content = match.group(2).strip()
-                    lines = [line.strip() for line in question_content.split('\n') if line.strip()]
-                    
-                    if not lines:
-                        continue
-                    
-                    question_text = lines[0]
-                    options = []
-                    correct_answer = ""
-                    explanation = ""
-                    
-                    i = 1
-                    # Extract options (A), B), C), D) or A., B., C., D.)
-                    while i < len(lines):
-                        line = lines[i]
-                        if re.match(r'^[ABCD][\)\.]', line):
-                            options.append(line)
-                        elif line.lower().startswith("correct answer"):
-                            # More flexible correct answer extraction
-                            answer_match = re.search(r'correct answer:?\s*([ABCD])', line, re.IGNORECASE)
-                            if answer_match:
-                                correct_answer = answer_match.group(1).upper()
-                        elif line.lower().startswith("explanation"):
-                            explanation = re.sub(r'^explanation:?\s*', '', line, flags=re.IGNORECASE)
-                        i += 1
-                    
-                    if question_text and options and correct_answer:
-                        questions.append({
-                            "question": question_text,
-                            "options": options,
-                            "correct": correct_answer,
-                            "explanation": explanation
-                        })
-                break
-        
-        return questions
-    
     def render_quiz_display(self, chat):
         """Render quiz in a user-friendly format with proper correct answer highlighting."""
-        quiz_questions = self.parse_quiz(chat['answer'])
+        # Parsed once by the pipeline when the quiz was generated
+        quiz = chat.get('quiz')
+        quiz_questions = quiz.questions if quiz is not None else []
         
         if not quiz_questions:
             # Fallback to raw text if parsing fails
@@ -519,12 +679,15 @@ class StudyMateUI:
             unsafe_allow_html=True
         )
         
+        if quiz.errors:
+            st.warning(f"⚠️ Some questions could not be generated: {quiz.errors[0]}")
+        
         for i, q in enumerate(quiz_questions, 1):
             # Create option HTML with correct answer highlighted
             options_html = ""
-            for option in q['options']:
+            for option in q.options:
                 option_letter = option[0].upper()  # Get the letter (A, B, C, D)
-                if option_letter == q['correct'].upper():
+                if option_letter == q.correct:
                     options_html += f"<div class='quiz-option correct'>✅ {option} <strong>(CORRECT)</strong></div>"
                 else:
                     options_html += f"<div class='quiz-option'>{option}</div>"
@@ -532,13 +695,13 @@ class StudyMateUI:
             st.markdown(
                 f"""
                 <div class='quiz-question'>
-                    <div class='question-title'>Q{i}: {q['question']}</div>
+                    <div class='question-title'>Q{i}: {q.question}</div>
                     {options_html}
                     <div class='quiz-correct-answer'>
-                        ✅ <strong>Correct Answer: {q['correct']}</strong>
+                        ✅ <strong>Correct Answer: {q.correct}</strong>
                     </div>
                     <div class='quiz-explanation'>
-                        💡 <strong>Explanation:</strong> {q['explanation']}
+                        💡 <strong>Explanation:</strong> {q.explanation}
                     </div>
                 </div>
                 """,
@@ -561,7 +724,7 @@ class StudyMateUI:
             unsafe_allow_html=True
         )
 
-        if st.session_state.pdf_uploaded and st.session_state.vectorstore:
+        if st.session_state.pdf_uploaded:
             st.info(f"📚 **Active Session**: {len(st.session_state.uploaded_files)} files loaded ({st.session_state.page_count} pages, {st.session_state.chunk_count} chunks)")
             
             # Input based on mode
@@ -588,52 +751,38 @@ class StudyMateUI:
                     on_change=self.submit_question,
                     placeholder=input_placeholder
                 )
+                
+                with st.expander("📋 Bulk questions"):
+                    st.text_area(
+                        "Paste one question per line:", 
+                        key="bulk_questions_input", 
+                        height=150,
+                        placeholder="What is backpropagation?\nExplain gradient descent.\n..."
+                    )
+                    if st.button("Answer All", type="primary"):
+                        self.submit_bulk_questions()
             
             # Display conversation history
             if st.session_state.chat_history:
                 st.markdown("### 💬 Conversation History")
                 for chat in reversed(st.session_state.chat_history):
-                    if chat.get("type") == "quiz":
+                    if chat.get("pending"):
+                        # Newly submitted question: stream its answer in place
+                        self.stream_pending_answer(chat)
+                        
+                    elif chat.get("type") == "quiz":
                         # Enhanced Quiz Display
                         self.render_quiz_display(chat)
                         
                     elif chat.get("type") == "qa_citations":
                         # Q&A with citations display
-                        st.markdown(
-                            f"""
-                            <div class='qa-box'>
-                                <div class='question'>Q: {chat['question']}</div>
-                                <div class='answer'>A: {chat['answer']}</div>
-                            </div>
-                            """,
-                            unsafe_allow_html=True
-                        )
+                        st.markdown(self.qa_box_html(chat['question'], chat['answer']), unsafe_allow_html=True)
                         
                         # Display citations
-                        if chat['context']:
-                            st.markdown("**📚 Sources & Citations:**")
-                            for i, ctx in enumerate(chat['context'], 1):
-                                source_file = ctx.get('source', 'Unknown').split('/')[-1] if ctx.get('source') else 'Unknown'
-                                st.markdown(
-                                    f"""
-                                    <div class='citation-box'>
-                                        <div class='citation-header'>Source {i}: {source_file} (Page {ctx.get('page', 'Unknown')})</div>
-                                        <div>{ctx.get('content', '')[:200]}{'...' if len(ctx.get('content', '')) > 200 else ''}</div>
-                                    </div>
-                                    """,
-                                    unsafe_allow_html=True
-                                )
+                        self.render_citations(chat['context'])
                     else:
                         # Regular Q&A display
-                        st.markdown(
-                            f"""
-                            <div class='qa-box'>
-                                <div class='question'>Q: {chat['question']}</div>
-                                <div class='answer'>A: {chat['answer']}</div>
-                            </div>
-                            """,
-                            unsafe_allow_html=True
-                        )
+                        st.markdown(self.qa_box_html(chat['question'], chat['answer']), unsafe_allow_html=True)
             else:
                 st.markdown("### 💬 Ready for Questions!")
                 if st.session_state.app_mode == "Quiz Generator":
@@ -1,14 +1,36 @@
 """
 Main runner script for StudyMate AI application.
-This script serves as the entry point to run the Streamlit app.
+This script serves as the entry point to run the Streamlit app, or with
+--serve the headless HTTP/JSON API (see backend/server.py).
 """
 
+import argparse
 import sys
 import os
 import subprocess
 
+def serve(host, port):
+    """Run the HTTP/JSON API instead of the Streamlit UI."""
+    try:
+        from backend.server import run_server
+    except ImportError as e:
+        print(f"Error: {e}. Please install aiohttp using: pip install aiohttp")
+        sys.exit(1)
+    print(f"Starting StudyMate AI API on http://{host}:{port}")
+    run_server(host, port)
+
+
 def main():
     """Main function to run the StudyMate AI application."""
+    parser = argparse.ArgumentParser(description="Run StudyMate AI.")
+    parser.add_argument("--serve", action="store_true", help="Serve the HTTP/JSON API instead of the Streamlit UI")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface the API listens on (with --serve)")
+    parser.add_argument("--port", type=int, default=8000, help="Port the API listens on (with --serve)")
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.host, args.port)
+        return
+
     # Get the directory where this script is located
     current_dir = os.path.dirname(os.path.abspath(__file__))
     